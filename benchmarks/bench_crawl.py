@@ -0,0 +1,204 @@
+"""
+End-to-end crawl benchmark against a local synthetic site.
+
+Runs start_link_discovery and then scrape_selected_pages over every discovered page, and reports
+pages/sec for each phase, p50/p99 fetch, parse and extraction latency, CPU cores kept busy, peak RSS and bytes written.
+Results are printed and saved as JSON (benchmarks/results/ by default) so runs can be compared
+across commits:
+
+    python benchmarks/bench_crawl.py --pages 2000 --fanout 10 --page-kb 20 --latency-ms 5
+    python benchmarks/bench_crawl.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_site import SiteSpec, SyntheticSite  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_summary(samples):
+    return {"count": len(samples),
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 3) if samples else None,
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 3) if samples else None}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # bytes on macOS, KiB on Linux
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cpu_seconds():
+    """CPU time used by this process and its finished children (e.g. parser processes), user plus system."""
+    return sum(usage.ru_utime + usage.ru_stime for usage in (resource.getrusage(resource.RUSAGE_SELF),
+                                                              resource.getrusage(resource.RUSAGE_CHILDREN)))
+
+
+@contextmanager
+def instrumented(scraper, parsepool):
+    """
+    Times fetch_page, link parsing (discovery), tree parsing (scrape) and rule extraction.
+    Parse times are as the fetching threads see them, including any hand-off to parser processes.
+    """
+    samples = {"fetch": [], "parse_links": [], "parse_tree": [], "extract": []}
+    fetch_page, links, text = scraper.fetch_page, parsepool.ParsePool.links, parsepool.ParsePool.text
+
+    def timed_fetch(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch_page(*args, **kwargs)
+        finally:
+            samples["fetch"].append(time.perf_counter() - start)
+
+    def timed_links(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = links(self, *args, **kwargs)
+        samples["parse_links"].append(time.perf_counter() - start)
+        return result
+
+    def timed_text(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = text(self, *args, **kwargs)
+        extract_seconds = result[3]
+        samples["parse_tree"].append(time.perf_counter() - start - extract_seconds)
+        samples["extract"].append(extract_seconds)
+        return result
+
+    scraper.fetch_page, parsepool.ParsePool.links, parsepool.ParsePool.text = timed_fetch, timed_links, timed_text
+    try:
+        yield samples
+    finally:
+        scraper.fetch_page, parsepool.ParsePool.links, parsepool.ParsePool.text = fetch_page, links, text
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(spec, workers, output_format, rate, parse_processes=None):
+    from webapp import scraper, parsepool
+    from webapp.ratelimit import HostRateLimiter
+
+    pool = parsepool.ParsePool(parse_processes if parse_processes is not None else parsepool.PARSE_PROCESSES)
+    cpu_started = cpu_seconds()
+    with SyntheticSite(spec) as site, instrumented(scraper, parsepool) as samples:
+        limiter = HostRateLimiter(rate=rate, burst=max(1, workers))
+        started = time.perf_counter()
+        links = scraper.start_link_discovery(site.base_url, max_depth=spec.depth() + 1, workers=workers,
+                                             rate_limiter=limiter, parse_pool=pool)
+        discovery_seconds = time.perf_counter() - started
+        discovery_fetches = len(samples["fetch"])
+
+        started = time.perf_counter()
+        output_dir, scraped, total, errors = scraper.scrape_selected_pages(
+            "benchmark", links, workers=workers, rate_limiter=limiter, output_format=output_format, parse_pool=pool)
+        scrape_seconds = time.perf_counter() - started
+    pool.close() # Reaps the parser processes, so their CPU time is counted
+    busy_seconds = cpu_seconds() - cpu_started # Includes the synthetic site's server threads
+
+    return {
+        "discovery": {"pages_found": len(links), "pages_fetched": discovery_fetches,
+                      "seconds": round(discovery_seconds, 3),
+                      "pages_per_sec": round(discovery_fetches / discovery_seconds, 1)},
+        "scrape": {"pages_scraped": scraped, "pages_selected": total, "errors": len(errors),
+                   "seconds": round(scrape_seconds, 3), "pages_per_sec": round(total / scrape_seconds, 1),
+                   "bytes_written": directory_bytes(output_dir) if output_dir else 0},
+        "latency": {key: latency_summary(values) for key, values in samples.items()},
+        "cpu": {"parse_processes": pool.processes, "cpu_seconds": round(busy_seconds, 2),
+                "cores_busy": round(busy_seconds / (discovery_seconds + scrape_seconds), 2)},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(old_path, new_path):
+    """Prints the headline numbers of two result files side by side."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    rows = [("discovery pages/sec", ("discovery", "pages_per_sec")), ("scrape pages/sec", ("scrape", "pages_per_sec")),
+            ("fetch p50 ms", ("latency", "fetch", "p50_ms")), ("fetch p99 ms", ("latency", "fetch", "p99_ms")),
+            ("parse_tree p50 ms", ("latency", "parse_tree", "p50_ms")), ("extract p50 ms", ("latency", "extract", "p50_ms")),
+            ("cores busy", ("cpu", "cores_busy")), ("peak RSS MB", ("peak_rss_mb",)), ("bytes written", ("scrape", "bytes_written"))]
+    print(f"{'':22}{old.get('commit') or 'old':>14}{new.get('commit') or 'new':>14}{'change':>10}")
+    for label, keys in rows:
+        a, b = old, new
+        for key in keys:
+            a = a.get(key) if isinstance(a, dict) else None
+            b = b.get(key) if isinstance(b, dict) else None
+        change = f"{(b - a) / a * 100:+.1f}%" if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a else ""
+        print(f"{label:22}{str(a):>14}{str(b):>14}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end crawl benchmark against a local synthetic site.")
+    parser.add_argument("--pages", type=int, default=1000, help="pages in the synthetic site")
+    parser.add_argument("--fanout", type=int, default=10, help="links to child pages per page")
+    parser.add_argument("--page-kb", type=float, default=20, help="body text per page, in KiB")
+    parser.add_argument("--latency-ms", type=float, default=0, help="server delay per request")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1e6, help="requests/sec per host (default: unthrottled)")
+    parser.add_argument("--output-format", default="txt")
+    parser.add_argument("--parse-processes", type=int, help="parser processes (default SCRAPER_PARSE_PROCESSES, i.e. one per CPU; 1 parses in-thread)")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Keep benchmark output, checkpoints and caches out of the real output directory.
+    work_dir = tempfile.mkdtemp(prefix="scraper_bench_")
+    os.environ["SCRAPER_OUTPUT_DIR"] = work_dir
+    os.environ.setdefault("SCRAPER_HTTP_CACHE", "0")
+    try:
+        spec = SiteSpec(args.pages, args.fanout, args.page_kb, args.latency_ms)
+        result = {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                  "python": platform.python_version(), "platform": platform.platform(),
+                  "config": dict(spec.to_dict(), workers=args.workers, rate=args.rate, output_format=args.output_format,
+                                                    parse_processes=args.parse_processes)}
+        result.update(run(spec, args.workers, args.output_format, args.rate, args.parse_processes))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{result['commit'] or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Cold-start benchmark for the web app, as the serverless function pays it on every new instance.
+
+Each run starts a fresh interpreter that imports webapp.app (or the Netlify function wrapper) and serves one
+request through the WSGI app, and reports the process start-up, import and first-response times, plus which
+of the crawler's heavy dependencies the request ended up importing. Results are printed and saved as JSON
+(benchmarks/results/ by default) so runs can be compared across commits:
+
+    python benchmarks/bench_startup.py --runs 20
+    python benchmarks/bench_startup.py --path /metrics --target netlify
+    python benchmarks/bench_startup.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from bench_crawl import RESULTS_DIR, git_commit, percentile  # noqa: E402
+
+# Imported by the crawler, not needed to render a page; a cold start should leave them alone.
+HEAVY_MODULES = ("requests", "urllib3", "bs4", "lxml", "webapp.scraper", "webapp.fetcher", "webapp.orchestrator")
+
+# Runs in the child interpreter. Times are measured there, so they exclude the parent's process spawn.
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+if {target!r} == "netlify":
+    sys.path.insert(0, "netlify/functions")
+    from app import app
+else:
+    from webapp.app import app
+imported = time.perf_counter()
+response = app.test_client().get({path!r})
+response.get_data()
+responded = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "first_response_ms": (responded - imported) * 1000,
+                  "status": response.status_code, "heavy_modules": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def summary(samples):
+    return {"p50_ms": round(percentile(samples, 0.5), 1), "p90_ms": round(percentile(samples, 0.9), 1),
+            "min_ms": round(min(samples), 1)}
+
+
+def run(runs=10, path="/", target="webapp"):
+    """Starts `runs` fresh interpreters and returns the timing summary (see the module docstring)."""
+    code = CHILD.format(target=target, path=path, heavy=HEAVY_MODULES)
+    state_dir = tempfile.mkdtemp(prefix="scraper_startup_") # No saved jobs or checkpoints from earlier runs
+    env = dict(os.environ, SCRAPER_OUTPUT_DIR=state_dir)
+    samples = []
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env=env, capture_output=True,
+                                       text=True, check=True)
+            process_ms = (time.perf_counter() - started) * 1000
+            sample = json.loads(completed.stdout.strip().splitlines()[-1])
+            sample["process_ms"] = process_ms
+            samples.append(sample)
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    return {
+        "import": summary([sample["import_ms"] for sample in samples]),
+        "first_response": summary([sample["first_response_ms"] for sample in samples]),
+        "process": summary([sample["process_ms"] for sample in samples]),
+        "status": samples[-1]["status"],
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def compare(old_path, new_path):
+    """Prints the headline numbers of two result files side by side."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'':22}{old.get('commit') or 'old':>14}{new.get('commit') or 'new':>14}{'change':>10}")
+    for label, section in (("import p50 ms", "import"), ("first response p50 ms", "first_response"), ("process p50 ms", "process")):
+        a, b = old.get(section, {}).get("p50_ms"), new.get(section, {}).get("p50_ms")
+        change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else ""
+        print(f"{label:22}{str(a):>14}{str(b):>14}{change:>10}")
+    print(f"{'heavy modules':22}{len(old.get('heavy_modules', [])):>14}{len(new.get('heavy_modules', [])):>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark: import time and first-response latency.")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to start")
+    parser.add_argument("--path", default="/", help="path of the first request")
+    parser.add_argument("--target", choices=("webapp", "netlify"), default="webapp",
+                        help="import webapp.app, or the Netlify function wrapper (needs aws-lambda-wsgi)")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/startup_<time>_<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "config": {"runs": args.runs, "path": args.path, "target": args.target}}
+    result.update(run(args.runs, args.path, args.target))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"startup_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{result['commit'] or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    print(f"Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Synthetic website for benchmarks: a deterministic tree of HTML pages served over local HTTP.
+
+Page 0 is the root; page i links to its children i * fanout + 1 ... i * fanout + fanout (while they exist),
+back to its parent and to the root, so discovery sees duplicates as well as new links. Every page carries
+navigation / footer noise and roughly page_kb of body text.
+
+Run standalone to browse a site:  python benchmarks/synthetic_site.py --pages 1000 --port 8000
+"""
+import argparse
+import functools
+import http.server
+import multiprocessing
+import random
+import time
+
+WORDS = ("crawler frontier latency throughput parser selector extract session cache "
+         "benchmark document section content article paragraph heading network").split()
+
+
+class SiteSpec:
+    """Shape of a synthetic site."""
+
+    def __init__(self, pages=1000, fanout=10, page_kb=20, latency_ms=0.0, seed=1):
+        self.pages = pages
+        self.fanout = fanout
+        self.page_kb = page_kb
+        self.latency_ms = latency_ms
+        self.seed = seed
+
+    def depth(self):
+        """Depth of the deepest page, i.e. the max_depth discovery needs to reach every page."""
+        depth, first, width = 0, 0, 1
+        while first + width < self.pages:
+            first, width, depth = first + width, width * self.fanout, depth + 1
+        return depth
+
+    def to_dict(self):
+        return {"pages": self.pages, "fanout": self.fanout, "page_kb": self.page_kb,
+                "latency_ms": self.latency_ms, "seed": self.seed, "depth": self.depth()}
+
+
+@functools.lru_cache(maxsize=None)
+def _paragraph_pool(seed, size=512):
+    # Pages are assembled from a fixed pool so serving stays cheap next to the crawler being measured.
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(60)) for _ in range(size)]
+
+
+def render_page(spec, index):
+    """Returns the HTML of page index as bytes."""
+    rng = random.Random(spec.seed * 1_000_003 + index)
+    children = range(index * spec.fanout + 1, min(index * spec.fanout + spec.fanout, spec.pages - 1) + 1)
+    links = [f'<a href="/p/{child}.html">Page {child}</a>' for child in children]
+    if index:
+        links.append(f'<a href="/p/{(index - 1) // spec.fanout}.html">Up</a>')
+        links.append('<a href="/p/0.html#top">Home</a>')
+    pool = _paragraph_pool(spec.seed)
+    paragraphs = []
+    size = 0
+    while size < spec.page_kb * 1024:
+        paragraph = pool[rng.randrange(len(pool))]
+        paragraphs.append(f"<p>{paragraph} (page {index})</p>")
+        size += len(paragraph) + 7
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>Synthetic page {index}</title><style>p {{ margin: 0 }}</style></head><body>"
+        "<header><nav><a href='/p/0.html'>Home</a> <a href='https://external.example/'>Elsewhere</a></nav></header>"
+        f"<main><article class='main-content'><h1>Page {index}</h1>{''.join(paragraphs)}"
+        f"<ul>{''.join(f'<li>{link}</li>' for link in links)}</ul></article></main>"
+        "<footer>Synthetic footer <script>var x = 1;</script></footer></body></html>"
+    ).encode("utf-8")
+
+
+def make_handler(spec):
+    class SyntheticHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, like real servers
+        disable_nagle_algorithm = True # headers and body are separate writes; avoid delayed-ACK stalls
+
+        def do_GET(self):
+            if spec.latency_ms:
+                time.sleep(spec.latency_ms / 1000)
+            path = self.path.split("?", 1)[0]
+            index = None
+            if path in ("/", "/index.html", "/p/"):
+                index = 0
+            elif path.startswith("/p/") and path.endswith(".html") and path[3:-5].isdigit():
+                index = int(path[3:-5])
+            if index is None or index >= spec.pages:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = render_page(spec, index)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return SyntheticHandler
+
+
+def _serve(spec, port, ready):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), make_handler(spec))
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class SyntheticSite:
+    """
+    Serves a SiteSpec from a separate process, so the server's CPU and memory don't count
+    against the crawler being measured. Use as a context manager; base_url is set on entry.
+    """
+
+    def __init__(self, spec, port=0):
+        self.spec = spec
+        self.port = port
+        self.base_url = None
+        self._process = None
+
+    def __enter__(self):
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self.spec, self.port, ready), daemon=True)
+        self._process.start()
+        self.base_url = f"http://127.0.0.1:{ready.get(timeout=10)}/p/"
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._process.terminate()
+        self._process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--page-kb", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    spec = SiteSpec(args.pages, args.fanout, args.page_kb, args.latency_ms)
+    ready = multiprocessing.Queue()
+    print(f"Serving {args.pages} synthetic pages at http://127.0.0.1:{args.port}/p/0.html (Ctrl+C to stop)")
+    try:
+        _serve(spec, args.port, ready)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
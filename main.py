@@ -2,9 +2,10 @@
 # The main application logic has been moved to the webapp/ directory
 # and is run via app.py (Flask application).
 #
-# For CLI-based operations, if any are reintroduced, they would be
-# managed separately, possibly by a different script or by adding
-# CLI commands to the Flask app.
+# For CLI-based operations, run the crawler's command line instead:
+#     python -m webapp crawl https://example.com/ (see python -m webapp --help)
+# It lives in webapp/__main__.py, on top of the async API in webapp/crawler.py,
+# and doesn't import Flask.
 
 # Original content included:
 # - imports: requests, BeautifulSoup, urllib.parse, os, time, logging, re, datetime
@@ -19,6 +20,7 @@
 # - webapp/app.py: Flask application, routes, and UI interaction.
 # - webapp/scraper.py: Core scraping functions (discovery, page crawling).
 # - webapp/utils.py: Helper utilities (logging, file/path management).
+# - webapp/crawler.py, webapp/__main__.py: Async crawler API and command line.
 
 # To run the web application:
 # Ensure Flask and other dependencies (requests, beautifulsoup4) are installed.
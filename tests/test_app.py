@@ -79,10 +79,76 @@ def test_darkmode_script_served(client):
     assert b'function toggleDarkMode' in resp.data
 
 
-def test_logs_stream_endpoint(client, local_site):
+def test_logs_stream_requires_a_job(client, local_site):
     links = [f"{local_site}/index.html"]
     client.post('/scrape_selected', data={'selected_links': links})
     resp = client.get('/logs_stream')
+    assert resp.status_code == 400
+
+
+def test_discover_async_returns_job_id(client, local_site):
+    resp = client.post('/discover', data={'urls': local_site, 'async': '1'})
+    assert resp.status_code == 202
+    job_id = resp.get_json()['job_id']
+
+    from webapp.app import job_manager
+    assert job_manager.get(job_id).done.wait(30)
+
+    status = client.get(f'/jobs/{job_id}').get_json()
+    assert status['status'] == 'finished'
+    assert status['progress']['checked_count'] >= 1
+    links = status['result']['discovery_results'][local_site]['links']
+    assert any('page2.html' in link for link in links)
+
+    view = client.get(f'/jobs/{job_id}/view')
+    assert b'Select links to scrape' in view.data
+
+
+def test_scrape_writes_each_site_to_its_own_session(client, local_site):
+    port = local_site.rsplit(':', 1)[1]
+    links = [f"{local_site}/index.html", f"http://localhost:{port}/page2.html"] # Same server, two hosts
+    job_id = client.post('/scrape_selected', data={'selected_links': links, 'async': '1'}).get_json()['job_id']
+
+    from webapp.app import job_manager
+    assert job_manager.get(job_id).done.wait(30)
+    result = client.get(f'/jobs/{job_id}').get_json()['result']
+    assert result['num_scraped'] == 2 and result['errors'] == []
+    assert len(result['sites']) == 2
+    directories = {site['output_directory'] for site in result['sites'].values()}
+    assert len(directories) == 2 and all(os.path.isdir(d) for d in directories)
+    assert b'one per site' in client.get(f'/jobs/{job_id}/view').data
+
+
+def test_scrape_rejects_session_outside_output_dir(client, local_site):
+    from webapp.app import job_manager
+
+    jobs_before = len(job_manager.list_jobs())
+    for name in ('..', '.', '../..', 'a/../..'):
+        response = client.post('/scrape_selected', data={'selected_links': [f"{local_site}/index.html"], 'async': '1',
+                                                         'incremental_session': name})
+        assert response.status_code == 400
+    assert len(job_manager.list_jobs()) == jobs_before
+
+
+def test_metrics_endpoint(client, local_site):
+    client.post('/scrape_selected', data={'selected_links': [f"{local_site}/index.html"]})
+    resp = client.get('/metrics')
     assert resp.status_code == 200
-    chunk = next(resp.response)
-    assert b'data:' in chunk
+    assert resp.mimetype == 'text/plain'
+    host = local_site.split('//', 1)[1]
+    assert f'scraper_fetches_total{{host="{host}",status="200"}}' in resp.get_data(as_text=True)
+    assert 'scraper_jobs{kind="scrape",status="finished"}' in resp.get_data(as_text=True)
+    assert 'scraper_stage_duration_seconds_bucket' in resp.get_data(as_text=True)
+
+
+def test_unknown_job_returns_404(client):
+    assert client.get('/jobs/does-not-exist').status_code == 404
+
+
+def test_logs_stream_follows_one_job(client, local_site):
+    job_id = client.post('/discover', data={'urls': local_site, 'async': '1'}).get_json()['job_id']
+    resp = client.get(f'/logs_stream?job={job_id}')
+    body = b''.join(resp.response)  # The stream ends once the job's channel is closed
+    assert b'event: progress' in body
+    assert b'Starting link discovery' in body
+    assert body.endswith(b'event: end\ndata: {}\n\n')
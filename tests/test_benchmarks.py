@@ -0,0 +1,24 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks")))
+
+from bench_crawl import run
+from synthetic_site import SiteSpec
+
+
+def test_benchmark_smoke_run():
+    spec = SiteSpec(pages=30, fanout=5, page_kb=2)
+    result = run(spec, workers=2, output_format='jsonl', rate=1e6)
+    assert result['discovery']['pages_found'] >= 30
+    assert result['scrape']['errors'] == 0 and result['scrape']['bytes_written'] > 0
+    assert result['latency']['fetch']['p50_ms'] is not None
+    assert result['peak_rss_mb'] > 0
+
+
+def test_startup_benchmark_smoke_run():
+    from bench_startup import run as run_startup
+
+    result = run_startup(runs=1)
+    assert result['status'] == 200
+    assert result['import']['p50_ms'] > 0 and result['first_response']['p50_ms'] > 0
+    assert 'requests' not in result['heavy_modules'] and 'webapp.scraper' not in result['heavy_modules']
@@ -0,0 +1,24 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.canonical import UrlCanonicalizer, canonicalize_url
+
+
+def test_default_rules_collapse_equivalent_urls():
+    variants = [
+        'HTTP://Docs.Example.com:80/guide/index.html?b=2&a=1&utm_source=x#intro',
+        'http://docs.example.com/guide/?a=1&b=2',
+        'http://docs.example.com/guide/?gclid=abc&b=2&a=1',
+    ]
+    assert {canonicalize_url(url) for url in variants} == {'http://docs.example.com/guide/?a=1&b=2'}
+    # Same-host links take the scheme of the page they were found on.
+    assert canonicalize_url('http://docs.example.com/a', referrer='https://docs.example.com/') == 'https://docs.example.com/a'
+    assert canonicalize_url('http://other.example.com/a', referrer='https://docs.example.com/') == 'http://other.example.com/a'
+
+
+def test_configurable_rules():
+    strip = UrlCanonicalizer(trailing_slash='strip', drop_params=['session*'], strip_index=False)
+    assert strip.canonicalize('https://h/docs/?sessionid=1&utm_source=x') == 'https://h/docs?utm_source=x'
+    assert strip.canonicalize('https://h/index.html') == 'https://h/index.html'
+    add = UrlCanonicalizer(trailing_slash='add', sort_query=False)
+    assert add.canonicalize('https://h/docs?b=1&a=2') == 'https://h/docs/?b=1&a=2'
+    assert add.canonicalize('https://h/file.pdf') == 'https://h/file.pdf'
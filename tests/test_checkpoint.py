@@ -0,0 +1,86 @@
+import http.server
+import socket
+import threading
+import os
+import functools
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp.checkpoint import CrawlCheckpoint, CHECKPOINT_FILENAME
+from webapp.scraper import start_link_discovery, scrape_selected_pages
+
+
+@pytest.fixture
+def chain_site(tmp_path):
+    # index -> p1 -> p2 -> p3, so discovery needs several rounds
+    site = tmp_path / 'site'
+    site.mkdir()
+    (site / 'index.html').write_text('<html><body><a href="p1.html">1</a></body></html>')
+    for i in range(1, 4):
+        (site / f'p{i}.html').write_text(f'<html><body><p>Page {i}</p><a href="p{i + 1}.html">next</a></body></html>')
+    (site / 'p4.html').write_text('<html><body><p>End</p></body></html>')
+
+    sock = socket.socket()
+    sock.bind(("localhost", 0))
+    host, port = sock.getsockname()
+    sock.close()
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(site))
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://{host}:{port}/"
+    server.shutdown()
+    thread.join()
+
+
+def test_discovery_resumes_after_interruption(tmp_path, chain_site):
+    state = str(tmp_path / 'discover.sqlite')
+    visited = []
+
+    def crash_after_two_pages(stats):
+        visited.append(stats)
+        if len(visited) == 2:
+            raise KeyboardInterrupt # Simulates the process being killed mid-crawl
+
+    with pytest.raises(KeyboardInterrupt):
+        start_link_discovery(chain_site, workers=1, checkpoint_path=state, progress_callback=crash_after_two_pages)
+
+    resumed_stats = []
+    links = start_link_discovery(chain_site, workers=1, checkpoint_path=state, resume=True,
+                                 progress_callback=resumed_stats.append)
+    assert [url.rsplit('/', 1)[1] for url in links] == ['', 'p1.html', 'p2.html', 'p3.html', 'p4.html']
+    # Only the pages the interrupted run never finished are fetched again.
+    assert len(resumed_stats) == 3
+    assert resumed_stats[-1]['checked_count'] == 5
+
+    # A completed run leaves no checkpoint behind.
+    assert not os.path.exists(state)
+
+
+def test_scrape_resume_skips_pages_already_saved(tmp_path, chain_site):
+    session_dir = tmp_path / 'session'
+    session_dir.mkdir()
+    saved_url = 'http://localhost:1/already-saved.html' # Unreachable; must not be fetched again
+    checkpoint = CrawlCheckpoint(str(session_dir / CHECKPOINT_FILENAME))
+    checkpoint.record_page(saved_url, 'added', {'file': 'already_saved.txt', 'sha256': 'x', 'scraped_at': 'earlier'})
+    checkpoint.close()
+
+    output_dir, scraped, total, errors = scrape_selected_pages(
+        'test', [saved_url, chain_site], existing_session_dir=str(session_dir), resume=True)
+    assert (scraped, total, errors) == (2, 2, [])
+    assert CrawlCheckpoint(os.path.join(output_dir, CHECKPOINT_FILENAME)).completed_pages().keys() == {saved_url, chain_site}
+
+
+def test_discovery_checkpoints_are_keyed_by_run(tmp_path):
+    from webapp.checkpoint import discovery_checkpoint_path
+
+    paths = {discovery_checkpoint_path('https://example.com/', str(tmp_path), run_id=run_id) for run_id in (None, 'job1', 'job2')}
+    assert len(paths) == 3
+    checkpoint = CrawlCheckpoint(discovery_checkpoint_path('https://example.com/', str(tmp_path), run_id='job1'))
+    checkpoint.record_seen('https://example.com/', 0, found=True)
+    checkpoint.discard()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import http.server
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp import crawler
+from webapp.__main__ import main
+from webapp.orchestrator import CrawlOrchestrator
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / 'site'
+    root.mkdir()
+    (root / 'index.html').write_text(''.join(f'<a href="p{i}.html">{i}</a>' for i in range(5)))
+    for i in range(5):
+        (root / f'p{i}.html').write_text(f'<html><body><p>Page {i}</p></body></html>')
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(('localhost', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://localhost:{server.server_address[1]}/"
+    server.shutdown()
+
+
+async def collect(events, stop_after=None):
+    collected = []
+    async for event in events:
+        collected.append(event)
+        if stop_after is not None and len(collected) >= stop_after:
+            break
+    return collected
+
+
+def test_crawl_streams_links_then_pages(site, tmp_path):
+    host = site.split('//')[1].rstrip('/')
+    orchestrator = CrawlOrchestrator(max_in_flight=2, max_sites=1)
+    events = asyncio.run(collect(crawler.crawl(site, session_dirs={host: str(tmp_path)}, orchestrator=orchestrator,
+                                               discovery_options={'respect_robots': False})))
+
+    kinds = [event.kind for event in events]
+    assert kinds == ['link'] * 6 + ['site'] + ['page'] * 6 + ['site']
+    assert events[6].result == {'num_links': 6}
+    pages = {event.url: event for event in events if event.kind == 'page'}
+    assert pages[f'{site}p3.html'].status == 'added' and 'Page 3' in pages[f'{site}p3.html'].text
+    assert events[-1].result['output_directory'] == str(tmp_path) and events[-1].result['num_scraped'] == 6
+
+
+def test_stopping_early_stops_the_crawl(site, tmp_path):
+    orchestrator = CrawlOrchestrator(max_in_flight=1, max_sites=1, workers=1)
+    events = asyncio.run(collect(crawler.scrape([f'{site}p{i}.html' for i in range(5)], orchestrator=orchestrator,
+                                                session_dirs={site.split('//')[1].rstrip('/'): str(tmp_path)}), stop_after=1))
+    assert [event.kind for event in events] == ['page']
+    assert orchestrator.budget.in_flight() == 0
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.txt')]) < 5
+
+
+def test_cli_scrapes_urls_as_jsonl(site, tmp_path, capsys):
+    urls_file = tmp_path / 'urls.txt'
+    urls_file.write_text(f'{site}p0.html\n# comment\n{site}p1.html\n')
+    status = main(['scrape', '--urls-file', str(urls_file), '--session', str(tmp_path), '--jsonl', '--text', '--workers', '1'])
+    assert status == 0
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [event['kind'] for event in events] == ['page', 'page', 'site']
+    assert 'Page 1' in events[1]['text']
+    assert events[2]['result']['num_scraped'] == 2
+
+
+def test_cli_crawls_with_worker_processes(site, tmp_path, capsys):
+    links_out = tmp_path / 'links.txt'
+    status = main(['crawl', site, '--processes', '2', '--backend', f"sqlite://{tmp_path / 'state'}", '--format', 'txt',
+                   '--ignore-robots', '--session', str(tmp_path), '--links-out', str(links_out)])
+    assert status == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == 'found 6 link(s) on 1 site(s)'
+    assert out[1].endswith(f'scraped 6 of 6 page(s), 0 failed, output in {tmp_path}')
+    assert len(links_out.read_text().splitlines()) == 6
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.txt')]) == 7 # The pages and links.txt
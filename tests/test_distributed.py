@@ -0,0 +1,101 @@
+import functools
+import http.server
+import os
+import sqlite3
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp.distributed import (open_frontier_backend, host_partition, distributed_link_discovery,
+                                distributed_scrape, parse_processes_per_worker)
+
+
+def test_sqlite_backend_partitions_leases_and_dedupes(tmp_path):
+    backend = f"sqlite://{tmp_path}"
+    frontier = open_frontier_backend(backend, "crawl", fresh=True)
+    frontier.set_meta('partitions', 2)
+    urls = [f"http://host{i}.example/page" for i in range(6)]
+    assert frontier.push_many([(url, 0, True, False) for url in urls]) == 6
+    assert frontier.push_many([(urls[0], 1, True, True)]) == 0 # Already seen
+
+    other = open_frontier_backend(backend, "crawl") # A second worker's connection
+    claimed = {partition: [url for url, _ in other.claim(partition, 10, f"w{partition}")] for partition in (0, 1)}
+    for partition, partition_urls in claimed.items():
+        assert all(host_partition(url, 2) == partition for url in partition_urls)
+    assert sorted(claimed[0] + claimed[1]) == sorted(urls)
+    assert frontier.claim(0, 10, "w0") == [] # Still leased
+
+    other.complete_many([(url, True) for url in claimed[0]], "w0")
+    assert frontier.outstanding() == len(claimed[1])
+    frontier.lease_seconds = 0 # The worker holding partition 1 "died"
+    assert sorted(url for url, _ in frontier.claim(1, 10, "w1b")) == sorted(claimed[1])
+    other.complete_many([(url, True) for url in claimed[1]], "w1") # Too late: the URLs belong to w1b now
+    assert frontier.outstanding() == len(claimed[1])
+    frontier.complete_many([(url, False) for url in claimed[1]], "w1b")
+    assert frontier.outstanding() == 0
+    assert frontier.found_urls() == sorted(claimed[0])
+    assert frontier.stats()['failed'] == len(claimed[1])
+    frontier.close()
+    other.close()
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "site"
+    root.mkdir()
+    (root / "index.html").write_text(''.join(f'<a href="p{i}.html">{i}</a>' for i in range(6)))
+    for i in range(6):
+        (root / f"p{i}.html").write_text(f'<html><body><p>Page {i}</p><a href="index.html">home</a></body></html>')
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(('localhost', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://localhost:{server.server_address[1]}/"
+    server.shutdown()
+
+
+def test_distributed_discovery_and_scrape_with_worker_processes(site, tmp_path):
+    backend = f"sqlite://{tmp_path / 'state'}"
+    links = distributed_link_discovery(site, processes=2, backend=backend, respect_robots=False)
+    assert links == [site] + [f"{site}p{i}.html" for i in range(6)]
+
+    output_dir = str(tmp_path / "out")
+    os.makedirs(output_dir)
+    session_dir, scraped, total, errors = distributed_scrape('localhost', links + [f"{site}missing.html"], processes=2,
+                                                             backend=backend, existing_session_dir=output_dir)
+    assert (session_dir, scraped, total, errors) == (output_dir, 7, 8, [f"{site}missing.html"])
+    assert len(os.listdir(output_dir)) == 7
+
+
+def test_distributed_discovery_spreads_sites_over_workers(tmp_path):
+    root = tmp_path / "site"
+    root.mkdir()
+    (root / "index.html").write_text('<a href="a.html">a</a><a href="b.html">b</a>')
+    for name in ("a", "b"):
+        (root / f"{name}.html").write_text('<a href="index.html">home</a>')
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(root))
+    servers = {}
+    while len(servers) < 2: # One site in each worker's partition
+        server = http.server.ThreadingHTTPServer(('localhost', 0), handler)
+        url = f"http://localhost:{server.server_address[1]}/"
+        if host_partition(url, 2) in servers:
+            server.server_close()
+            continue
+        servers[host_partition(url, 2)] = (url, server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    sites = [url for url, _ in servers.values()]
+    try:
+        state_dir = tmp_path / "state"
+        links = distributed_link_discovery(sites + sites[:1], processes=2, backend=f"sqlite://{state_dir}",
+                                           crawl_id="sites", respect_robots=False)
+    finally:
+        for _, server in servers.values():
+            server.shutdown()
+    assert links == sorted(f"{site}{page}" for site in sites for page in ("", "a.html", "b.html"))
+    with sqlite3.connect(state_dir / "sites.sqlite") as db:
+        assert db.execute("SELECT COUNT(DISTINCT worker) FROM urls WHERE state = 'done'").fetchone()[0] == 2
+    # Idle local workers lend their CPUs to the busy ones' parse pools
+    assert parse_processes_per_worker(sites, 2, 4) == 2
+    assert parse_processes_per_worker(sites[:1], 2, 4) == 4
@@ -0,0 +1,22 @@
+import os, sys, threading, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.events import EventChannel
+
+
+def test_channel_reports_lost_events_instead_of_skipping():
+    channel = EventChannel(maxlen=3)
+    for i in range(5):
+        channel.publish('log', f'line {i}')
+    events, lost = channel.read(after_seq=0, timeout=0)
+    assert [e['data'] for e in events] == ['line 2', 'line 3', 'line 4']
+    assert lost == 2
+    assert channel.read(after_seq=5, timeout=0) == ([], 0)
+
+
+def test_channel_read_blocks_until_publish():
+    channel = EventChannel()
+    threading.Timer(0.05, channel.publish, args=('progress', {'checked_count': 1})).start()
+    started = time.monotonic()
+    events, _ = channel.read(after_seq=0, timeout=5)
+    assert events[0]['data'] == {'checked_count': 1}
+    assert time.monotonic() - started < 1
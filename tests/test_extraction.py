@@ -0,0 +1,55 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bs4 import BeautifulSoup
+
+from webapp.extraction import (DEFAULT_CONTENT_SELECTORS, DEFAULT_NOISE_SELECTORS, ExtractionRules,
+                               register_domain_rules, rules_for_url)
+
+PAGE = '''<html><body>
+<header>Site header</header>
+<main><p>Main text</p></main>
+<div class="content extra"><h1>Title</h1>
+  <nav>Menu</nav>
+  <p>Intro <b>bold</b></p><!-- a comment -->
+  <div id="sidebar">Side</div>
+  <section><p class="noprint">Hidden</p><p>Kept</p><script>var x;</script></section>
+</div>
+<article><p>Article wins</p><footer>Foot</footer><div role="main">Inner</div></article>
+</body></html>'''
+
+
+def reference_extract(soup):
+    # The original select_one / select + decompose / get_text algorithm.
+    for selector in DEFAULT_CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element:
+            for noisy in DEFAULT_NOISE_SELECTORS:
+                for tag in element.select(noisy):
+                    tag.decompose()
+            return element.get_text(separator='\n', strip=True)
+
+
+def test_extraction_matches_reference_algorithm():
+    rules = ExtractionRules()
+    assert rules.extract(BeautifulSoup(PAGE, 'html.parser')) == ('Article wins\nInner', 'article')
+
+    without_article = PAGE.replace('article', 'span')
+    text, selector = rules.extract(BeautifulSoup(without_article, 'html.parser'))
+    assert selector == 'main'
+    assert text == reference_extract(BeautifulSoup(without_article, 'html.parser'))
+
+    only_div = '<html><body>' + PAGE.split('</main>')[1].split('<article>')[0] + '</body></html>'
+    text, selector = rules.extract(BeautifulSoup(only_div, 'html.parser'))
+    assert selector == 'div.content'
+    assert text == 'Title\nIntro\nbold\nKept'
+    assert text == reference_extract(BeautifulSoup(only_div, 'html.parser'))
+
+
+def test_domain_rules_apply_to_subdomains():
+    register_domain_rules('example.org', content_selectors=['div.content'], noise_selectors=['section > p.noprint', 'h1'])
+    rules = rules_for_url('https://docs.example.org/page')
+    text, selector = rules.extract(BeautifulSoup(PAGE, 'html.parser'))
+    assert selector == 'div.content'
+    assert text == 'Menu\nIntro\nbold\nSide\nKept'
+    assert rules_for_url('https://example.com/') is not rules
@@ -0,0 +1,101 @@
+import http.server
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+import requests
+
+from webapp.fetcher import create_session, fetch_page, ResponseTooLarge, UnsupportedContentType
+from webapp.ratelimit import AdaptiveRateLimiter
+
+
+class FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """Answers 503 with Retry-After on the first request, then 200."""
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        if FlakyHandler.calls == 1:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = self.headers.get('Accept-Encoding', '').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    FlakyHandler.calls = 0
+    server = http.server.ThreadingHTTPServer(('localhost', 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+    thread.join()
+
+
+def test_session_retries_503_and_negotiates_gzip(flaky_server):
+    session = create_session(backoff_factor=0)
+    response = session.get(flaky_server + '/page', timeout=5)
+    assert response.status_code == 200
+    assert FlakyHandler.calls == 2
+    assert 'gzip' in response.text
+
+
+class MixedContentHandler(http.server.BaseHTTPRequestHandler):
+    """Serves a small HTML page, a PDF, and a large page sent without Content-Length."""
+
+    def do_GET(self):
+        if self.path == '/doc.pdf':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', '1000000')
+            self.end_headers()
+            return  # the body is never requested
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        if self.path == '/huge.html':
+            for _ in range(64):
+                self.wfile.write(b'<p>' + b'x' * 4096 + b'</p>')
+        else:
+            self.wfile.write(b'<html><body>ok</body></html>')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetch_page_rejects_non_html_and_oversized_bodies():
+    server = http.server.ThreadingHTTPServer(('localhost', 0), MixedContentHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://localhost:{server.server_address[1]}"
+    try:
+        session = create_session()
+        assert fetch_page(base + '/index.html', session=session, max_bytes=1024).content.endswith(b'ok</body></html>')
+        with pytest.raises(UnsupportedContentType):
+            fetch_page(base + '/doc.pdf', session=session)
+        with pytest.raises(ResponseTooLarge):
+            fetch_page(base + '/huge.html', session=session, max_bytes=100_000)
+        assert isinstance(ResponseTooLarge('x'), requests.exceptions.RequestException)
+    finally:
+        server.shutdown()
+
+
+def test_fetch_page_reports_retried_throttling_to_rate_limiter(flaky_server):
+    limiter = AdaptiveRateLimiter(rate=10)
+    page = fetch_page(flaky_server + '/page', session=create_session(backoff_factor=0), rate_limiter=limiter)
+    assert page.status_code == 200
+    limits = limiter.limits()[flaky_server.split('//')[1]]
+    assert limits['throttled'] == 1  # the 503 was retried away, but the host still asked us to slow down
+    assert limits['rate'] == 5 and limits['in_flight'] == 0
@@ -0,0 +1,20 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.fingerprint import simhash, hamming_distance, NearDuplicateIndex
+
+TEXT = ' '.join(f'word{i % 37} topic{i % 11} section{i}' for i in range(300))
+
+
+def test_near_duplicates_are_found_and_distinct_pages_are_not():
+    index = NearDuplicateIndex(max_distance=3)
+    variant = TEXT.replace('section150 ', 'section150 Last updated today ')
+    other = ' '.join(reversed(TEXT.split()))
+
+    assert hamming_distance(simhash(TEXT)[0], simhash(variant)[0]) <= 3
+    assert index.check_and_add('a', 'hash-a', *simhash(TEXT)) is None
+    assert index.check_and_add('b', 'hash-b', *simhash(variant)) == 'a'
+    assert index.check_and_add('c', 'hash-c', *simhash(other)) is None
+    # Short texts only collapse when they are identical.
+    assert index.check_and_add('d', 'hash-d', *simhash('Page one')) is None
+    assert index.check_and_add('e', 'hash-e', *simhash('Page two')) is None
+    assert index.check_and_add('f', 'hash-d', *simhash('Page one')) == 'd'
@@ -0,0 +1,42 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.frontier import CrawlFrontier, UrlHashSet
+
+
+def test_frontier_breadth_first_order_and_depth_limit():
+    frontier = CrawlFrontier(max_depth=1)
+    assert frontier.push('http://a/', 0)
+    assert frontier.push('http://a/x', 1)
+    assert frontier.push('http://a/x/y', 2)  # seen, but beyond max_depth
+    assert not frontier.push('http://a/x', 1)
+
+    assert 'http://a/x/y' in frontier
+    assert len(frontier) == 2
+    assert frontier.pop() == ('http://a/', 0)
+    assert frontier.pop() == ('http://a/x', 1)
+    assert not frontier
+
+
+def test_frontier_spills_to_disk_and_keeps_order(monkeypatch):
+    monkeypatch.setattr('webapp.frontier.FRONTIER_SPILL_CHUNK', 3)
+    frontier = CrawlFrontier(max_depth=5, memory_items=2)
+    urls = [f'http://a/{i}' for i in range(10)]
+    for url in urls:
+        frontier.push(url, 1)
+    assert frontier._segments  # some of the queue lives on disk
+    assert len(frontier) == 10
+
+    popped = [frontier.pop()[0] for _ in range(4)]
+    frontier.push('http://a/late', 2)
+    while frontier:
+        popped.append(frontier.pop()[0])
+    assert popped == urls + ['http://a/late']
+
+
+def test_url_hash_set_membership_across_merges(monkeypatch):
+    monkeypatch.setattr('webapp.frontier.URL_SET_MERGE_MIN', 4)
+    seen = UrlHashSet()
+    assert all(seen.add(f'http://a/{i}') for i in range(50))
+    assert not seen.add('http://a/7')
+    assert 'http://a/49' in seen and 'http://a/50' not in seen
+    assert len(seen) == 50
@@ -0,0 +1,46 @@
+import functools
+import http.server
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from webapp.fetcher import create_session, fetch_page
+from webapp.httpcache import HttpCache
+
+
+def test_fetch_page_revalidates_with_last_modified(tmp_path):
+    site = tmp_path / 'site'
+    site.mkdir()
+    (site / 'page.html').write_text('<html><body>cached</body></html>')
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(site))
+    server = http.server.ThreadingHTTPServer(('localhost', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://localhost:{server.server_address[1]}/page.html"
+        cache = HttpCache(cache_dir=str(tmp_path / 'cache'))
+        session = create_session()
+
+        first = fetch_page(url, session=session, cache=cache)
+        assert not first.from_cache
+        assert 'If-Modified-Since' in cache.conditional_headers(url)
+
+        second = fetch_page(url, session=session, cache=cache)
+        assert second.from_cache
+        assert second.content == first.content
+    finally:
+        server.shutdown()
+
+
+def test_http_cache_evicts_least_recently_used(tmp_path):
+    cache = HttpCache(cache_dir=str(tmp_path), max_bytes=10)
+    cache.store('http://a/1', 'http://a/1', 'text/html', b'123456', etag='"1"')
+    cache.store('http://a/2', 'http://a/2', 'text/html', b'abcdef', etag='"2"')
+    assert cache.load('http://a/1') is None
+    assert cache.load('http://a/2')[2] == b'abcdef'
+    assert cache.total_bytes() == 6
+
+    # The index survives a reopen.
+    reopened = HttpCache(cache_dir=str(tmp_path), max_bytes=10)
+    assert reopened.conditional_headers('http://a/2') == {'If-None-Match': '"2"'}
@@ -0,0 +1,78 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.jobs import JobManager
+
+
+def test_job_manager_reports_progress_results_and_errors():
+    manager = JobManager(max_workers=2)
+
+    def work(job, n):
+        job.update_progress(done=n)
+        return {'value': n * 2}
+
+    def boom(job):
+        raise RuntimeError('boom')
+
+    ok = manager.submit('test', work, n=21)
+    bad = manager.submit('test', boom)
+    assert ok.done.wait(5) and bad.done.wait(5)
+
+    assert ok.to_dict()['status'] == 'finished'
+    assert ok.to_dict()['progress'] == {'done': 21}
+    assert ok.to_dict()['result'] == {'value': 42}
+    assert bad.to_dict()['status'] == 'failed'
+    assert bad.to_dict()['error'] == 'boom'
+    assert manager.get(ok.id) is ok
+
+
+def test_job_manager_resumes_unfinished_jobs(tmp_path):
+    state_dir = str(tmp_path / 'jobs')
+    first = JobManager(max_workers=1, state_dir=state_dir)
+
+    def work(job, n):
+        return {'value': n, 'resumed': job.resumed}
+
+    done = first.submit('test', work, n=1)
+    assert done.done.wait(5)
+    interrupted = first.submit('test', work, n=2)
+    assert interrupted.done.wait(5)
+    # Pretend the process died while the second job was running.
+    interrupted.status = 'running'
+    interrupted.save()
+
+    second = JobManager(max_workers=1, state_dir=state_dir)
+    resumed = second.resume_jobs({'test': work})
+    assert [job.id for job in resumed] == [interrupted.id]
+    assert resumed[0].done.wait(5)
+    assert resumed[0].to_dict()['result'] == {'value': 2, 'resumed': True}
+    assert second.get(done.id).to_dict()['result'] == {'value': 1, 'resumed': False}
+
+    third = JobManager(max_workers=1, state_dir=state_dir)
+    third.resume_jobs_in_background({'test': work})
+    assert third.get(done.id) is not None  # waits for the saved jobs to load
+    assert {job.id for job in third.list_jobs()} == {done.id, interrupted.id}
+
+
+def test_job_running_in_another_manager_is_not_resumed(tmp_path):
+    import threading
+
+    state_dir = str(tmp_path / 'jobs')
+    release = threading.Event()
+    runs = []
+
+    def work(job):
+        runs.append(job.id)
+        release.wait(5)
+
+    first = JobManager(max_workers=1, state_dir=state_dir)
+    running = first.submit('test', work)
+    second = JobManager(max_workers=1, state_dir=state_dir)
+    assert second.resume_jobs({'test': work}) == [] # Still held by the first manager (another process, in production)
+    release.set()
+    assert running.done.wait(5)
+    assert runs == [running.id]
+
+    running.status = 'running' # As if the first process had died mid-run
+    running.save()
+    resumed = second.resume_jobs({'test': work})
+    assert [job.id for job in resumed] == [running.id] and resumed[0].done.wait(5)
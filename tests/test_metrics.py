@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from webapp.metrics import MetricsRegistry, CrawlProfile, profiling, observe_stage, count_fetch
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.01, 0.1), max_hosts=1)
+    registry.inc('scraper_fetches_total', host='a.example', status='200')
+    registry.inc('scraper_fetches_total', host='a.example', status='200')
+    registry.inc('scraper_fetches_total', host='b.example', status='404') # Over max_hosts
+    registry.observe('scraper_stage_duration_seconds', 0.005, stage='ttfb', host='a.example')
+    registry.observe('scraper_stage_duration_seconds', 0.5, stage='ttfb', host='a.example')
+    text = registry.render()
+    assert '# TYPE scraper_fetches_total counter' in text
+    assert 'scraper_fetches_total{host="a.example",status="200"} 2' in text
+    assert 'scraper_fetches_total{host="other",status="404"} 1' in text
+    assert 'scraper_stage_duration_seconds_bucket{host="a.example",stage="ttfb",le="0.01"} 1' in text
+    assert 'scraper_stage_duration_seconds_bucket{host="a.example",stage="ttfb",le="+Inf"} 2' in text
+    assert 'scraper_stage_duration_seconds_count{host="a.example",stage="ttfb"} 2' in text
+
+
+def test_profile_collects_observations_from_context():
+    profile = CrawlProfile()
+    with profiling(profile):
+        for _ in range(99):
+            observe_stage('parse', 0.002, 'a.example')
+        observe_stage('parse', 3.0, 'a.example')
+        count_fetch('a.example', 200, 1000)
+    observe_stage('parse', 1.0, 'a.example') # Outside the profiled context
+    report = profile.to_dict()
+    parse = report['stages']['parse']
+    assert parse['count'] == 100
+    assert parse['p50_ms'] == 2.5 and parse['max_ms'] == 3000.0
+    assert report['hosts']['a.example']['fetches'] == {'200': 1}
+    assert report['hosts']['a.example']['bytes'] == 1000
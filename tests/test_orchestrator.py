@@ -0,0 +1,87 @@
+import functools
+import http.server
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp.orchestrator import FairRequestBudget, CrawlOrchestrator, group_links_by_site
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_budget_gives_free_slot_to_least_busy_host():
+    budget = FairRequestBudget(max_in_flight=2)
+    budget.acquire('big.example')
+    budget.acquire('big.example')
+    big_waiter = threading.Thread(target=budget.acquire, args=('big.example',), daemon=True)
+    big_waiter.start()
+    wait_for(lambda: len(budget._waiting) == 1)
+    small_waiter = threading.Thread(target=budget.acquire, args=('small.example',), daemon=True)
+    small_waiter.start()
+    wait_for(lambda: len(budget._waiting) == 2)
+
+    budget.release('big.example') # big.example waited longer, but small.example has nothing in flight
+    small_waiter.join(5)
+    assert budget.in_flight('small.example') == 1
+    assert budget.in_flight('big.example') == 1 and big_waiter.is_alive()
+
+    budget.release('small.example')
+    big_waiter.join(5)
+    assert budget.in_flight('big.example') == 2 and budget.in_flight() == 2
+
+
+@pytest.fixture
+def two_sites(tmp_path):
+    servers = []
+    for name in ('a', 'b'):
+        root = tmp_path / name
+        root.mkdir()
+        (root / 'index.html').write_text(f'<html><body><a href="{name}1.html">1</a><a href="{name}2.html">2</a></body></html>')
+        for i in (1, 2):
+            (root / f'{name}{i}.html').write_text(f'<html><body><p>Site {name} page {i}</p></body></html>')
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(root))
+        server = http.server.ThreadingHTTPServer(('localhost', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield [f"http://localhost:{server.server_address[1]}/" for server in servers]
+    for server in servers:
+        server.shutdown()
+
+
+def test_orchestrator_discovers_and_scrapes_sites_into_own_sessions(two_sites, tmp_path):
+    orchestrator = CrawlOrchestrator(max_in_flight=2, max_sites=2)
+    discovered = {url: links for url, links, error in orchestrator.discover(two_sites, respect_robots=False)}
+    assert sorted(discovered) == sorted(two_sites)
+    assert all(len(links) == 3 for links in discovered.values())
+    assert orchestrator.budget.in_flight() == 0
+
+    site_links = group_links_by_site([link for links in discovered.values() for link in links])
+    assert len(site_links) == 2
+    session_dirs = {site: str(tmp_path / f"out_{i}") for i, site in enumerate(site_links)}
+    for directory in session_dirs.values():
+        os.makedirs(directory)
+    results = {site: outcome for site, outcome, error in orchestrator.scrape(site_links, session_dirs=session_dirs)}
+    for site, (output_dir, scraped, total, errors) in results.items():
+        assert output_dir == session_dirs[site]
+        assert (scraped, total, errors) == (3, 3, [])
+        assert len([f for f in os.listdir(output_dir) if f.endswith('.txt')]) == 3
+
+
+def test_orchestrator_discovers_repeated_base_url_once(two_sites):
+    orchestrator = CrawlOrchestrator(max_in_flight=2, max_sites=2)
+    progress = []
+    results = list(orchestrator.discover([two_sites[0], two_sites[1], two_sites[0]], run_id='job-1', respect_robots=False,
+                                         progress_callback=lambda base_url, stats: progress.extend(stats['new_links'])))
+    assert sorted(url for url, _, _ in results) == sorted(two_sites)
+    assert all(error is None and len(links) == 3 for _, links, error in results)
+    assert len(progress) == len(set(progress)) == 6
@@ -0,0 +1,25 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp.fetcher import FetchedPage
+from webapp.pagestore import PageStore
+
+
+def make_page(url, body, fetched_at=None):
+    return FetchedPage(url, url, 200, 'text/html', body, fetched_at)
+
+
+def test_page_store_spills_to_disk_and_expires(tmp_path):
+    store = PageStore(max_memory_bytes=10, max_disk_bytes=1000, ttl=60, spill_dir=str(tmp_path))
+    store.put('http://a/1', make_page('http://a/1', b'0123456789'))
+    store.put('http://a/2', make_page('http://a/2', b'abcdefghij'))  # pushes page 1 to disk
+
+    assert 'http://a/1' in store
+    assert store.get('http://a/1').content == b'0123456789'
+    assert store.get('http://a/2').content == b'abcdefghij'
+
+    store.put('http://a/old', make_page('http://a/old', b'x', fetched_at=0))
+    assert store.get('http://a/old') is None
+    assert 'http://a/missing' not in store
+
+    store.clear()
+    assert len(store) == 0
@@ -0,0 +1,50 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from webapp.extraction import ExtractionRules
+from webapp.parsepool import ParsePool
+
+PAGE = (
+    '<html><body><nav><a href="/home">Home</a></nav>'
+    '<main><h1>Title</h1><p>Body text</p><aside>noise</aside><a href="docs/next.html">Next</a></main>'
+    '</body></html>'
+).encode('utf-8')
+
+
+def test_parse_pool_matches_in_thread_parsing():
+    rules = ExtractionRules(noise_selectors=['nav', 'aside'])
+    inline = ParsePool(processes=1)
+    pool = ParsePool(processes=2, min_bytes=0)
+    try:
+        hrefs, seconds = pool.links(PAGE, 'text/html; charset=utf-8')
+        assert hrefs == inline.links(PAGE, 'text/html; charset=utf-8')[0] == ['/home', 'docs/next.html']
+        assert seconds >= 0
+        text, selector, parse_seconds, extract_seconds = pool.text(PAGE, rules)
+        assert (text, selector) == inline.text(PAGE, rules)[:2]
+        assert selector == 'main' and text == 'Title\nBody text\nNext'
+        assert parse_seconds >= 0 and extract_seconds >= 0
+        assert pool._executor is not None # Parsed in the worker processes, not in-thread
+    finally:
+        pool.close()
+    assert pool._executor is None
+
+
+def test_parse_pool_falls_back_in_thread_without_semaphores(monkeypatch):
+    import multiprocessing.synchronize
+
+    def no_semaphores(*args, **kwargs):
+        raise OSError(38, "Function not implemented") # As on AWS Lambda
+    monkeypatch.setattr(multiprocessing.synchronize.SemLock, '__init__', no_semaphores)
+    pool = ParsePool(processes=2, min_bytes=0)
+    assert pool.links(PAGE)[0] == ['/home', 'docs/next.html']
+    assert pool.processes == 1 and pool._executor is None
+    assert pool.links(PAGE)[0] == ['/home', 'docs/next.html']
+
+
+def test_parse_pool_parses_in_thread_during_web_requests():
+    from flask import Flask
+
+    pool = ParsePool(processes=2, min_bytes=0)
+    with Flask(__name__).test_request_context('/'):
+        assert pool.links(PAGE)[0] == ['/home', 'docs/next.html']
+    assert pool._executor is None
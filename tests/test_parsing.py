@@ -0,0 +1,26 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp import parsing
+from webapp.parsing import extract_hrefs, make_soup
+
+PAGE = (
+    '<html><head><title>t</title></head><body>'
+    '<a href="/a">A</a><a name="anchor">no href</a>'
+    '<div><a href="b.html?x=1&amp;y=2">B</a></div>'
+    '<a href="https://other.example/café">C</a>'
+    '</body></html>'
+).encode('utf-8')
+
+EXPECTED = ['/a', 'b.html?x=1&y=2', 'https://other.example/café']
+
+
+@pytest.mark.parametrize('backend', ['html.parser', 'lxml'])
+def test_extract_hrefs_matches_soup(backend):
+    if backend == 'lxml' and parsing.lxml_etree is None:
+        pytest.skip('lxml not installed')
+    hrefs = extract_hrefs(PAGE, 'text/html; charset=utf-8', backend=backend)
+    assert hrefs == EXPECTED
+    assert hrefs == [a['href'] for a in make_soup(PAGE).find_all('a', href=True)]
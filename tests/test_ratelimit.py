@@ -0,0 +1,75 @@
+import os, sys, threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from webapp import ratelimit
+from webapp.ratelimit import HostRateLimiter, AdaptiveRateLimiter, ADAPTIVE_RATE_STEP
+
+
+def test_host_rate_limiter_is_per_host():
+    limiter = HostRateLimiter(rate=10)  # one request per 0.1s per host
+    assert limiter.acquire('http://a.example/page1') == 0
+    assert limiter.acquire('http://b.example/page1') == 0  # other host is not delayed
+    waited = limiter.acquire('http://a.example/page2')
+    assert 0.05 < waited <= 0.1
+
+
+def test_adaptive_limiter_increases_additively_and_backs_off_multiplicatively():
+    limiter = AdaptiveRateLimiter(rate=20, max_rate=40, initial_concurrency=2, max_concurrency=3)
+    host = 'a.example'
+    for _ in range(2):  # one window of healthy responses at concurrency 2
+        limiter.acquire(host)
+        limiter.record(host, 200, ttfb=0.01)
+    assert limiter.limits()[host]['rate'] == 20 + ADAPTIVE_RATE_STEP
+    assert limiter.limits()[host]['concurrency'] == 3
+
+    limiter.acquire(host)
+    limiter.record(host, 429)
+    limits = limiter.limits()[host]
+    assert limits['rate'] == (20 + ADAPTIVE_RATE_STEP) / 2
+    assert limits['concurrency'] == 1
+    assert limits['throttled'] == 1 and limits['in_flight'] == 0
+
+    # Failures of requests already in flight don't back off again right away, and growth pauses after a decrease.
+    limiter.acquire(host)
+    limiter.record(host, 'error')
+    limiter.acquire(host)
+    limiter.record(host, 200, ttfb=0.01)
+    assert limiter.limits()[host] == dict(limits, errors=1, ttfb_ms=10.0)
+
+
+def test_adaptive_limiter_backs_off_when_ttfb_rises(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'INCREASE_COOLDOWN', 0)
+    limiter = AdaptiveRateLimiter(rate=100, initial_concurrency=1)
+    for ttfb in [0.1] * 3 + [1.0] * 3:
+        limiter.acquire('slow.example')
+        limiter.record('slow.example', 200, ttfb=ttfb)
+    assert limiter.limits()['slow.example']['rate'] < 100 + 3 * ADAPTIVE_RATE_STEP
+
+
+def test_adaptive_limiter_caps_concurrency_and_honors_set_rate():
+    limiter = AdaptiveRateLimiter(rate=1000, initial_concurrency=1)
+    limiter.set_rate('b.example', 0.5)  # e.g. Crawl-delay: 2
+    assert limiter.limits()['b.example']['rate'] == 0.5
+    limiter.acquire('c.example')
+    released = threading.Event()
+
+    def second_request():
+        limiter.acquire('c.example')
+        released.set()
+        limiter.record('c.example', 200)
+
+    thread = threading.Thread(target=second_request)
+    thread.start()
+    assert not released.wait(0.1)  # only one request in flight per host at concurrency 1
+    limiter.record('c.example', 200)
+    assert released.wait(1)
+    thread.join()
+
+
+def test_adaptive_limiter_tightens_timeout_for_fast_hosts():
+    limiter = AdaptiveRateLimiter(rate=1000, max_concurrency=100)
+    assert limiter.timeout_for('fast.example', 15) == 15
+    for _ in range(ratelimit.TIMEOUT_MIN_SAMPLES):
+        limiter.acquire('fast.example')
+        limiter.record('fast.example', 200, ttfb=0.01)
+    assert limiter.timeout_for('fast.example', 15) == ratelimit.ADAPTIVE_MIN_TIMEOUT
+    assert limiter.timeout_for('other.example', 15) == 15
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from webapp.scope import CrawlScope, compile_patterns
+
+
+def test_default_scope_is_host_and_path_prefix_without_binary_files():
+    scope = CrawlScope('https://example.com/docs/')
+    assert scope.allows('https://example.com/docs/intro')
+    assert scope.allows('https://example.com/docs/api?format=html')
+    assert not scope.allows('https://example.com/blog/')
+    assert not scope.allows('https://docs.example.com/docs/')
+    assert not scope.allows('http://example.com/docs/intro')
+    assert not scope.allows('https://example.com.evil.net/docs/')
+    assert not scope.allows('https://example.com/docs/manual.PDF')
+    assert not scope.allows('https://example.com/docs/logo.png?v=2')
+    assert 'https://example.com/docs/pdf-guide' in scope
+
+
+def test_subdomains_patterns_and_batch_filter():
+    scope = CrawlScope('https://www.example.com/', allow_subdomains=True, path_prefix=False,
+                       include=['*/docs/*', 're:/v[0-9]+/'], exclude=['*/docs/archive/*', 're:[?&]page=\\d+'],
+                       blocked_extensions=['zip'])
+    urls = ['https://docs.example.com/docs/a', 'https://example.com/v2/b', 'https://www.example.com/blog/c',
+            'https://www.example.com/docs/archive/d', 'https://www.example.com/docs/e?page=3',
+            'https://www.example.com/docs/f.pdf', 'https://www.example.com/docs/g.zip', 'https://badexample.com/docs/h']
+    assert scope.filter(urls) == ['https://docs.example.com/docs/a', 'https://example.com/v2/b',
+                                  'https://www.example.com/docs/f.pdf']
+    assert [url for url in urls if scope.allows(url)] == scope.filter(urls)
+    assert compile_patterns([]) is None
@@ -3,6 +3,7 @@ import socket
 import threading
 import os
 import functools
+import json
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -70,3 +71,130 @@ def test_scrape_selected_pages(tmp_path, local_site):
     files = os.listdir(tmp_path)
     assert any('index' in f for f in files)
     assert any('page2' in f for f in files)
+
+
+def test_scrape_writes_profile(tmp_path, local_site):
+    base_url, port = local_site
+    scrape_selected_pages('localhost', [f"{base_url}/index.html", f"{base_url}/page2.html"],
+                          existing_session_dir=str(tmp_path), profile=True)
+    with open(tmp_path / 'profile.json', encoding='utf-8') as f:
+        profile = json.load(f)
+    assert profile['pages'] == {'added': 2}
+    assert {'parse', 'extract', 'write'} <= set(profile['stages'])
+    assert sum(sum(host['fetches'].values()) for host in profile['hosts'].values()) <= 2
+
+
+def test_link_discovery_applies_scope_rules(tmp_path, local_site):
+    base_url, port = local_site
+    (tmp_path / 'index.html').write_text('<a href="page2.html">2</a><a href="skip/page3.html">3</a><a href="guide.pdf">pdf</a>')
+    links = start_link_discovery(base_url, resume=False, checkpoint_path=None, respect_robots=False,
+                                 scope_rules={'exclude': ['*/skip/*']})
+    assert links == [f"{base_url}/", f"{base_url}/page2.html"]
+
+
+def test_start_link_discovery_page_limit(local_site):
+    base_url, _ = local_site
+    # Only the start page is fetched; links found on it are still reported.
+    links = start_link_discovery(base_url, max_pages=1)
+    assert any('page2.html' in url for url in links)
+
+    # Depth 0 keeps the start page's links out of the frontier, but they are still discovered.
+    links = start_link_discovery(base_url, max_depth=0)
+    assert any('page2.html' in url for url in links)
+
+
+def test_incremental_scrape_only_rewrites_changed_pages(tmp_path, local_site):
+    import json
+    from webapp.httpcache import HttpCache
+    from webapp.pagestore import PageStore
+
+    base_url, _ = local_site
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    links = [f"{base_url}/index.html", f"{base_url}/page2.html"]
+
+    def scrape(urls):
+        return scrape_selected_pages('localhost', urls, existing_session_dir=str(out_dir), incremental=True,
+                                     page_store=PageStore(), http_cache=HttpCache(cache_dir=str(tmp_path / 'cache')))
+
+    scrape(links)
+    changes = lambda: json.loads(max(out_dir.glob('changes_*.json')).read_text())
+    assert sorted(changes()['added']) == sorted(links)
+
+    for f in out_dir.glob('changes_*.json'):
+        f.unlink()
+    page2 = tmp_path / 'page2.html'
+    page2.write_text('<html><body><p>Page 2, edited</p></body></html>')
+    os.utime(page2, (page2.stat().st_mtime + 10, page2.stat().st_mtime + 10))
+
+    _, scraped, _, errors = scrape(links[1:])
+    assert scraped == 1 and not errors
+    report = changes()
+    assert report['changed'] == [links[1]]
+    assert report['removed'] == [links[0]]
+    assert not any(f.name.startswith('index') for f in out_dir.iterdir())
+    manifest = json.loads((out_dir / 'manifest.json').read_text())
+    assert list(manifest['pages']) == [links[1]]
+
+
+def test_scrape_collapses_duplicate_pages(tmp_path, local_site):
+    from webapp.httpcache import HttpCache
+    from webapp.pagestore import PageStore
+
+    base_url, _ = local_site
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    links = [f"{base_url}/page2.html", f"{base_url}/page2.html?utm_source=feed", f"{base_url}/index.html"]
+    statuses, host_limits = {}, {}
+
+    def on_progress(stats):
+        statuses[stats['url']] = stats['status']
+        host_limits.update(stats['host_limits'])
+
+    output_dir, scraped, total, errors = scrape_selected_pages('test', links, existing_session_dir=str(out_dir), progress_callback=on_progress,
+                                                               page_store=PageStore(), http_cache=HttpCache(cache_dir=str(tmp_path / 'cache')))
+    assert (scraped, total, errors) == (2, 3, [])
+    assert statuses[links[1]] == 'duplicate'
+    assert host_limits[base_url.split('//')[1]]['rate'] > 0  # the rate limiter's current limits ride along with progress
+    assert len([name for name in os.listdir(output_dir) if name.endswith('.txt')]) == 2
+
+
+def test_scrape_to_jsonl_bundle_and_incremental_update(tmp_path, local_site):
+    from webapp.httpcache import HttpCache
+    from webapp.pagestore import PageStore
+
+    base_url, _ = local_site
+    links = [f"{base_url}/index.html", f"{base_url}/page2.html"]
+    session_dir = tmp_path / 'out'
+    session_dir.mkdir()
+    caches = {'page_store': PageStore(), 'http_cache': HttpCache(cache_dir=str(tmp_path / 'cache'))}
+    output_dir, scraped, total, errors = scrape_selected_pages('test', links, existing_session_dir=str(session_dir),
+                                                               output_format='jsonl', **caches)
+    assert (scraped, total, errors) == (2, 2, [])
+    bundles = [name for name in os.listdir(output_dir) if name.endswith('.jsonl')]
+    assert len(bundles) == 1 and not [name for name in os.listdir(output_dir) if name.endswith('.txt')]
+
+    # The bundle stays while the unchanged page still points into it.
+    scrape_selected_pages('test', links[:1], existing_session_dir=output_dir, incremental=True, output_format='txt', **caches)
+    with open(os.path.join(output_dir, 'manifest.json')) as f:
+        pages = json.load(f)['pages']
+    assert list(pages) == links[:1] and pages[links[0]]['file'] == bundles[0]
+    assert os.path.exists(os.path.join(output_dir, bundles[0]))
+
+
+def test_discovery_follows_start_page_redirected_to_https(monkeypatch, tmp_path):
+    from webapp import scraper
+    from webapp.fetcher import FetchedPage
+
+    pages = {'https://example.com/docs/': '<a href="/docs/a">A</a><a href="http://example.com/docs/b">B</a><a href="/blog/">Blog</a>',
+             'https://example.com/docs/a': '<a href="b">B</a>',
+             'https://example.com/docs/b': '<p>B</p>'}
+
+    def fake_fetch(url, **kwargs):
+        final_url = url.replace('http://', 'https://', 1)
+        return FetchedPage(url, final_url, 200, 'text/html', pages[final_url].encode())
+
+    monkeypatch.setattr(scraper, 'fetch_page', fake_fetch)
+    links = start_link_discovery('http://example.com/docs/', respect_robots=False,
+                                 checkpoint_path=str(tmp_path / 'discover.sqlite'))
+    assert links == ['https://example.com/docs/', 'https://example.com/docs/a', 'https://example.com/docs/b']
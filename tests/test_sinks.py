@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+import sys
+import tarfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp.sinks import create_sink, TextFileSink
+
+
+def _write_pages(sink):
+    for i in range(3):
+        sink.write(f'http://example.com/page{i}', f'text {i}', f'hash{i}')
+    sink.close()
+
+
+def test_jsonl_sink_batches_and_reports_flushed_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr('webapp.sinks.SINK_BATCH_RECORDS', 2)
+    flushed = []
+    sink = create_sink('jsonl', str(tmp_path), on_flush=flushed.append)
+    sink.write('http://example.com/a', 'first', 'h1')
+    assert flushed == []  # still buffered
+    entry, _ = sink.write('http://example.com/b', 'second', 'h2')
+    assert [url for url, _ in flushed[0]] == ['http://example.com/a', 'http://example.com/b']
+    sink.close()
+
+    with open(tmp_path / entry['file'], encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [(r['url'], r['text'], r['sha256']) for r in records] == [('http://example.com/a', 'first', 'h1'), ('http://example.com/b', 'second', 'h2')]
+
+
+def test_compressed_bundles_confirm_pages_on_close(tmp_path):
+    flushed = []
+    sink = create_sink('jsonl.gz', str(tmp_path), on_flush=flushed.extend)
+    _write_pages(sink)
+    assert len(flushed) == 3
+    with gzip.open(sink.path, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['text'] for line in f] == ['text 0', 'text 1', 'text 2']
+
+    sink = create_sink('tar.gz', str(tmp_path))
+    _write_pages(sink)
+    with tarfile.open(sink.path) as tar:
+        assert tar.getnames() == ['page0.txt', 'page1.txt', 'page2.txt']
+        assert tar.extractfile('page1.txt').read().decode().endswith('text 1')
+
+    assert len([name for name in os.listdir(tmp_path)]) == 2  # two bundles instead of one file per page
+    assert isinstance(create_sink('txt', str(tmp_path)), TextFileSink)
+
+
+def test_optional_formats(tmp_path):
+    pytest.importorskip('pyarrow')
+    pytest.importorskip('zstandard')
+    for output_format in ('parquet', 'jsonl.zst', 'tar.zst'):
+        sink = create_sink(output_format, str(tmp_path))
+        _write_pages(sink)
+        assert os.path.getsize(sink.path) > 0
@@ -0,0 +1,96 @@
+import functools
+import gzip
+import http.server
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from webapp.httpcache import HttpCache
+from webapp.pagestore import PageStore
+from webapp.ratelimit import HostRateLimiter
+from webapp.scraper import start_link_discovery, scrape_selected_pages
+from webapp.sitemap import LastmodRegistry, RobotsCache, parse_lastmod
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+@pytest.fixture
+def sitemap_site(tmp_path):
+    sock = socket.socket()
+    sock.bind(("localhost", 0))
+    host, port = sock.getsockname()
+    sock.close()
+    base = f"http://{host}:{port}"
+
+    (tmp_path / 'robots.txt').write_text(f"User-agent: *\nDisallow: /private/\nCrawl-delay: 2\nSitemap: {base}/sitemap_index.xml\n")
+    (tmp_path / 'sitemap_index.xml').write_text(
+        f'<?xml version="1.0"?><sitemapindex {NS}><sitemap><loc>{base}/pages.xml.gz</loc></sitemap></sitemapindex>')
+    urls = ''.join(f'<url><loc>{base}/{path}</loc><lastmod>2020-01-01</lastmod></url>'
+                   for path in ['a.html', 'b.html?utm_source=x', 'private/secret.html'])
+    (tmp_path / 'pages.xml.gz').write_bytes(gzip.compress(f'<?xml version="1.0"?><urlset {NS}>{urls}</urlset>'.encode()))
+    (tmp_path / 'a.html').write_text('<html><body><p>Page A</p></body></html>')
+
+    requested = []
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            requested.append(self.path)
+
+    server = http.server.ThreadingHTTPServer((host, port), functools.partial(Handler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield base, requested
+    server.shutdown()
+    thread.join()
+
+
+def test_sitemap_mode_lists_urls_without_crawling(sitemap_site):
+    base, requested = sitemap_site
+    limiter = HostRateLimiter(rate=100)
+    links = start_link_discovery(base + '/', discovery_mode='sitemap', rate_limiter=limiter, checkpoint_path=None)
+
+    assert links == [f'{base}/a.html', f'{base}/b.html']
+    assert not any(path.endswith('.html') for path in requested)
+    assert limiter._host_rates[base.split('//')[1]] == 0.5  # Crawl-delay: 2
+    assert not RobotsCache().can_fetch(f'{base}/private/secret.html')
+
+
+def test_incremental_scrape_skips_pages_older_than_lastmod(sitemap_site, tmp_path):
+    base, requested = sitemap_site
+    url = f'{base}/a.html'
+    session_dir = tmp_path / 'out'
+    session_dir.mkdir()
+    output_dir, scraped, _, _ = scrape_selected_pages('test', [url], existing_session_dir=str(session_dir), page_store=PageStore(),
+                                                      http_cache=HttpCache(cache_dir=str(tmp_path / 'cache')))
+    assert scraped == 1
+
+    lastmods = LastmodRegistry()
+    lastmods.record(url, '2020-01-01T00:00:00Z')
+    fetches = requested.count('/a.html')
+    statuses = []
+    scrape_selected_pages('test', [url], existing_session_dir=output_dir, incremental=True, lastmods=lastmods,
+                          progress_callback=lambda stats: statuses.append(stats['status']))
+    assert statuses == ['unchanged']
+    assert requested.count('/a.html') == fetches
+    assert parse_lastmod('2020-01-01') == parse_lastmod('2020-01-01T00:00:00+00:00')
+
+
+def test_scrape_skips_pages_disallowed_by_robots(sitemap_site, tmp_path):
+    base, requested = sitemap_site
+    session_dir = tmp_path / 'out'
+    session_dir.mkdir()
+    urls = [f'{base}/a.html', f'{base}/private/secret.html']
+    limiter = HostRateLimiter(rate=100)
+    statuses = {}
+    _, scraped, total, errors = scrape_selected_pages('test', urls, existing_session_dir=str(session_dir), rate_limiter=limiter,
+                                                      page_store=PageStore(), http_cache=HttpCache(cache_dir=str(tmp_path / 'cache')),
+                                                      progress_callback=lambda stats: statuses.update({stats['url']: stats['status']}))
+    assert (scraped, total, errors) == (1, 2, [])
+    assert statuses == {urls[0]: 'added', urls[1]: 'disallowed'}
+    assert '/private/secret.html' not in requested
+    assert limiter._host_rates[base.split('//')[1]] == 0.5  # Crawl-delay: 2
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import re
+import sys
+import uuid
+
+
+def _add_concurrency_arguments(parser, orchestrator_defaults):
+    max_in_flight, max_sites, workers = orchestrator_defaults
+    group = parser.add_argument_group("concurrency")
+    group.add_argument("--workers", type=int, default=workers, help=f"Fetch threads per site (default {workers})")
+    group.add_argument("--max-in-flight", type=int, default=max_in_flight,
+                       help=f"Requests in flight across all sites (default {max_in_flight})")
+    group.add_argument("--max-sites", type=int, default=max_sites, help=f"Sites crawled at once (default {max_sites})")
+
+
+def _add_scrape_arguments(parser, output_formats, output_format):
+    group = parser.add_argument_group("output")
+    group.add_argument("--format", dest="output_format", choices=output_formats, default=output_format,
+                       help=f"Output sink for scraped pages (default {output_format})")
+    group.add_argument("--session", metavar="DIR",
+                       help="Existing session directory to update or resume (only when all URLs are on one host)")
+    group.add_argument("--incremental", action="store_true", help="Only rewrite pages that changed since --session was scraped")
+    group.add_argument("--jsonl", action="store_true", help="Print every event as a JSON line on stdout")
+    group.add_argument("--text", action="store_true", help="Include extracted page text in --jsonl output")
+
+
+def _add_distributed_arguments(parser, frontier_backend):
+    group = parser.add_argument_group("distributed", "Spread the crawl over worker processes that share a frontier "
+                                                     "(see webapp/distributed.py); pages are written as .txt files")
+    group.add_argument("--processes", type=int, default=0,
+                       help="Local worker processes (default 0: crawl in this process, with threads)")
+    group.add_argument("--partitions", type=int,
+                       help="Host partitions, if more than --processes; the others wait for 'worker' processes started separately")
+    group.add_argument("--crawl-id", help="Name of the distributed crawl, for 'worker' processes to join (default: random)")
+    group.add_argument("--backend", default=frontier_backend, help=f"Frontier backend (default {frontier_backend})")
+
+
+def build_parser():
+    from .orchestrator import MAX_IN_FLIGHT, MAX_CONCURRENT_SITES
+    from .scraper import MAX_DISCOVERY_DEPTH, MAX_WORKERS, DISCOVERY_MODE, DISCOVERY_MODES
+    from .sinks import OUTPUT_FORMAT, OUTPUT_FORMATS
+    from .distributed import FRONTIER_BACKEND
+
+    orchestrator_defaults = MAX_IN_FLIGHT, MAX_CONCURRENT_SITES, MAX_WORKERS
+    parser = argparse.ArgumentParser(prog="python -m webapp", description="Crawl and scrape websites without the web app.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    crawl = commands.add_parser("crawl", help="Discover links on base URLs, then scrape them")
+    crawl.add_argument("base_urls", nargs="+", metavar="URL")
+    limits = crawl.add_argument_group("discovery")
+    limits.add_argument("--max-depth", type=int, default=MAX_DISCOVERY_DEPTH, help=f"Link depth to follow (default {MAX_DISCOVERY_DEPTH})")
+    limits.add_argument("--max-pages", type=int, help="Pages fetched per base URL during discovery (default unlimited)")
+    limits.add_argument("--mode", dest="discovery_mode", choices=DISCOVERY_MODES, default=DISCOVERY_MODE,
+                        help=f"Follow links, list sitemaps, or both (default {DISCOVERY_MODE})")
+    limits.add_argument("--include", action="append", metavar="PATTERN", help="Only follow URLs matching a glob or re:regex (repeatable)")
+    limits.add_argument("--exclude", action="append", metavar="PATTERN", help="Never follow URLs matching a glob or re:regex (repeatable)")
+    limits.add_argument("--allow-subdomains", action="store_true", help="Follow links to subdomains of the base URL's site")
+    limits.add_argument("--ignore-robots", action="store_true", help="Ignore robots.txt rules and Crawl-delay")
+    limits.add_argument("--links-out", metavar="FILE", help="Also write the discovered links to FILE, one per line")
+    crawl.add_argument("--discover-only", action="store_true", help="Stop after discovery")
+    crawl.add_argument("--resume", action="store_true", help="Continue an interrupted crawl from its checkpoints")
+    _add_concurrency_arguments(crawl, orchestrator_defaults)
+    _add_scrape_arguments(crawl, OUTPUT_FORMATS, OUTPUT_FORMAT)
+    _add_distributed_arguments(crawl, FRONTIER_BACKEND)
+
+    scrape = commands.add_parser("scrape", help="Scrape a list of URLs")
+    scrape.add_argument("urls", nargs="*", metavar="URL")
+    scrape.add_argument("--urls-file", metavar="FILE", help="Read URLs from FILE, one per line ('-' for stdin)")
+    scrape.add_argument("--resume", action="store_true", help="Continue an interrupted scrape into --session")
+    scrape.add_argument("--ignore-robots", action="store_true", help="Ignore robots.txt rules and Crawl-delay")
+    _add_concurrency_arguments(scrape, orchestrator_defaults)
+    _add_scrape_arguments(scrape, OUTPUT_FORMATS, OUTPUT_FORMAT)
+    _add_distributed_arguments(scrape, FRONTIER_BACKEND)
+
+    # Parsed by webapp.distributed itself; listed here for --help.
+    commands.add_parser("worker", help="Run one worker process of a distributed crawl: worker CRAWL_ID WORKER_INDEX [--backend URL]")
+    return parser
+
+
+def _read_urls(path):
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _session_dirs(parser, args, urls):
+    """--session applies to the one host being scraped; several hosts each get their own new directory."""
+    if not args.session:
+        return None
+    from .orchestrator import group_links_by_site
+
+    sites = list(group_links_by_site(urls))
+    if len(sites) > 1:
+        parser.error(f"--session can only be used when all URLs are on one host, not {len(sites)}")
+    return {site: args.session for site in sites}
+
+
+async def _consume(events, args, links_out=None):
+    """Prints events, returns the number of sites that failed."""
+    failed = 0
+    async for event in events:
+        if event.kind == "link" and links_out is not None:
+            links_out.write(event.url + "\n")
+        if args.jsonl:
+            print(json.dumps(event.to_dict(include_text=args.text)), flush=True)
+        elif event.kind == "site":
+            result = event.result
+            if event.status == "discover":
+                summary = f"found {result['num_links']} link(s)"
+            else:
+                summary = (f"scraped {result['num_scraped']} of {result['num_selected']} page(s), "
+                           f"{len(result['errors'])} failed, output in {result['output_directory']}")
+            print(f"{event.site}: {summary}" + (f" (error: {event.error})" if event.error else ""), flush=True)
+        if event.kind == "site" and event.error is not None:
+            failed += 1
+    return failed
+
+
+def _run_distributed(parser, args, base_urls=None, urls=None, scope_rules=None):
+    """crawl / scrape with --processes: discovers base_urls, or scrapes urls, with webapp.distributed. Returns the exit status."""
+    unsupported = [flag for flag, used in (("--incremental", args.incremental), ("--resume", args.resume), ("--jsonl", args.jsonl),
+                                           ("--max-pages", getattr(args, 'max_pages', None) is not None),
+                                           (f"--format {args.output_format}", args.output_format != "txt"),
+                                           ("--mode", getattr(args, 'discovery_mode', 'crawl') != "crawl")) if used]
+    if unsupported:
+        parser.error(f"{', '.join(unsupported)} can't be combined with --processes")
+    if args.processes < 1 or (args.partitions or args.processes) < args.processes:
+        parser.error("--processes must be at least 1, and --partitions at least --processes")
+    from .distributed import distributed_link_discovery, distributed_scrape
+    from .orchestrator import group_links_by_site
+
+    crawl_id = args.crawl_id or f"cli_{uuid.uuid4().hex[:12]}"
+    options = {'processes': args.processes, 'partitions': args.partitions, 'backend': args.backend, 'threads': args.workers,
+               'respect_robots': not args.ignore_robots}
+
+    def announce(crawl_id):
+        if args.partitions and args.partitions > args.processes:
+            print(f"Crawl {crawl_id} waits for workers {args.processes}-{args.partitions - 1}: "
+                  f"python -m webapp worker {crawl_id} INDEX --backend {args.backend}", flush=True)
+
+    if base_urls:
+        announce(crawl_id)
+        try:
+            urls = distributed_link_discovery(base_urls, crawl_id=crawl_id, max_depth=args.max_depth, scope_rules=scope_rules, **options)
+        except Exception as e:
+            print(f"discovery failed (error: {e})", flush=True)
+            return 1
+        print(f"found {len(urls)} link(s) on {len(base_urls)} site(s)", flush=True)
+        if args.links_out:
+            with open(args.links_out, "w", encoding="utf-8") as links_out:
+                links_out.writelines(url + "\n" for url in urls)
+        if args.discover_only or not urls:
+            return 0
+
+    session_dirs = _session_dirs(parser, args, urls) or {}
+    failed = 0
+    for index, (site, site_urls) in enumerate(group_links_by_site(urls).items()):
+        site_crawl_id = f"{crawl_id}_scrape{index}"
+        announce(site_crawl_id)
+        try:
+            session_dir, scraped, total, errors = distributed_scrape(f"http://{site}", site_urls, crawl_id=site_crawl_id,
+                                                                     existing_session_dir=session_dirs.get(site), **options)
+        except Exception as e:
+            print(f"{site}: scrape failed (error: {e})", flush=True)
+            failed += 1
+            continue
+        print(f"{site}: scraped {scraped} of {total} page(s), {len(errors)} failed, output in {session_dir}", flush=True)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """Entry point for python -m webapp. Returns the process exit status: 1 if any site's crawl failed."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["worker"]:
+        from .distributed import main as worker_main
+
+        worker_main(argv[1:])
+        return 0
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    from . import crawler
+    from .orchestrator import CrawlOrchestrator
+
+    orchestrator = CrawlOrchestrator(max_in_flight=args.max_in_flight, max_sites=args.max_sites, workers=args.workers)
+    scrape_options = {'output_format': args.output_format, 'incremental': args.incremental, 'resume': args.resume,
+                      'respect_robots': not args.ignore_robots}
+
+    if args.command == "scrape":
+        urls = args.urls + (_read_urls(args.urls_file) if args.urls_file else [])
+        if not urls:
+            parser.error("no URLs to scrape (pass them as arguments or with --urls-file)")
+        if args.processes:
+            return _run_distributed(parser, args, urls=urls)
+        events = crawler.scrape(urls, session_dirs=_session_dirs(parser, args, urls), orchestrator=orchestrator, **scrape_options)
+        return 1 if asyncio.run(_consume(events, args)) else 0
+
+    from .scope import scope_for
+
+    # Only the options given, so the rest keep their SCRAPER_SCOPE_RULES defaults
+    scope_rules = {key: value for key, value in (('include', args.include), ('exclude', args.exclude),
+                                                 ('allow_subdomains', args.allow_subdomains)) if value}
+    try:
+        scope_for(args.base_urls[0], scope_rules) # Fail on a bad pattern before anything is fetched
+    except re.error as e:
+        parser.error(f"invalid --include/--exclude pattern: {e}")
+    if args.processes:
+        return _run_distributed(parser, args, base_urls=args.base_urls, scope_rules=scope_rules)
+    discovery_options = {'max_depth': args.max_depth, 'max_pages': args.max_pages, 'discovery_mode': args.discovery_mode,
+                         'scope_rules': scope_rules, 'respect_robots': not args.ignore_robots, 'resume': args.resume}
+    if args.discover_only:
+        events = crawler.discover(args.base_urls, orchestrator=orchestrator, **discovery_options)
+    else:
+        events = crawler.crawl(args.base_urls, session_dirs=_session_dirs(parser, args, args.base_urls), orchestrator=orchestrator,
+                               discovery_options=discovery_options, scrape_options=scrape_options)
+    if not args.links_out:
+        return 1 if asyncio.run(_consume(events, args)) else 0
+    with open(args.links_out, "w", encoding="utf-8") as links_out:
+        return 1 if asyncio.run(_consume(events, args, links_out)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
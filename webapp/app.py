@@ -1,21 +1,201 @@
-from flask import Flask, render_template, request, url_for, redirect, Response, stream_with_context
+from flask import Flask, render_template, request, url_for, redirect, Response, stream_with_context, jsonify
+import json
+import os
 import re
+import threading
 from urllib.parse import urlparse # Added for /scrape_selected
-from .scraper import start_link_discovery, scrape_selected_pages
-from .utils import logger, LogBufferHandler
+from .jobs import JobManager, JOB_STATE_DIR, RESUME_JOBS
+from .checkpoint import CHECKPOINT_ENABLED
+from .events import ChannelLogHandler
+from .utils import logger, ROOT_OUTPUT_DIR
 import logging
-import time
+
+# The crawler (scraper, orchestrator, and through them requests and BeautifulSoup) is imported by the routes
+# and job bodies that use it, not here: a cold start that only renders a page shouldn't pay for it.
 
 app = Flask(__name__)
 
-# Log buffer handler keeps the last 10 log lines for streaming
-log_buffer_handler = LogBufferHandler()
-log_buffer_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(log_buffer_handler)
+_log_handler = None
+_log_handler_lock = threading.Lock()
+
+
+def install_job_log_handler():
+    """
+    Hooks the logger up to the job channels on first use (the first job), so from then on each job's log records
+    are published to its own channel, which /logs_stream?job=<id> follows.
+    """
+    global _log_handler
+    with _log_handler_lock:
+        if _log_handler is None:
+            _log_handler = ChannelLogHandler()
+            _log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            logger.addHandler(_log_handler)
+
+SSE_KEEPALIVE_SECONDS = 15 # Idle time before a keep-alive comment is sent on /logs_stream
+
+# Discovery and scraping run as background jobs so a large site doesn't tie up a request worker.
+# Job specs are saved to JOB_STATE_DIR so crawls interrupted by a restart pick up from their checkpoints.
+job_manager = JobManager(state_dir=JOB_STATE_DIR if CHECKPOINT_ENABLED else None)
+
+# HTML form posts wait this long for their job before showing a progress page that polls /jobs/<id>.
+# Keep it below the proxy / serverless function timeout.
+JOB_SYNC_WAIT = float(os.getenv("SCRAPER_JOB_SYNC_WAIT", "8"))
+
+
+def wants_json():
+    """True if the client asked for a job ID instead of an HTML page (?async=1 or Accept: application/json)."""
+    if request.values.get('async') in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == 'application/json'
+
+
+def job_accepted_response(job):
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': url_for('job_status', job_id=job.id)}), 202
+
+
+def render_job(job):
+    """Renders a finished job's result page, or the progress page while it is still running."""
+    if not job.is_finished():
+        return render_template('job.html', job=job.to_dict())
+    snapshot = job.to_dict()
+    if job.kind == 'discover':
+        return render_template('results.html', discovery_results=snapshot['result'].get('discovery_results', {}))
+    result = snapshot['result']
+    if snapshot['status'] == 'failed':
+        return render_template('scraped.html', error_message=snapshot['error'], selected_links=snapshot['params']['selected_links'], job_id=job.id)
+    if not result.get('output_directory'):
+        logger.error("Scraping failed critically: No output directory was created/returned.")
+    return render_template('scraped.html',
+                           job_id=job.id,
+                           output_directory=result.get('output_directory'),
+                           sites=result.get('sites', {}),
+                           num_scraped=result.get('num_scraped', 0),
+                           num_selected=result.get('num_selected', 0),
+                           errors=result.get('errors', []),
+                           selected_links=snapshot['params']['selected_links'])
+
+
+def run_discovery_job(job, base_urls, discovery_mode=None, scope_rules=None):
+    """
+    Job body for /discover: discovers links on all base URLs concurrently (see orchestrator.py),
+    publishing links as they are found. discovery_mode defaults to DISCOVERY_MODE.
+    """
+    from .orchestrator import get_default_orchestrator
+    from .scraper import DISCOVERY_MODE
+
+    install_job_log_handler() # A job resumed at startup may be the first to log
+    discovery_results = {}
+    job.set_result('discovery_results', discovery_results)
+
+    valid_urls = []
+    for base_url in dict.fromkeys(base_urls): # The same URL twice would be crawled twice into one result
+        if not (base_url.startswith("http://") or base_url.startswith("https://")):
+            logger.warning(f"Skipping invalid URL (must start with http/https): {base_url}")
+            with job.lock:
+                discovery_results[base_url] = {"error": "Invalid URL format. Must start with http:// or https://.", "links": []}
+            continue
+        with job.lock:
+            discovery_results[base_url] = {"links": [], "error": None}
+        valid_urls.append(base_url)
+
+    # Sites report progress concurrently; the job's progress is the sum over all of them.
+    site_stats = {}
+
+    def on_progress(base_url, stats):
+        new_links = stats.pop('new_links')
+        host_limits = stats.pop('host_limits', {}) # Already covers every site: the orchestrator shares one rate limiter
+        with job.lock:
+            discovery_results[base_url]["links"].extend(new_links)
+            site_stats[base_url] = stats
+            totals = {key: round(sum(other[key] for other in site_stats.values()), 2) for key in stats}
+        job.update_progress(current_base_url=base_url, host_limits=host_limits, **totals)
+
+    sites_done = 0
+    for base_url, links, error in get_default_orchestrator().discover(valid_urls, progress_callback=on_progress,
+                                                                      run_id=job.id, resume=job.resumed,
+                                                                      discovery_mode=discovery_mode or DISCOVERY_MODE,
+                                                                      scope_rules=scope_rules):
+        sites_done += 1
+        with job.lock:
+            discovery_results[base_url] = {"links": links or [], "error": str(error) if error else None}
+        if error is None:
+            logger.info(f"Found {len(links)} links for {base_url}")
+        job.update_progress(sites_done=sites_done, sites_total=len(valid_urls))
+
+
+def run_scrape_job(job, selected_links, session_name_base, existing_session_dir, incremental=False, output_format=None, site_session_dirs=None):
+    """
+    Job body for /scrape_selected: scrapes the selected links, recording each page's outcome as it completes.
+    Links are grouped by site and each site is scraped concurrently into its own session directory,
+    unless existing_session_dir is given (an incremental update), which receives all of them.
+    output_format defaults to OUTPUT_FORMAT.
+    """
+    from .orchestrator import get_default_orchestrator, group_links_by_site, create_site_session_dirs
+    from .sinks import OUTPUT_FORMAT
+
+    install_job_log_handler()
+    job.set_result('pages', {})
 
-# Keep a simple global store for discovered links for now.
-# In a real app, this would be per-session or use a database.
-discovered_links_store = {}
+    if existing_session_dir is not None:
+        site_links = {session_name_base: selected_links}
+        site_session_dirs = {session_name_base: existing_session_dir}
+    else:
+        site_links = group_links_by_site(selected_links)
+        # A resumed job must write into the same session directories, so create them up front and save them with the job.
+        if site_session_dirs is None:
+            site_session_dirs = create_site_session_dirs(site_links)
+            with job.lock:
+                job.params['site_session_dirs'] = site_session_dirs
+            job.save()
+
+    site_stats = {}
+
+    def on_progress(site, stats):
+        with job.lock:
+            job.result['pages'][stats.pop('url')] = stats.pop('status')
+            host_limits = stats.pop('host_limits', {})
+            site_stats[site] = stats
+            totals = {key: round(sum(other[key] for other in site_stats.values()), 2)
+                      for key in ('scraped_count', 'failed_count', 'bytes_written', 'pages_per_sec')}
+        job.update_progress(total=len(selected_links), host_limits=host_limits, **totals)
+
+    sites = {}
+    for site, outcome, error in get_default_orchestrator().scrape(site_links, session_dirs=site_session_dirs,
+                                                                  progress_callback=on_progress, incremental=incremental,
+                                                                  output_format=output_format or OUTPUT_FORMAT, resume=job.resumed):
+        if error is not None:
+            outcome = site_session_dirs[site], 0, len(site_links[site]), list(site_links[site])
+        output_dir, num_scraped, num_selected, errors = outcome
+        if output_dir:
+            logger.info(f"Scraping session for {site} complete. Output directory: {output_dir}")
+        sites[site] = {'output_directory': output_dir, 'num_scraped': num_scraped, 'num_selected': num_selected, 'errors': errors}
+
+    ordered = [sites[site] for site in site_links if site in sites]
+    output_dirs = [site['output_directory'] for site in ordered if site['output_directory']]
+    return {'output_directory': output_dirs[0] if len(output_dirs) == 1 else (ROOT_OUTPUT_DIR if output_dirs else None),
+            'num_scraped': sum(site['num_scraped'] for site in ordered),
+            'num_selected': len(selected_links),
+            'errors': [url for site in ordered for url in site['errors']],
+            'sites': {site: sites[site] for site in site_links if site in sites}}
+
+
+# Load saved jobs without holding up startup. Jobs that were still queued or running when the previous process
+# stopped are only re-run with SCRAPER_RESUME_JOBS=1, and then by whichever process claims each one first.
+job_manager.resume_jobs_in_background({'discover': run_discovery_job, 'scrape': run_scrape_job} if RESUME_JOBS else {})
+
+
+def resolve_session_dir(name):
+    """
+    Path of the session directory called name directly under ROOT_OUTPUT_DIR, or None if name isn't a plain
+    directory name there (empty, ".", "..", a path, or a symlink leading outside ROOT_OUTPUT_DIR).
+    """
+    if name in ('', '.', '..') or os.path.basename(name) != name:
+        return None
+    root = os.path.realpath(ROOT_OUTPUT_DIR)
+    real = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([real, root]) != root or real == root:
+        return None
+    return real
 
 
 @app.route('/')
@@ -32,110 +212,166 @@ def discover():
     if not base_urls:
         # Redirect back to index with an error message (or handle more gracefully)
         logger.warning("No URLs provided for discovery.")
+        if wants_json():
+            return jsonify({'error': 'No URLs provided for discovery.'}), 400
         return redirect(url_for('index')) # Consider adding flash messages for errors
 
-    # Clear previous discovery results for this session/store
-    # For simplicity, clearing the global store. If multiple users, this needs to be session-based.
-    discovered_links_store.clear()
+    from .scraper import DISCOVERY_MODE, DISCOVERY_MODES
+    from .scope import CrawlScope
 
-    for base_url in base_urls:
-        if not (base_url.startswith("http://") or base_url.startswith("https://")):
-            logger.warning(f"Skipping invalid URL (must start with http/https): {base_url}")
-            # Store an error message for this URL or skip
-            discovered_links_store[base_url] = {"error": "Invalid URL format. Must start with http:// or https://."}
-            continue
+    discovery_mode = request.form.get('discovery_mode') or DISCOVERY_MODE
+    if discovery_mode not in DISCOVERY_MODES:
+        logger.warning(f"Unknown discovery mode '{discovery_mode}'; using '{DISCOVERY_MODE}'.")
+        discovery_mode = DISCOVERY_MODE
 
-        logger.info(f"Starting link discovery for: {base_url}")
+    scope_rules = None
+    include = [line.strip() for line in request.form.get('include_patterns', '').splitlines() if line.strip()]
+    exclude = [line.strip() for line in request.form.get('exclude_patterns', '').splitlines() if line.strip()]
+    if include or exclude or request.form.get('allow_subdomains'):
+        scope_rules = {'include': include, 'exclude': exclude, 'allow_subdomains': bool(request.form.get('allow_subdomains'))}
         try:
-            links = start_link_discovery(base_url)
-            discovered_links_store[base_url] = {"links": links, "error": None}
-            logger.info(f"Found {len(links)} links for {base_url}")
-        except Exception as e:
-            logger.error(f"Error during discovery for {base_url}: {e}", exc_info=True)
-            discovered_links_store[base_url] = {"error": str(e), "links": []}
+            CrawlScope('http://localhost/', **scope_rules)
+        except re.error as e:
+            logger.warning(f"Invalid URL pattern: {e}")
+            if wants_json():
+                return jsonify({'error': f'Invalid URL pattern: {e}'}), 400
+            return redirect(url_for('index'))
+
+    install_job_log_handler()
+    job = job_manager.submit('discover', run_discovery_job, base_urls=base_urls, discovery_mode=discovery_mode, scope_rules=scope_rules)
+    if wants_json():
+        return job_accepted_response(job)
 
-    # Pass the whole store to results.html, which will iterate through it
-    return render_template('results.html', discovery_results=discovered_links_store)
+    # Small sites finish within the wait and render directly; larger ones get a progress page.
+    job.done.wait(JOB_SYNC_WAIT)
+    return render_job(job)
 
 @app.route('/scrape_selected', methods=['POST'])
 def scrape_selected():
     selected_links = request.form.getlist('selected_links')
 
-    # The form also submitted 'base_url_for_grouping' for each group.
-    # For now, we'll treat all selected links as one batch and use the
-    # first one's domain for naming the output directory, or a generic name.
-    # A more sophisticated approach might group them by original base_url.
+    # Links are grouped by host when the job runs, and every site gets its own session directory.
 
     if not selected_links:
         logger.warning("No links selected for scraping.")
+        if wants_json():
+            return jsonify({'error': 'No links selected for scraping.'}), 400
         # Redirect to results or index, perhaps with a flash message
         return redirect(url_for('index')) # Or back to 'results' if state is preserved
 
-    # Determine a base name for the session directory.
-    # Using the first selected URL's domain, or a generic name.
-    # This is a simplification. A robust app might handle multiple sources better.
+    # An incremental update writes every link into the one existing session; name it after the first URL's domain.
     try:
         first_url_parsed = urlparse(selected_links[0])
         session_name_base = first_url_parsed.netloc if first_url_parsed.netloc else "general_scrape"
     except Exception:
         session_name_base = "general_scrape"
 
+    # Optionally re-scrape incrementally into a previous session directory (by name, under ROOT_OUTPUT_DIR).
+    existing_session_dir = None
+    incremental_session = request.form.get('incremental_session', '').strip()
+    if incremental_session:
+        existing_session_dir = resolve_session_dir(incremental_session)
+        if existing_session_dir is None:
+            logger.warning(f"Invalid session name '{incremental_session}'.")
+            if wants_json():
+                return jsonify({'error': f'Invalid session name: {incremental_session}'}), 400
+            return redirect(url_for('index'))
+        if not os.path.isdir(existing_session_dir):
+            logger.warning(f"Session '{incremental_session}' not found in {ROOT_OUTPUT_DIR}; starting a new session instead.")
+            existing_session_dir = None
+
+    from .sinks import OUTPUT_FORMAT, OUTPUT_FORMATS
+
+    output_format = request.form.get('output_format') or OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        logger.warning(f"Unknown output format '{output_format}'; using '{OUTPUT_FORMAT}'.")
+        output_format = OUTPUT_FORMAT
+
+    install_job_log_handler()
     logger.info(f"Received {len(selected_links)} links for scraping. Session base: {session_name_base}")
 
-    # logs are automatically captured by log_buffer_handler
+    job = job_manager.submit('scrape', run_scrape_job, selected_links=selected_links,
+                             session_name_base=session_name_base, existing_session_dir=existing_session_dir,
+                             incremental=existing_session_dir is not None, output_format=output_format)
+    if wants_json():
+        return job_accepted_response(job)
 
-    # Call the scraper function (ensure it's imported)
-    # from .scraper import scrape_selected_pages (should be at the top of the file)
-    # For now, assuming scrape_selected_pages is ready and imported.
-    # It should handle creation of the session directory using utils.create_session_output_directory
-    # which will use the ROOT_OUTPUT_DIR (to be updated to /data/Web_Scrapes).
+    job.done.wait(JOB_SYNC_WAIT)
+    return render_job(job)
 
-    # The scrape_selected_pages function from previous subtask returns:
-    # (session_output_dir, pages_scraped_count, total_pages_selected, errors_occurred_list)
-    # We need to import it: from .scraper import scrape_selected_pages
 
-    # Let's ensure the import is there (mentally, as I can't check current file state without reading it again)
-    # Assuming: from .scraper import start_link_discovery, scrape_selected_pages
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
 
-    try:
-        # We pass session_name_base to help name the directory within ROOT_OUTPUT_DIR
-        # scrape_selected_pages will call create_session_output_directory
-        output_dir, num_scraped, num_selected, errors = scrape_selected_pages(
-            base_url_for_naming=session_name_base,
-            urls_to_scrape=selected_links
-        )
-
-        if output_dir: # If None, it means directory creation failed critically
-            logger.info(f"Scraping session complete. Output directory: {output_dir}")
-            return render_template('scraped.html',
-                                   output_directory=output_dir,
-                                   num_scraped=num_scraped,
-                                   num_selected=num_selected,
-                                   errors=errors,
-                                   selected_links=selected_links)
-        else:
-            logger.error("Scraping failed critically: No output directory was created/returned.")
-            # Handle this critical error, maybe show a different template or an error message
-            # For now, redirecting to index with a conceptual error state.
-            # A flash message would be good here.
-            return redirect(url_for('index')) # Simplified error handling
-
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during scraping process: {e}", exc_info=True)
-        # Generic error feedback
-        return render_template('scraped.html', error_message=str(e), selected_links=selected_links)
+
+@app.route('/jobs/<job_id>/view')
+def job_view(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        logger.warning(f"Unknown job requested: {job_id}")
+        return redirect(url_for('index'))
+    return render_job(job)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: fetch/stage timings, per-host fetch counts and page outcomes, plus current jobs."""
+    from .metrics import get_default_metrics
+
+    registry = get_default_metrics()
+    job_counts = {}
+    for job in job_manager.list_jobs():
+        key = (job.kind, job.status)
+        job_counts[key] = job_counts.get(key, 0) + 1
+    registry.clear_gauge('scraper_jobs')
+    for (kind, status), count in job_counts.items():
+        registry.set_gauge('scraper_jobs', count, kind=kind, status=status)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def format_sse(event):
+    """Formats a channel event for Server-Sent Events. Log lines use the default 'message' event type."""
+    if event['type'] == 'log':
+        payload = '\n'.join(f"data: {line}" for line in str(event['data']).splitlines() or [''])
+        return f"id: {event['seq']}\n{payload}\n\n"
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
 
 
 @app.route('/logs_stream')
 def logs_stream():
+    job_id = request.args.get('job')
+    if not job_id:
+        return jsonify({'error': 'Pass the job to follow: /logs_stream?job=<id>'}), 400
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    channel = job.events
+    default_start = 0 # Replay the job's whole retained history
+
+    # Reconnecting EventSource clients send Last-Event-ID, so they resume without losing lines.
+    try:
+        start = int(request.headers.get('Last-Event-ID') or request.args.get('after') or default_start)
+    except ValueError:
+        start = default_start
+
     def event_stream():
-        last = 0
+        last = start
         while True:
-            while len(log_buffer_handler.buffer) > last:
-                line = log_buffer_handler.buffer[last]
-                last += 1
-                yield f"data: {line}\n\n"
-            time.sleep(1)
+            events, lost = channel.read(last, timeout=SSE_KEEPALIVE_SECONDS)
+            if lost:
+                yield f"event: gap\ndata: {json.dumps({'lost': lost})}\n\n"
+            for event in events:
+                last = event['seq']
+                yield format_sse(event)
+            if not events:
+                if channel.closed:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+                yield ": keepalive\n\n"
     return Response(stream_with_context(event_stream()), mimetype='text/event-stream')
 
 
@@ -0,0 +1,94 @@
+import fnmatch
+import json
+import os
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .utils import logger
+
+# Query parameters that only track where a click came from; they never change the page.
+DEFAULT_TRACKING_PARAMS = ['utm_*', 'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', '_hsenc', '_hsmi', 'ref_src']
+# Directory index documents; /docs/index.html is the same page as /docs/
+DEFAULT_INDEX_PAGES = ['index.html', 'index.htm', 'index.php', 'default.htm', 'default.aspx']
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Optional JSON file with UrlCanonicalizer options, e.g. {"trailing_slash": "strip", "drop_params": ["utm_*", "sessionid"]}
+CANONICAL_RULES_FILE = os.getenv("SCRAPER_CANONICAL_RULES")
+
+
+class UrlCanonicalizer:
+    """
+    Rewrites URLs to one canonical form so the same page reached via different links is fetched once.
+    - Lowercases scheme and host, drops default ports and the fragment.
+    - Drops tracking query parameters (fnmatch patterns in drop_params) and, if sort_query, sorts the rest.
+    - Strips directory index documents (index.html etc.) if strip_index.
+    - trailing_slash: "keep" (default), "strip" or "add" for non-root paths without a file extension.
+    - unify_scheme: links to the page's own host take the page's scheme (http vs https).
+    """
+
+    def __init__(self, drop_params=None, sort_query=True, strip_index=True, index_pages=None, trailing_slash="keep", unify_scheme=True):
+        if trailing_slash not in ("keep", "strip", "add"):
+            raise ValueError(f"trailing_slash must be 'keep', 'strip' or 'add', not {trailing_slash!r}")
+        self.drop_params = list(DEFAULT_TRACKING_PARAMS if drop_params is None else drop_params)
+        self.sort_query = sort_query
+        self.strip_index = strip_index
+        self.index_pages = {page.lower() for page in (DEFAULT_INDEX_PAGES if index_pages is None else index_pages)}
+        self.trailing_slash = trailing_slash
+        self.unify_scheme = unify_scheme
+
+    def canonicalize(self, url, referrer=None):
+        """Returns the canonical form of url. referrer is the URL of the page the link was found on, if any."""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+        if self.unify_scheme and referrer and scheme in _DEFAULT_PORTS:
+            ref = urlsplit(referrer)
+            if (ref.hostname or '').lower() == host and ref.scheme.lower() in _DEFAULT_PORTS and ref.scheme.lower() != scheme:
+                if port == _DEFAULT_PORTS[scheme]:
+                    port = None
+                scheme = ref.scheme.lower()
+        netloc = host
+        if parts.username or parts.password:
+            netloc = f"{parts.username or ''}{':' + parts.password if parts.password else ''}@{host}"
+        if port and port != _DEFAULT_PORTS.get(scheme):
+            netloc = f"{netloc}:{port}"
+
+        path = parts.path or '/'
+        if self.strip_index:
+            head, _, last = path.rpartition('/')
+            if last.lower() in self.index_pages:
+                path = head + '/'
+        if path != '/':
+            last = path.rsplit('/', 1)[-1]
+            if self.trailing_slash == "strip" and path.endswith('/'):
+                path = path.rstrip('/') or '/'
+            elif self.trailing_slash == "add" and not path.endswith('/') and '.' not in last:
+                path += '/'
+
+        query = parts.query
+        if query:
+            params = [(key, value) for key, value in parse_qsl(query, keep_blank_values=True) if not self._is_dropped(key)]
+            if self.sort_query:
+                params.sort()
+            query = urlencode(params, doseq=True)
+        return urlunsplit((scheme, netloc, path, query, ''))
+
+    def _is_dropped(self, key):
+        key = key.lower()
+        return any(fnmatch.fnmatchcase(key, pattern) for pattern in self.drop_params)
+
+
+DEFAULT_CANONICALIZER = UrlCanonicalizer()
+
+
+def canonicalize_url(url, referrer=None):
+    """Canonicalizes url with the process-wide rules (DEFAULT_CANONICALIZER)."""
+    return DEFAULT_CANONICALIZER.canonicalize(url, referrer)
+
+
+if CANONICAL_RULES_FILE:
+    try:
+        with open(CANONICAL_RULES_FILE, 'r', encoding='utf-8') as f:
+            DEFAULT_CANONICALIZER = UrlCanonicalizer(**json.load(f))
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"Could not load URL canonicalization rules from {CANONICAL_RULES_FILE}: {e}")
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .utils import logger, sanitize_filename, ROOT_OUTPUT_DIR
+
+# --- Crawl Checkpoint Configuration ---
+CHECKPOINT_ENABLED = os.getenv("SCRAPER_CHECKPOINTS", "1") != "0"
+CHECKPOINT_DIR = os.getenv("SCRAPER_CHECKPOINT_DIR", os.path.join(ROOT_OUTPUT_DIR, ".crawl_state"))
+CHECKPOINT_FILENAME = "crawl_state.sqlite" # Name of the scrape checkpoint inside a session directory
+CHECKPOINT_COMMIT_INTERVAL = 2.0 # seconds between commits; a crash loses at most this much progress
+
+
+def discovery_checkpoint_path(base_url, checkpoint_dir=CHECKPOINT_DIR, run_id=None):
+    """
+    Returns the checkpoint file used for discovering base_url. Runs that may overlap (e.g. two jobs for
+    the same URL) must pass distinct run_ids, such as their job IDs, or they overwrite each other's state.
+    """
+    digest = hashlib.sha1(base_url.encode("utf-8")).hexdigest()[:10]
+    prefix = f"discover_{sanitize_filename(run_id)[:40]}_" if run_id else "discover_"
+    return os.path.join(checkpoint_dir, f"{prefix}{sanitize_filename(base_url)[:60]}_{digest}.sqlite")
+
+
+def _remove_files(path):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+
+class CrawlCheckpoint:
+    """
+    Compact on-disk crawl state in SQLite (WAL mode), so a crawl can resume after the process dies.
+    Discovery records every URL it has seen with its depth and state (queued / visited / failed)
+    and whether it counts as discovered. Scraping records the outcome of every page.
+    Writes are batched and committed every CHECKPOINT_COMMIT_INTERVAL seconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, depth INTEGER, state TEXT, found INTEGER);"
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, status TEXT, entry TEXT, updated_at REAL);"
+        )
+        self._db.commit()
+        self._last_commit = time.monotonic()
+
+    @classmethod
+    def fresh(cls, path):
+        """Opens a checkpoint at path after deleting any previous state there."""
+        _remove_files(path)
+        return cls(path)
+
+    # --- Discovery state ---
+
+    def record_seen(self, url, depth, found, state="queued"):
+        self._execute("INSERT OR IGNORE INTO urls (url, depth, state, found) VALUES (?, ?, ?, ?)", (url, depth, state, int(found)))
+
+    def record_found(self, url):
+        self._execute("UPDATE urls SET found = 1 WHERE url = ?", (url,))
+
+    def record_visit(self, url, state):
+        """state is 'visited' or 'failed'."""
+        self._execute("UPDATE urls SET state = ? WHERE url = ?", (state, url))
+
+    def load_discovery(self):
+        """
+        Returns (queued, seen, found, checked_count) to rebuild a discovery run:
+        queued is a list of (url, depth) in insertion (breadth-first) order.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT url, depth, state, found FROM urls ORDER BY rowid").fetchall()
+        queued = [(url, depth) for url, depth, state, _ in rows if state == "queued"]
+        seen = [row[0] for row in rows]
+        found = [url for url, _, _, is_found in rows if is_found]
+        checked_count = sum(1 for row in rows if row[2] in ("visited", "failed"))
+        return queued, seen, found, checked_count
+
+    # --- Scrape state ---
+
+    def record_page(self, url, status, entry=None):
+        """Records a scraped page's status and, if it was saved, its manifest entry."""
+        self._execute("INSERT OR REPLACE INTO pages (url, status, entry, updated_at) VALUES (?, ?, ?, ?)",
+                      (url, status, json.dumps(entry) if entry is not None else None, time.time()))
+
+    def completed_pages(self):
+        """Returns {url: (status, manifest_entry)} for every page that was scraped successfully."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, status, entry FROM pages WHERE entry IS NOT NULL").fetchall()
+        return {url: (status, json.loads(entry)) for url, status, entry in rows}
+
+    # --- Run state ---
+
+    def set_meta(self, key, value):
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def mark_complete(self):
+        self.set_meta("complete", "1")
+        self.flush()
+
+    def is_complete(self):
+        return self.get_meta("complete") == "1"
+
+    def flush(self):
+        with self._lock:
+            self._db.commit()
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        try:
+            self.flush()
+            self._db.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not close crawl checkpoint {self.path}: {e}")
+
+    def discard(self):
+        """Closes the checkpoint and deletes its files, once the crawl has finished and there is nothing to resume."""
+        self.close()
+        _remove_files(self.path)
+
+    def _execute(self, sql, params):
+        with self._lock:
+            self._db.execute(sql, params)
+            if time.monotonic() - self._last_commit >= CHECKPOINT_COMMIT_INTERVAL:
+                self._db.commit()
+                self._last_commit = time.monotonic()
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+
+from .utils import logger
+from .orchestrator import get_default_orchestrator, group_links_by_site, create_site_session_dirs
+
+# The crawler itself stays on threads (see orchestrator.py); these async iterators stream its events to an event loop.
+# Leaving an async for early stops the crawl, and pages saved so far are checkpointed, so resume=True continues it.
+STREAM_BUFFER = 1000 # Events queued for a slow consumer before the crawl waits for it
+
+
+class CrawlEvent:
+    """
+    Something that happened during a crawl, as yielded by discover(), scrape() and crawl().
+    - kind "link": url was discovered while crawling site (a base URL).
+    - kind "page": url, on site (a host), was handled by the scrape. status is added, changed, unchanged,
+      duplicate or failed, and text holds the extracted text (None unless the page was fetched and extracted).
+    - kind "site": site finished the phase named by status ("discover" or "scrape"). result summarises it:
+      {'num_links'} for discovery, {'output_directory', 'num_scraped', 'num_selected', 'errors'} for scraping.
+      error is the exception that ended the site's crawl, if any.
+    """
+
+    __slots__ = ("kind", "site", "url", "status", "text", "result", "error")
+
+    def __init__(self, kind, site, url=None, status=None, text=None, result=None, error=None):
+        self.kind = kind
+        self.site = site
+        self.url = url
+        self.status = status
+        self.text = text
+        self.result = result
+        self.error = error
+
+    def to_dict(self, include_text=True):
+        """The event's fields that are set, as a JSON-serializable dict."""
+        fields = {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+        if not include_text:
+            fields.pop("text", None)
+        if self.error is not None:
+            fields["error"] = str(self.error)
+        return fields
+
+    def __repr__(self):
+        return f"CrawlEvent({self.kind!r}, {self.site!r}, url={self.url!r}, status={self.status!r})"
+
+
+class _Cancelled(BaseException):
+    """
+    Raised inside the crawl threads once the consumer has stopped listening. A BaseException, so the
+    orchestrator doesn't log it as a failed site and the scrape abandons the pages it hasn't fetched.
+    """
+
+
+_DONE = object()
+
+
+async def _stream(run):
+    """
+    Runs run(emit) on a thread and yields whatever it passes to emit(), in order.
+    emit() blocks while STREAM_BUFFER events are waiting, and raises _Cancelled once the consumer is gone.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(STREAM_BUFFER)
+    stopped = threading.Event()
+
+    def emit(event):
+        if stopped.is_set():
+            raise _Cancelled()
+        asyncio.run_coroutine_threadsafe(queue.put(event), loop).result()
+
+    def target():
+        try:
+            run(emit)
+        except _Cancelled:
+            pass
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(_DONE), loop).result()
+
+    future = loop.run_in_executor(None, target)
+    finished = False
+    try:
+        while True:
+            event = await queue.get()
+            if event is _DONE:
+                break
+            yield event
+        finished = True
+        await future # Re-raises anything run() raised
+    finally:
+        if not finished:
+            logger.info("Crawl consumer stopped early; stopping the crawl.")
+            stopped.set()
+            while not future.done(): # Keep draining so the crawl threads can reach their next emit() and stop
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.05)
+
+
+def _as_list(urls):
+    return [urls] if isinstance(urls, str) else list(urls)
+
+
+def _run_discovery(orchestrator, base_urls, emit, options):
+    """Streams each base URL's links as discovery finds them, then a "site" event per base URL. Returns {base_url: links}."""
+    streamed = {}
+    found = {}
+
+    def on_progress(base_url, stats):
+        seen = streamed.setdefault(base_url, set())
+        for url in stats['new_links']:
+            if url not in seen:
+                seen.add(url)
+                emit(CrawlEvent("link", base_url, url))
+
+    for base_url, links, error in orchestrator.discover(base_urls, progress_callback=on_progress, **options):
+        seen = streamed.pop(base_url, set())
+        for url in links or []:
+            if url not in seen: # e.g. the links of a finished discovery that resume=True returns without fetching
+                emit(CrawlEvent("link", base_url, url))
+        found[base_url] = links or []
+        emit(CrawlEvent("site", base_url, status="discover", result={'num_links': len(found[base_url])}, error=error))
+    return found
+
+
+def _run_scrape(orchestrator, urls, session_dirs, emit, options):
+    """Scrapes urls, grouped by host, streaming a "page" event per page and a "site" event per host."""
+    site_links = group_links_by_site(urls)
+    session_dirs = dict(session_dirs or {})
+    session_dirs.update(create_site_session_dirs([site for site in site_links if site not in session_dirs]))
+
+    def on_page(site, url, status, text):
+        emit(CrawlEvent("page", site, url, status=status, text=text))
+
+    for site, outcome, error in orchestrator.scrape(site_links, session_dirs=session_dirs, page_callback=on_page, **options):
+        if error is not None:
+            outcome = session_dirs[site], 0, len(site_links[site]), list(site_links[site])
+        output_dir, num_scraped, num_selected, errors = outcome
+        emit(CrawlEvent("site", site, status="scrape", error=error,
+                        result={'output_directory': output_dir, 'num_scraped': num_scraped,
+                                'num_selected': num_selected, 'errors': errors}))
+
+
+def discover(base_urls, orchestrator=None, **discovery_options):
+    """
+    Discovers links on one or more base URLs concurrently. Returns an async iterator of CrawlEvents:
+    a "link" event per discovered URL as it is found, and a "site" event as each base URL finishes.
+    orchestrator (a CrawlOrchestrator, defaulting to the process-wide one) sets concurrency and shares
+    politeness limits. discovery_options (max_depth, max_pages, discovery_mode, scope_rules, respect_robots,
+    resume...) are passed on to start_link_discovery.
+    """
+    orchestrator = orchestrator or get_default_orchestrator()
+    return _stream(lambda emit: _run_discovery(orchestrator, _as_list(base_urls), emit, discovery_options))
+
+
+def scrape(urls, session_dirs=None, orchestrator=None, **scrape_options):
+    """
+    Scrapes urls, each host into its own session directory. Returns an async iterator of CrawlEvents:
+    a "page" event per URL (with its extracted text) as it is handled, and a "site" event as each host finishes.
+    session_dirs maps hosts to existing session directories to update (with incremental=True) or continue
+    (with resume=True); the other hosts get new directories under ROOT_OUTPUT_DIR.
+    scrape_options (output_format, incremental, resume, near_duplicate_distance...) are passed on to scrape_selected_pages.
+    """
+    orchestrator = orchestrator or get_default_orchestrator()
+    return _stream(lambda emit: _run_scrape(orchestrator, _as_list(urls), session_dirs, emit, scrape_options))
+
+
+def crawl(base_urls, session_dirs=None, orchestrator=None, discovery_options=None, scrape_options=None):
+    """
+    Discovers links on the base URLs, then scrapes everything found. Yields the events of discover()
+    followed by those of scrape(); discovery_options and scrape_options are passed on to each.
+
+        async for event in crawl(["https://example.com/docs/"], discovery_options={'max_depth': 2}):
+            if event.kind == "page":
+                print(event.url, event.status)
+    """
+    orchestrator = orchestrator or get_default_orchestrator()
+
+    def run(emit):
+        found = _run_discovery(orchestrator, _as_list(base_urls), emit, discovery_options or {})
+        links = list(dict.fromkeys(url for links in found.values() for url in links))
+        if links:
+            _run_scrape(orchestrator, links, session_dirs, emit, scrape_options or {})
+
+    return _stream(run)
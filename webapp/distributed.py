@@ -0,0 +1,410 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .utils import logger, create_session_output_directory, ROOT_OUTPUT_DIR
+from .ratelimit import create_rate_limiter
+from .fetcher import get_default_session
+from .httpcache import get_default_http_cache
+from .canonical import canonicalize_url
+from .sitemap import RobotsCache, RESPECT_ROBOTS
+from .scope import scope_for
+from .parsepool import ParsePool
+from .scraper import (discover_links_from_page, crawl_and_extract_single_page,
+                      MAX_DISCOVERY_DEPTH, MAX_WORKERS, POLITENESS_DELAY)
+
+# --- Distributed Crawl Configuration ---
+# "sqlite" (a SQLite file per crawl under DISTRIBUTED_STATE_DIR) or "sqlite:///some/dir". Every worker must run on the
+# machine holding that directory: SQLite's locks and WAL don't work over network filesystems.
+FRONTIER_BACKEND = os.getenv("SCRAPER_FRONTIER_BACKEND", "sqlite")
+DISTRIBUTED_STATE_DIR = os.getenv("SCRAPER_DISTRIBUTED_DIR", os.path.join(ROOT_OUTPUT_DIR, ".distributed"))
+DISTRIBUTED_PROCESSES = int(os.getenv("SCRAPER_PROCESSES", str(os.cpu_count() or 2))) # Local worker processes
+CLAIM_LEASE_SECONDS = 120 # A claimed URL not completed within this time is handed out again
+IDLE_POLL_SECONDS = 0.5 # How often an idle worker checks for new URLs in its partition
+MAX_WORKER_RESTARTS = 3 # Times a crashed local worker process is restarted
+
+
+def host_partition(url, partitions):
+    """Partition (worker index) that owns url's host. All URLs of one host go to the same worker."""
+    digest = hashlib.blake2b(urlparse(url).netloc.lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % partitions
+
+
+def parse_processes_per_worker(urls, partitions, processes):
+    """
+    Parser processes each local worker may use (see parsepool.py). Only workers whose partition owns one of urls'
+    hosts get any work, so the CPUs of the idle ones are shared out among them; a one-site crawl parses on all of them.
+    """
+    busy = {host_partition(url, partitions) for url in urls} & set(range(processes))
+    return max(1, processes // max(1, len(busy)))
+
+
+class _AnyScope:
+    """The union of several sites' CrawlScopes: a URL is in scope if any of them allows it."""
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+
+    def allows(self, url):
+        return any(scope.allows(url) for scope in self.scopes)
+
+    def filter(self, urls):
+        return [url for url in urls if self.allows(url)]
+
+
+class FrontierBackend:
+    """
+    Frontier and visited set shared by the worker processes of one distributed crawl.
+    Every URL belongs to the partition of its host (host_partition); worker i only claims URLs of
+    partition i, so per-host politeness is enforced by a single worker's rate limiter.
+    Claimed URLs are leased: if a worker dies, its URLs are handed out again after CLAIM_LEASE_SECONDS.
+    """
+
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    def get_meta(self, key):
+        raise NotImplementedError
+
+    def push_many(self, items):
+        """
+        Adds (url, depth, queue, found) tuples not seen before. queue=False only marks the URL as seen
+        (e.g. beyond max depth); found=True lists it in found_urls(). Returns the number of new URLs.
+        """
+        raise NotImplementedError
+
+    def claim(self, partition, limit, worker_id):
+        """Leases up to limit queued (url, depth) pairs of partition, shallowest first."""
+        raise NotImplementedError
+
+    def complete_many(self, results, worker_id):
+        """
+        Marks URLs claimed by worker_id finished: results are (url, ok) pairs; ok URLs are added to found_urls().
+        URLs whose lease expired and went to another worker are left to that worker.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """Returns a dict with the number of queued, claimed, done, failed and found URLs."""
+        raise NotImplementedError
+
+    def outstanding(self):
+        """URLs queued or claimed; the crawl is finished when this reaches 0."""
+        stats = self.stats()
+        return stats['queued'] + stats['claimed']
+
+    def found_urls(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteFrontierBackend(FrontierBackend):
+    """
+    FrontierBackend in a SQLite file (WAL mode). SQLite's file locks serialize claims, so any number
+    of processes on one machine can use the same file. The file must be on a local disk, not a network filesystem.
+    """
+
+    def __init__(self, path, lease_seconds=CLAIM_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._partitions = None
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, part INTEGER, depth INTEGER, state TEXT,"
+            " found INTEGER DEFAULT 0, claimed_at REAL, worker TEXT);"
+            "CREATE INDEX IF NOT EXISTS urls_by_state ON urls (part, state, depth);"
+        )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def set_meta(self, key, value):
+        self._transaction(lambda db: db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))))
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def push_many(self, items):
+        if self._partitions is None:
+            self._partitions = self.get_meta('partitions') or 1
+        partitions = self._partitions
+
+        def insert(db):
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO urls (url, part, depth, state, found) VALUES (?, ?, ?, ?, ?)",
+                           [(url, host_partition(url, partitions), depth, 'queued' if queue else 'seen', int(found))
+                            for url, depth, queue, found in items])
+            return db.total_changes - before
+        return self._transaction(insert) if items else 0
+
+    def claim(self, partition, limit, worker_id):
+        def lease(db):
+            now = time.time()
+            db.execute("UPDATE urls SET state = 'queued' WHERE part = ? AND state = 'claimed' AND claimed_at < ?",
+                       (partition, now - self.lease_seconds))
+            rows = db.execute("SELECT url, depth FROM urls WHERE part = ? AND state = 'queued' ORDER BY depth LIMIT ?",
+                              (partition, limit)).fetchall()
+            db.executemany("UPDATE urls SET state = 'claimed', claimed_at = ?, worker = ? WHERE url = ?",
+                           [(now, worker_id, url) for url, _ in rows])
+            return rows
+        return self._transaction(lease)
+
+    def complete_many(self, results, worker_id):
+        if results:
+            self._transaction(lambda db: db.executemany(
+                "UPDATE urls SET state = ?, found = found OR ? WHERE url = ? AND state = 'claimed' AND worker = ?",
+                [('done' if ok else 'failed', int(ok), url, worker_id) for url, ok in results]))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall())
+            found = self._db.execute("SELECT COUNT(*) FROM urls WHERE found").fetchone()[0]
+        return {'queued': counts.get('queued', 0), 'claimed': counts.get('claimed', 0),
+                'done': counts.get('done', 0), 'failed': counts.get('failed', 0), 'found': found}
+
+    def found_urls(self):
+        with self._lock:
+            return [url for (url,) in self._db.execute("SELECT url FROM urls WHERE found ORDER BY url")]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_frontier_backend(backend, crawl_id, fresh=False):
+    """
+    Opens the frontier of crawl crawl_id on backend ("sqlite" or "sqlite:///dir").
+    With fresh=True any earlier state of that crawl is removed first.
+    """
+    if not backend.startswith("sqlite"):
+        raise ValueError(f"Unsupported frontier backend {backend!r}")
+    directory = backend[len("sqlite://"):] if backend.startswith("sqlite://") else DISTRIBUTED_STATE_DIR
+    path = os.path.join(directory or DISTRIBUTED_STATE_DIR, f"{crawl_id}.sqlite")
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+    return SqliteFrontierBackend(path)
+
+
+# --- Workers ---
+
+def run_worker(backend, crawl_id, worker_index, threads=MAX_WORKERS):
+    """
+    Runs one worker of a distributed crawl until no URL is queued or claimed anywhere.
+    The worker claims URLs of its own partition (worker_index) in batches of `threads` and processes them
+    concurrently with the per-URL units of the single-process crawler: discover_links_from_page for a
+    discovery crawl, crawl_and_extract_single_page for a scrape. Returns the number of URLs processed.
+    Start it in any process on the machine holding backend's file; the crawl's settings are read from it.
+    """
+    frontier = open_frontier_backend(backend, crawl_id)
+    kind = frontier.get_meta('kind')
+    scope_urls = frontier.get_meta('scope_urls') or []
+    max_depth = frontier.get_meta('max_depth')
+    output_dir = frontier.get_meta('output_dir')
+    scope_rules = frontier.get_meta('scope_rules')
+    scope = _AnyScope([scope_for(url, scope_rules) for url in scope_urls]) if kind == 'discover' else None
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+
+    session = get_default_session()
+    http_cache = get_default_http_cache()
+    robots = RobotsCache(session=session) if frontier.get_meta('respect_robots') else None
+    rate_limiter = create_rate_limiter(rate=(2 if kind == 'discover' else 1) / POLITENESS_DELAY)
+    delayed_hosts = set() # Hosts whose Crawl-delay has been applied to rate_limiter
+    delayed_hosts_lock = threading.Lock()
+
+    def allowed_by_robots(url):
+        host = urlparse(url).netloc
+        with delayed_hosts_lock: # Held while robots.txt is read, so no page of the host is fetched before its delay applies
+            if host not in delayed_hosts:
+                robots.apply_crawl_delay(url, rate_limiter)
+                delayed_hosts.add(host)
+        return robots.can_fetch(url)
+
+    # Other workers' CPUs, if their partitions have no hosts; the pool only starts processes once a large page arrives.
+    parse_pool = ParsePool(processes=min(frontier.get_meta('parse_processes') or 1, os.cpu_count() or 1))
+
+    def process(url):
+        if robots is not None and not allowed_by_robots(url):
+            logger.info(f"robots.txt disallows {url}; not fetching it.")
+            return None if kind == 'discover' else False
+        if kind == 'discover':
+            return discover_links_from_page(url, url, session=session, http_cache=http_cache, robots=robots, scope=scope,
+                                            rate_limiter=rate_limiter, parse_pool=parse_pool)
+        return crawl_and_extract_single_page(url, output_dir, session=session, http_cache=http_cache, rate_limiter=rate_limiter,
+                                             parse_pool=parse_pool)
+
+    processed = 0
+    logger.info(f"Worker {worker_id} started on {kind} crawl {crawl_id}.")
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while True:
+                batch = frontier.claim(worker_index, threads, worker_id)
+                if not batch:
+                    if frontier.outstanding() == 0:
+                        break
+                    time.sleep(IDLE_POLL_SECONDS) # Other workers may still add URLs to this partition
+                    continue
+                outcomes = list(pool.map(process, [url for url, _ in batch]))
+                if kind == 'discover':
+                    new_links = [(link, depth + 1, depth + 1 <= max_depth, True)
+                                 for (_, depth), links in zip(batch, outcomes) for link in links or []]
+                    frontier.push_many(new_links)
+                    frontier.complete_many([(url, links is not None) for (url, _), links in zip(batch, outcomes)], worker_id)
+                else:
+                    frontier.complete_many([(url, bool(ok)) for (url, _), ok in zip(batch, outcomes)], worker_id)
+                processed += len(batch)
+    finally:
+        frontier.close()
+        parse_pool.close()
+    logger.info(f"Worker {worker_id} finished after processing {processed} URL(s).")
+    return processed
+
+
+def _run_crawl(frontier, backend, crawl_id, processes, threads, progress_callback):
+    """Starts `processes` local workers and waits until the crawl has no outstanding URLs."""
+    context = multiprocessing.get_context("spawn") # Forking a threaded web server process isn't safe
+    workers = {}
+    restarts = dict.fromkeys(range(processes), 0)
+
+    def start(index):
+        process = context.Process(target=run_worker, args=(backend, crawl_id, index, threads), daemon=True)
+        process.start()
+        workers[index] = process
+
+    for index in range(processes):
+        start(index)
+    try:
+        while True:
+            time.sleep(IDLE_POLL_SECONDS)
+            stats = frontier.stats()
+            if progress_callback:
+                progress_callback({'checked_count': stats['done'] + stats['failed'], 'found_count': stats['found'],
+                                   'failed_count': stats['failed'], 'frontier_size': stats['queued'] + stats['claimed']})
+            for index, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                del workers[index]
+                # Workers only exit cleanly once nothing is outstanding; a crash leaves its partition unserved.
+                if process.exitcode != 0 and frontier.outstanding():
+                    if restarts[index] >= MAX_WORKER_RESTARTS:
+                        raise RuntimeError(f"Worker {index} of crawl {crawl_id} keeps failing (exit code {process.exitcode})")
+                    restarts[index] += 1
+                    logger.warning(f"Worker {index} of crawl {crawl_id} exited with code {process.exitcode}; restarting it.")
+                    start(index)
+            # With partitions served by separately started workers, keep waiting after these are done.
+            if not workers and frontier.outstanding() == 0:
+                break
+    finally:
+        for process in workers.values():
+            process.terminate()
+    return frontier.stats()
+
+
+def distributed_link_discovery(base_urls, processes=DISTRIBUTED_PROCESSES, partitions=None, backend=FRONTIER_BACKEND, crawl_id=None, max_depth=MAX_DISCOVERY_DEPTH, threads=MAX_WORKERS, respect_robots=RESPECT_ROBOTS, scope_rules=None, progress_callback=None):
+    """
+    Link discovery of one or more sites (base_urls, a URL or a list of them), spread over worker processes that
+    share a frontier and visited set through backend. URLs are partitioned by host hash over `partitions` workers
+    (default: processes); `processes` of them run here as child processes. The remaining partitions are served by
+    workers started separately on the same machine with run_worker(backend, crawl_id, index), e.g. with
+    python -m webapp worker. Distributed crawls are single-host: the frontier is a SQLite file on a local disk.
+    Each host is fetched by one worker only, so fetching scales out per site: give several base URLs to keep several
+    workers busy. The workers without a site lend their CPUs to the others' page parsing instead.
+    scope_rules are CrawlScope options (see scope.py), as for start_link_discovery; links are followed if they are
+    in the scope of any of the base URLs.
+    progress_callback, if given, is called about twice a second with the crawl's overall stats.
+    Returns a sorted list of unique discovered URLs, like start_link_discovery.
+    """
+    partitions = partitions or processes
+    if partitions < 1:
+        raise ValueError("A distributed crawl needs at least one partition")
+    crawl_id = crawl_id or f"discover_{uuid.uuid4().hex[:12]}"
+    scope_urls = list(dict.fromkeys(canonicalize_url(url) for url in ([base_urls] if isinstance(base_urls, str) else base_urls)))
+    frontier = open_frontier_backend(backend, crawl_id, fresh=True)
+    try:
+        for key, value in (('kind', 'discover'), ('scope_urls', scope_urls), ('max_depth', max_depth),
+                           ('respect_robots', respect_robots), ('scope_rules', scope_rules), ('partitions', partitions),
+                           ('parse_processes', parse_processes_per_worker(scope_urls, partitions, processes))):
+            frontier.set_meta(key, value)
+        frontier.push_many([(url, 0, True, False) for url in scope_urls])
+        logger.info(f"Distributed discovery {crawl_id} of {len(scope_urls)} site(s): {partitions} partition(s), {processes} local worker process(es), backend {backend}.")
+        stats = _run_crawl(frontier, backend, crawl_id, processes, threads, progress_callback)
+        links = frontier.found_urls()
+    finally:
+        frontier.close()
+    logger.info(f"Distributed discovery {crawl_id} complete. Checked {stats['done'] + stats['failed']} URLs, found {len(links)} unique internal links.")
+    return links
+
+
+def distributed_scrape(base_url_for_naming, urls_to_scrape, processes=DISTRIBUTED_PROCESSES, partitions=None, backend=FRONTIER_BACKEND, crawl_id=None, existing_session_dir=None, threads=MAX_WORKERS, respect_robots=RESPECT_ROBOTS, progress_callback=None):
+    """
+    Scrapes urls_to_scrape with worker processes sharing a frontier (see distributed_link_discovery).
+    With respect_robots, pages robots.txt disallows are not fetched and count as errors.
+    Every page is written as a .txt file by crawl_and_extract_single_page. Returns (session_output_dir, pages_scraped_count, total_pages_selected,
+    errors_occurred_list), like scrape_selected_pages.
+    """
+    if not urls_to_scrape:
+        return None, 0, 0, []
+    partitions = partitions or processes
+    if partitions < 1:
+        raise ValueError("A distributed crawl needs at least one partition")
+    session_output_dir = existing_session_dir or create_session_output_directory(base_url_for_naming)
+    crawl_id = crawl_id or f"scrape_{uuid.uuid4().hex[:12]}"
+    frontier = open_frontier_backend(backend, crawl_id, fresh=True)
+    try:
+        for key, value in (('kind', 'scrape'), ('output_dir', os.path.abspath(session_output_dir)),
+                           ('max_depth', 0), ('partitions', partitions), ('respect_robots', respect_robots),
+                           ('parse_processes', parse_processes_per_worker(urls_to_scrape, partitions, processes))):
+            frontier.set_meta(key, value)
+        frontier.push_many([(url, 0, True, False) for url in urls_to_scrape])
+        logger.info(f"Distributed scrape {crawl_id}: {len(urls_to_scrape)} page(s), {partitions} partition(s), {processes} local worker process(es).")
+        _run_crawl(frontier, backend, crawl_id, processes, threads, progress_callback)
+        saved = set(frontier.found_urls())
+    finally:
+        frontier.close()
+    errors = [url for url in urls_to_scrape if url not in saved]
+    logger.info(f"Distributed scrape {crawl_id} complete. {len(urls_to_scrape) - len(errors)}/{len(urls_to_scrape)} page(s) saved in '{session_output_dir}'.")
+    return session_output_dir, len(urls_to_scrape) - len(errors), len(urls_to_scrape), errors
+
+
+def main(argv=None):
+    """Entry point for extra workers: python -m webapp.distributed CRAWL_ID WORKER_INDEX [--backend URL]."""
+    parser = argparse.ArgumentParser(description="Run one worker of a distributed crawl.")
+    parser.add_argument("crawl_id")
+    parser.add_argument("worker_index", type=int)
+    parser.add_argument("--backend", default=FRONTIER_BACKEND)
+    parser.add_argument("--threads", type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+    run_worker(args.backend, args.crawl_id, args.worker_index, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
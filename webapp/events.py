@@ -0,0 +1,93 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+EVENT_BUFFER_SIZE = 1000 # Events retained per channel for late or reconnecting subscribers
+
+# Channel that log records emitted in the current context (a job and the threads it spawns) are routed to.
+current_channel = contextvars.ContextVar("current_channel", default=None)
+
+
+class EventChannel:
+    """
+    Sequenced event log with a bounded ring buffer and blocking reads.
+    Every event gets a monotonically increasing seq. Readers ask for events after the
+    last seq they saw; if the ring buffer has already rotated past it, read() reports
+    how many events were lost instead of silently skipping them.
+    """
+
+    def __init__(self, maxlen: int = EVENT_BUFFER_SIZE):
+        self._events = deque(maxlen=maxlen)
+        self._next_seq = 1
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, event_type: str, data) -> int:
+        """Appends an event and wakes up every waiting reader. Returns its seq."""
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._events.append({"seq": seq, "type": event_type, "time": time.time(), "data": data})
+            self._cond.notify_all()
+            return seq
+
+    def close(self) -> None:
+        """Marks the channel finished; readers drain what is left and then stop."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def read(self, after_seq: int = 0, timeout: float = None):
+        """
+        Returns (events, lost) for events with seq > after_seq, blocking up to timeout seconds
+        until at least one is available or the channel is closed.
+        lost is the number of requested events that already rotated out of the buffer.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._next_seq - 1 <= after_seq and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return [], 0
+                self._cond.wait(remaining)
+            if not self._events:
+                return [], 0
+            first_seq = self._events[0]["seq"]
+            start = max(0, after_seq + 1 - first_seq)
+            return list(islice(self._events, start, None)), max(0, first_seq - after_seq - 1)
+
+
+class ChannelLogHandler(logging.Handler):
+    """
+    Publishes formatted log records to the channel of the job that emitted them (current_channel).
+    Records logged outside a job aren't published anywhere, so no client sees another user's crawl.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        channel = current_channel.get()
+        if channel is not None:
+            channel.publish("log", msg)
+
+
+def submit_with_context(pool, fn, *args, **kwargs):
+    """
+    Submits fn to an executor in a copy of the caller's context, so log records from worker
+    threads still reach the caller's job channel.
+    """
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+import soupsieve
+from bs4 import CData, NavigableString, Tag
+
+from .utils import logger
+
+# Common selectors for main content areas, in priority order
+DEFAULT_CONTENT_SELECTORS = [
+    'article.main-content', 'div.markdown-body', 'article', 'main',
+    'div.content', 'div#content', 'section.content',
+    'div[role="main"]', 'div.main', 'div.post-content', 'body'
+]
+# Common noisy elements like nav, footer, scripts, styles, etc.
+DEFAULT_NOISE_SELECTORS = ['nav', 'footer', 'script', 'style', '.noprint', '.no-export', 'header', 'aside', 'form', '.sidebar', '#sidebar']
+
+# Optional JSON file of per-domain rules: {"docs.example.com": {"content": [...], "noise": [...]}}
+EXTRACTION_RULES_FILE = os.getenv("SCRAPER_EXTRACTION_RULES")
+
+# Only these string types count as text, matching Tag.get_text() (comments, scripts etc. are skipped).
+_TEXT_TYPES = (NavigableString, CData)
+
+_SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)((?:\[[^\]]+\])*)$')
+_ATTR_SELECTOR = re.compile(r'\[\s*([\w-]+)\s*(?:=\s*(["\']?)(.*?)\2)?\s*\]')
+
+
+def compile_selector(selector):
+    """
+    Compiles a CSS selector into a predicate on a Tag.
+    Simple selectors (tag, .class, #id, [attr] / [attr="value"] and combinations) become plain attribute
+    checks; anything else (combinators, pseudo-classes) is delegated to a precompiled soupsieve matcher.
+    """
+    match = _SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not selector.strip():
+        return soupsieve.compile(selector).match
+
+    name = match.group(1).lower() if match.group(1) else None
+    classes = set(re.findall(r'\.([\w-]+)', match.group(2)))
+    ids = re.findall(r'#([\w-]+)', match.group(2))
+    element_id = ids[0] if ids else None
+    attrs = [(attr, value if quote or value else None) for attr, quote, value in _ATTR_SELECTOR.findall(match.group(3))]
+
+    def matches(tag):
+        if name is not None and tag.name != name:
+            return False
+        if element_id is not None and tag.get('id') != element_id:
+            return False
+        if classes and not classes.issubset(tag.get('class') or ()):
+            return False
+        for attr, value in attrs:
+            actual = tag.get(attr)
+            if actual is None or (value is not None and actual != value):
+                return False
+        return True
+    return matches
+
+
+class ExtractionRules:
+    """
+    Precompiled content-root and noise selectors.
+    extract() locates the highest-priority content root in one document-order pass (stopping early once
+    the top selector matches), then collects its text in one pass over the root's subtree that skips
+    noise elements instead of decomposing them with a separate select() per noise selector.
+    """
+
+    def __init__(self, content_selectors=None, noise_selectors=None):
+        self.content_selectors = list(content_selectors or DEFAULT_CONTENT_SELECTORS)
+        self.noise_selectors = list(noise_selectors if noise_selectors is not None else DEFAULT_NOISE_SELECTORS)
+        self._content_matchers = [compile_selector(s) for s in self.content_selectors]
+
+        # Bare tag / .class / #id noise selectors are answered with set lookups; the rest use matchers.
+        self._noise_tags, self._noise_classes, self._noise_ids, self._noise_matchers = set(), set(), set(), []
+        for selector in self.noise_selectors:
+            selector = selector.strip()
+            if re.fullmatch(r'[a-zA-Z][\w-]*', selector):
+                self._noise_tags.add(selector.lower())
+            elif re.fullmatch(r'\.[\w-]+', selector):
+                self._noise_classes.add(selector[1:])
+            elif re.fullmatch(r'#[\w-]+', selector):
+                self._noise_ids.add(selector[1:])
+            else:
+                self._noise_matchers.append(compile_selector(selector))
+
+    def find_content_root(self, soup):
+        """Returns (element, selector) for the first element matching the highest-priority selector, or (None, None)."""
+        best_rank = len(self._content_matchers)
+        best = None
+        for tag in soup.descendants:
+            if not isinstance(tag, Tag):
+                continue
+            for rank in range(best_rank):
+                if self._content_matchers[rank](tag):
+                    best_rank, best = rank, tag
+                    break
+            if best_rank == 0:
+                break
+        if best is None:
+            return None, None
+        return best, self.content_selectors[best_rank]
+
+    def is_noise(self, tag):
+        if tag.name in self._noise_tags:
+            return True
+        if self._noise_classes and not self._noise_classes.isdisjoint(tag.get('class') or ()):
+            return True
+        if self._noise_ids and tag.get('id') in self._noise_ids:
+            return True
+        return any(matcher(tag) for matcher in self._noise_matchers)
+
+    def collect_text(self, root):
+        """Equivalent to root.get_text(separator='\\n', strip=True) with noise descendants removed."""
+        parts = []
+        stack = [iter(root.contents)]
+        while stack:
+            for node in stack[-1]:
+                if type(node) in _TEXT_TYPES:
+                    text = node.strip()
+                    if text:
+                        parts.append(text)
+                elif isinstance(node, Tag) and not self.is_noise(node):
+                    stack.append(iter(node.contents))
+                    break
+            else:
+                stack.pop()
+        return '\n'.join(parts)
+
+    def extract(self, soup):
+        """Returns (text, selector) for the page's main content, or (None, None) if no selector matched."""
+        root, selector = self.find_content_root(soup)
+        if root is None:
+            return None, None
+        return self.collect_text(root), selector
+
+
+DEFAULT_RULES = ExtractionRules()
+_domain_rules = {}
+
+
+def register_domain_rules(domain, content_selectors=None, noise_selectors=None):
+    """
+    Registers extraction rules for a domain (and its subdomains).
+    Selector lists left as None fall back to the defaults.
+    """
+    _domain_rules[domain.lower().lstrip('.')] = ExtractionRules(content_selectors, noise_selectors)
+
+
+def rules_for_url(url):
+    """Returns the ExtractionRules registered for url's host or its closest parent domain, else DEFAULT_RULES."""
+    host = (urlparse(url).hostname or '').lower()
+    while host:
+        rules = _domain_rules.get(host)
+        if rules is not None:
+            return rules
+        host = host.partition('.')[2]
+    return DEFAULT_RULES
+
+
+def load_rules_file(path):
+    """Registers every domain from a JSON rules file ({"domain": {"content": [...], "noise": [...]}})."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for domain, rules in json.load(f).items():
+            register_domain_rules(domain, rules.get('content'), rules.get('noise'))
+
+
+if EXTRACTION_RULES_FILE:
+    try:
+        load_rules_file(EXTRACTION_RULES_FILE)
+    except (OSError, ValueError, AttributeError) as e:
+        logger.error(f"Could not load extraction rules from {EXTRACTION_RULES_FILE}: {e}")
@@ -0,0 +1,247 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .metrics import count_fetch, observe_stage, record_connect, connect_seconds
+from .ratelimit import THROTTLE_STATUS_CODES
+from .utils import logger
+
+# --- HTTP Connection Pool Configuration ---
+POOL_CONNECTIONS = 20 # Number of per-host connection pools kept alive
+POOL_MAXSIZE = 8 # Keep-alive connections per host (should be >= the crawl worker count)
+RETRY_TOTAL = 3 # Retries for connection errors and retryable status codes
+RETRY_BACKOFF_FACTOR = 0.5 # Exponential backoff base in seconds (0.5, 1, 2, ...)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# --- Response Limits ---
+MAX_RESPONSE_BYTES = int(os.getenv("SCRAPER_MAX_RESPONSE_BYTES", str(10 * 1024 * 1024))) # Larger bodies are abandoned
+ALLOWED_CONTENT_TYPES = ("text/html", "application/xhtml+xml") # Responses without a Content-Type are allowed too
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ResponseRejected(requests.exceptions.RequestException):
+    """A response was abandoned before (or while) its body was read."""
+
+
+class UnsupportedContentType(ResponseRejected):
+    """The Content-Type isn't one the crawler can parse (PDFs, images, archives...)."""
+
+
+class ResponseTooLarge(ResponseRejected):
+    """The body is larger than the configured byte cap."""
+
+
+class FetchedPage:
+    """The parts of an HTTP response the crawler keeps once the body has been read."""
+
+    __slots__ = ("url", "final_url", "status_code", "content_type", "content", "fetched_at", "from_cache")
+
+    def __init__(self, url, final_url, status_code, content_type, content, fetched_at=None, from_cache=False):
+        self.url = url
+        self.final_url = final_url
+        self.status_code = status_code
+        self.content_type = content_type
+        self.content = content
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.from_cache = from_cache # True when the body came from the HTTP cache after a 304
+
+
+def _accept_encoding():
+    # urllib3 only decodes brotli when one of the brotli packages is importable,
+    # so only advertise it in that case.
+    try:
+        import brotli  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        pass
+    try:
+        import brotlicffi  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        return "gzip, deflate"
+
+
+class _TimedConnectionMixin:
+    """Reports how long each new connection takes to set up (DNS lookup, TCP connect and TLS handshake)."""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        host = self.host if self.port in (None, self.default_port) else f"{self.host}:{self.port}"
+        record_connect(host, time.perf_counter() - started)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections record their setup time (see metrics.py)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def create_session(pool_maxsize=POOL_MAXSIZE, pool_connections=POOL_CONNECTIONS, retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR):
+    """
+    Creates a requests.Session with keep-alive connection pooling and retries.
+    - pool_maxsize: Connections kept open per host; size it to the number of concurrent workers.
+    - retries/backoff_factor: Retries on connection errors and 429/5xx, honoring Retry-After headers.
+    The session negotiates gzip (and brotli when a decoder is installed), and its connections report
+    their setup time to metrics.py.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False, # Let response.raise_for_status() report the final status
+    )
+    adapter = InstrumentedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = _accept_encoding()
+    return session
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_default_session():
+    """
+    Returns the process-wide pooled session, creating it on first use.
+    Discovery and scraping share it by default, so pages fetched in both phases reuse warm connections.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = create_session()
+            logger.debug(f"Created shared HTTP session (pool size {POOL_MAXSIZE} per host).")
+        return _default_session
+
+
+def fetch_page(url, session=None, timeout=15, cache=None, max_bytes=MAX_RESPONSE_BYTES, allowed_types=ALLOWED_CONTENT_TYPES, budget=None,
+               rate_limiter=None):
+    """
+    Fetches url with the given (or shared) session and returns a FetchedPage.
+    If cache (an HttpCache) is given, the request is made conditional on the cached
+    validators and a 304 response is served from the cached body.
+    The body is streamed: responses whose Content-Type isn't in allowed_types (None allows any) or whose
+    Content-Length exceeds max_bytes are abandoned before the body is read, and reading stops as soon as
+    more than max_bytes arrive (None disables the cap). Both raise a ResponseRejected subclass.
+    If rate_limiter (a HostRateLimiter) is given, the fetch first waits for it, uses its timeout for the host,
+    and reports the outcome (status, time to first byte, throttling) back to it.
+    If budget (a FairRequestBudget) is given, the fetch waits for and holds one of its slots until the body is read.
+    Raises requests.exceptions.RequestException (including HTTPError for 4xx/5xx) on failure.
+    """
+    session = session or get_default_session()
+    host = urlparse(url).netloc
+    if rate_limiter is not None:
+        observe_stage("ratelimit", rate_limiter.acquire(url), host)
+        timeout = rate_limiter.timeout_for(host, timeout)
+    outcome = {"status": "error"} # Filled in by _fetch however the fetch ends
+    try:
+        if budget is not None:
+            with budget.slot(url):
+                return _fetch(url, host, session, timeout, cache, max_bytes, allowed_types, outcome)
+        return _fetch(url, host, session, timeout, cache, max_bytes, allowed_types, outcome)
+    finally:
+        if rate_limiter is not None:
+            rate_limiter.record(host, outcome["status"], outcome.get("ttfb"), outcome.get("throttled", False))
+
+
+def _fetch(url, host, session, timeout, cache, max_bytes, allowed_types, outcome):
+    headers = cache.conditional_headers(url) if cache is not None else {}
+    received = 0
+    try:
+        response = _timed_get(session, url, host, timeout, headers, outcome)
+        outcome["status"] = response.status_code
+
+        if response.status_code == 304 and headers:
+            response.close()
+            cached = cache.load(url)
+            if cached is not None:
+                final_url, content_type, body = cached
+                logger.debug(f"HTTP cache hit (304 Not Modified): {url}")
+                return FetchedPage(url, final_url, 200, content_type, body, from_cache=True)
+            # The body vanished from the cache; fetch it again unconditionally.
+            response = _timed_get(session, url, host, timeout, {}, outcome)
+            outcome["status"] = response.status_code
+
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            started = time.perf_counter()
+            content = _read_body(response, content_type, max_bytes, allowed_types)
+            observe_stage("download", time.perf_counter() - started, host)
+        received = len(content)
+    except ResponseRejected:
+        outcome["status"] = "rejected"
+        raise
+    finally:
+        count_fetch(host, outcome["status"], received) # Recorded per host and status in metrics.py
+
+    page = FetchedPage(url, response.url, response.status_code, content_type, content)
+    if cache is not None and "no-store" not in response.headers.get("Cache-Control", ""):
+        cache.store(url, page.final_url, page.content_type, page.content,
+                    etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+    return page
+
+
+def _timed_get(session, url, host, timeout, headers, outcome):
+    """
+    Starts a streamed GET, recording the time to the response headers (excluding connection setup) as ttfb.
+    Also notes in outcome whether the session had to retry through a 429/503 to get the response.
+    """
+    connect_before = connect_seconds()
+    started = time.perf_counter()
+    response = session.get(url, timeout=timeout, allow_redirects=True, headers=headers, stream=True)
+    outcome["ttfb"] = time.perf_counter() - started - (connect_seconds() - connect_before)
+    observe_stage("ttfb", outcome["ttfb"], host)
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and any(attempt.status in THROTTLE_STATUS_CODES for attempt in retries.history):
+        outcome["throttled"] = True
+    return response
+
+
+def _read_body(response, content_type, max_bytes, allowed_types):
+    """Reads a streamed response body, enforcing the content-type filter and byte cap."""
+    mime_type = content_type.split(";", 1)[0].strip().lower()
+    if allowed_types is not None and mime_type and mime_type not in allowed_types:
+        raise UnsupportedContentType(f"Skipping {mime_type} response from {response.url}", response=response)
+    declared = response.headers.get("Content-Length")
+    if max_bytes is not None and declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ResponseTooLarge(f"Content-Length {declared} exceeds the {max_bytes}-byte limit for {response.url}", response=response)
+
+    chunks = []
+    received = 0
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            raise ResponseTooLarge(f"Body of {response.url} exceeds the {max_bytes}-byte limit", response=response)
+        chunks.append(chunk)
+    return b"".join(chunks)
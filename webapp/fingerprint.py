@@ -0,0 +1,87 @@
+import hashlib
+import re
+import threading
+from collections import Counter
+
+# --- Near-Duplicate Detection Configuration ---
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3 # Words per shingle hashed into the fingerprint
+NEAR_DUPLICATE_DISTANCE = 3 # Max differing fingerprint bits for two pages to count as near-duplicates
+MIN_SIMHASH_TOKENS = 20 # Shorter texts are only collapsed when they are exact duplicates
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def simhash(text, shingle_size=SHINGLE_SIZE):
+    """
+    64-bit SimHash of text over overlapping word shingles.
+    Similar texts get fingerprints that differ in few bits (small Hamming distance).
+    Returns (fingerprint, token_count).
+    """
+    tokens = _WORD.findall(text.lower())
+    if len(tokens) <= shingle_size:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = (' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1))
+    # Count set bits column by column over the concatenated digests: Counter does the per-shingle work in C.
+    digests = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    total = len(digests) // 8
+    fingerprint = 0
+    for byte_index in range(8):
+        ones = [0] * 8
+        for value, count in Counter(digests[byte_index::8]).items():
+            for bit in range(8):
+                if value >> bit & 1:
+                    ones[bit] += count
+        for bit in range(8):
+            if 2 * ones[bit] > total:
+                fingerprint |= 1 << (byte_index * 8 + bit)
+    return fingerprint, len(tokens)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """
+    Finds pages whose SimHash is within max_distance bits of one already added.
+    Fingerprints are split into max_distance + 1 bands; two fingerprints within max_distance bits
+    must agree on at least one whole band, so only pages sharing a band are compared.
+    """
+
+    def __init__(self, max_distance=NEAR_DUPLICATE_DISTANCE):
+        self.max_distance = max_distance
+        self._bands = max_distance + 1
+        self._band_bits = SIMHASH_BITS // self._bands
+        self._tables = [{} for _ in range(self._bands)]
+        self._exact = {}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self._band_bits) - 1
+        return [(fingerprint >> (i * self._band_bits)) & mask for i in range(self._bands)]
+
+    def check_and_add(self, key, text_hash, fingerprint, token_count):
+        """
+        Returns the key of an earlier page that text duplicates (exactly, by text_hash, or nearly, by
+        fingerprint), or None after adding this page to the index.
+        """
+        with self._lock:
+            if text_hash in self._exact:
+                return self._exact[text_hash]
+            near = token_count >= MIN_SIMHASH_TOKENS
+            if near:
+                band_keys = self._band_keys(fingerprint)
+                for table, band_key in zip(self._tables, band_keys):
+                    for other_fingerprint, other_key in table.get(band_key, ()):
+                        if hamming_distance(fingerprint, other_fingerprint) <= self.max_distance:
+                            return other_key
+            self._exact[text_hash] = key
+            if near:
+                for table, band_key in zip(self._tables, band_keys):
+                    table.setdefault(band_key, []).append((fingerprint, key))
+            return None
+
+    def __len__(self):
+        return len(self._exact)
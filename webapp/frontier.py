@@ -0,0 +1,152 @@
+import hashlib
+import heapq
+import os
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# --- Frontier Memory Configuration ---
+FRONTIER_MEMORY_ITEMS = 100_000 # Queued URLs kept in memory before further pushes spill to disk
+FRONTIER_SPILL_CHUNK = 10_000 # URLs written per spill segment file
+FRONTIER_SPILL_DIR = os.getenv("SCRAPER_FRONTIER_SPILL_DIR") # None = system temp directory
+URL_SET_MERGE_MIN = 65_536 # Pending hashes buffered before they are merged into the sorted array
+
+
+def url_hash(url: str) -> int:
+    """64-bit fingerprint of a URL. Collisions are negligible below billions of URLs."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class UrlHashSet:
+    """
+    Set of URLs stored as 64-bit hashes: a sorted array('Q') (8 bytes per URL) plus a small
+    buffer of recent additions that is merged in once it grows. A plain set of URL strings
+    costs well over 100 bytes per entry.
+    """
+
+    def __init__(self, urls=()):
+        self._sorted = array("Q")
+        self._pending = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str) -> bool:
+        """Adds url; returns True if it was not already present."""
+        h = url_hash(url)
+        if h in self._pending or self._in_sorted(h):
+            return False
+        self._pending.add(h)
+        if len(self._pending) >= max(URL_SET_MERGE_MIN, len(self._sorted) // 8):
+            self._merge()
+        return True
+
+    def update(self, urls) -> None:
+        for url in urls:
+            self.add(url)
+
+    def _in_sorted(self, h: int) -> bool:
+        i = bisect_left(self._sorted, h)
+        return i < len(self._sorted) and self._sorted[i] == h
+
+    def _merge(self):
+        # Merge without materializing the whole set as Python ints.
+        self._sorted = array("Q", heapq.merge(self._sorted, sorted(self._pending)))
+        self._pending.clear()
+
+    def __contains__(self, url: str) -> bool:
+        h = url_hash(url)
+        return h in self._pending or self._in_sorted(h)
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending)
+
+
+class CrawlFrontier:
+    """
+    Breadth-first queue of (url, depth) pairs with a seen-set for de-duplication.
+    Seen URLs are kept as hashes (UrlHashSet). Once more than memory_items URLs are queued,
+    further pushes are written to temporary segment files and read back in order.
+    """
+
+    def __init__(self, max_depth: int, memory_items: int = FRONTIER_MEMORY_ITEMS):
+        self.max_depth = max_depth
+        self.memory_items = memory_items
+        self.seen = UrlHashSet()
+        self._head = deque() # Next items to pop
+        self._segments = deque() # Spilled segment files, oldest first
+        self._tail = [] # Pushed after the last spill; popped after every segment
+        self._spilled_count = 0
+        self._spill_dir = None
+
+    def push(self, url: str, depth: int) -> bool:
+        """
+        Enqueues url at depth unless it was already seen or lies beyond max_depth.
+        The URL is marked as seen either way, so a deeper duplicate is never re-queued.
+        Returns True if the URL was newly seen.
+        """
+        if not self.seen.add(url):
+            return False
+        if depth <= self.max_depth:
+            self._enqueue(url, depth)
+        return True
+
+    def restore(self, queued, seen):
+        """Reloads state saved by a checkpoint: queued (url, depth) pairs and every URL already seen."""
+        self.seen.update(seen)
+        for url, depth in queued:
+            self._enqueue(url, depth)
+
+    def pop(self):
+        """Returns the next (url, depth) pair in breadth-first order."""
+        if not self._head:
+            if self._segments:
+                self._head.extend(self._read_segment(self._segments.popleft()))
+            else:
+                self._head.extend(self._tail)
+                self._tail = []
+        return self._head.popleft()
+
+    def _enqueue(self, url, depth):
+        if not self._segments and not self._tail and len(self._head) < self.memory_items:
+            self._head.append((url, depth))
+            return
+        self._tail.append((url, depth))
+        if len(self._tail) >= FRONTIER_SPILL_CHUNK:
+            self._write_segment()
+
+    def _write_segment(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="frontier_", dir=FRONTIER_SPILL_DIR)
+        fd, path = tempfile.mkstemp(suffix=".seg", dir=self._spill_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(f"{depth}\t{url}\n" for url, depth in self._tail)
+        self._segments.append((path, len(self._tail)))
+        self._spilled_count += len(self._tail)
+        self._tail = []
+
+    def _read_segment(self, segment):
+        path, count = segment
+        with open(path, "r", encoding="utf-8") as f:
+            items = [(url, int(depth)) for depth, url in (line.rstrip("\n").split("\t", 1) for line in f)]
+        os.remove(path)
+        self._spilled_count -= count
+        return items
+
+    def __len__(self) -> int:
+        return len(self._head) + self._spilled_count + len(self._tail)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.seen
+
+    def __del__(self):
+        for path, _ in getattr(self, "_segments", ()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if getattr(self, "_spill_dir", None):
+            try:
+                os.rmdir(self._spill_dir)
+            except OSError:
+                pass
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from .utils import logger, ROOT_OUTPUT_DIR
+
+# --- HTTP Cache Configuration ---
+HTTP_CACHE_ENABLED = os.getenv("SCRAPER_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_DIR = os.getenv("SCRAPER_HTTP_CACHE_DIR", os.path.join(ROOT_OUTPUT_DIR, ".http_cache"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("SCRAPER_HTTP_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))) # 1 GiB
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache for conditional revalidation.
+    Bodies are stored as files and their validators (ETag / Last-Modified) in a
+    small SQLite index. Refetches send If-None-Match / If-Modified-Since and a
+    304 response is served from the stored body. The total body size is capped
+    at max_bytes; least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, final_url TEXT, content_type TEXT, etag TEXT,"
+            " last_modified TEXT, size INTEGER, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _body_path(self, url):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "bodies", digest[:2], digest)
+
+    def conditional_headers(self, url):
+        """Returns the If-None-Match / If-Modified-Since headers for a cached url ({} if not cached)."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM entries WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(self, url):
+        """
+        Returns (final_url, content_type, body) for a cached url and marks it as recently used,
+        or None if the entry (or its body file) is missing.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT final_url, content_type FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        try:
+            with open(self._body_path(url), "rb") as f:
+                body = f.read()
+        except OSError:
+            self.delete(url)
+            return None
+        return row[0], row[1], body
+
+    def store(self, url, final_url, content_type, body, etag=None, last_modified=None):
+        """Stores a response body with its validators, evicting old entries if over max_bytes."""
+        if not (etag or last_modified) or len(body) > self.max_bytes:
+            return
+        path = self._body_path(url)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"HTTP cache: could not store body for {url}: {e}")
+            return
+        with self._lock:
+            row = self._db.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, final_url, content_type, etag, last_modified, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, final_url, content_type, etag, last_modified, len(body), time.time()),
+            )
+            self._total_bytes += len(body) - (row[0] if row else 0)
+            self._evict_locked()
+            self._db.commit()
+
+    def delete(self, url):
+        with self._lock:
+            self._delete_locked(url)
+            self._db.commit()
+
+    def total_bytes(self):
+        return self._total_bytes
+
+    def _delete_locked(self, url):
+        row = self._db.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self._total_bytes -= row[0]
+        try:
+            os.remove(self._body_path(url))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute("SELECT url FROM entries ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            logger.debug(f"HTTP cache: evicting {row[0]}")
+            self._delete_locked(row[0])
+
+
+_default_http_cache = None
+_default_http_cache_lock = threading.Lock()
+
+
+def get_default_http_cache():
+    """
+    Returns the process-wide HttpCache under ROOT_OUTPUT_DIR, or None if the cache
+    is disabled (SCRAPER_HTTP_CACHE=0) or its directory cannot be created.
+    """
+    global _default_http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _default_http_cache_lock:
+        if _default_http_cache is None:
+            try:
+                _default_http_cache = HttpCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"HTTP cache disabled: could not open {HTTP_CACHE_DIR}: {e}")
+                _default_http_cache = False # Don't retry on every fetch
+        return _default_http_cache or None
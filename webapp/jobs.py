@@ -0,0 +1,284 @@
+import copy
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .events import EventChannel, current_channel
+from .utils import logger, ROOT_OUTPUT_DIR
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory file locks, so only one process may resume jobs there
+    fcntl = None
+
+# --- Background Job Configuration ---
+JOB_WORKERS = int(os.getenv("SCRAPER_JOB_WORKERS", "4")) # Crawls that run at the same time
+MAX_FINISHED_JOBS = 200 # Finished jobs kept in memory for /jobs/<id> before the oldest are dropped
+JOB_STATE_DIR = os.getenv("SCRAPER_JOB_STATE_DIR", os.path.join(ROOT_OUTPUT_DIR, ".jobs")) # Job specs saved here survive restarts
+RESUME_JOBS = os.getenv("SCRAPER_RESUME_JOBS", "0") == "1" # Re-run interrupted jobs when the web app starts
+
+
+class Job:
+    """A unit of background work (discovery or scraping) with progress and partial results."""
+
+    def __init__(self, kind, params, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued" # queued -> running -> finished | failed
+        self.progress = {}
+        self.result = {}
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.events = EventChannel() # Per-job log lines, progress and status changes for /logs_stream
+        self.resumed = False # True if this job was interrupted by a restart and is being run again
+        self.state_path = None # Where save() writes the job spec, if the manager persists jobs
+
+    def update_progress(self, **fields):
+        """Merges fields into the job's progress and publishes the new progress as an event."""
+        with self.lock:
+            self.progress.update(fields)
+            snapshot = dict(self.progress)
+        self.events.publish("progress", snapshot)
+
+    def set_result(self, key, value):
+        with self.lock:
+            self.result[key] = value
+
+    def is_finished(self):
+        return self.done.is_set()
+
+    def save(self):
+        """Writes the job's snapshot to state_path (atomically), so it can be resumed after a restart."""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, self.state_path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not save state for job {self.id}: {e}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a job from a to_dict() snapshot. The caller decides whether to run it again."""
+        job = cls(data["kind"], data.get("params") or {}, job_id=data["id"])
+        job.status = data.get("status", "queued")
+        job.progress = data.get("progress") or {}
+        job.result = data.get("result") or {}
+        job.error = data.get("error")
+        job.created_at = data.get("created_at", job.created_at)
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        return job
+
+    def to_dict(self):
+        """JSON-serializable snapshot of the job, safe to take while the job is running."""
+        with self.lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "params": copy.deepcopy(self.params),
+                "progress": copy.deepcopy(self.progress),
+                "result": copy.deepcopy(self.result),
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on a local thread pool and keeps them addressable by ID.
+    No external broker is needed; a single server process can run several crawls at once.
+    If state_dir is given, every job's spec and status is saved there, and resume_jobs() re-runs
+    the jobs that a previous process left unfinished. While a job is queued or running, its process holds
+    an exclusive lock on <job id>.lock in state_dir; the lock goes away with the process, and resume_jobs()
+    only re-runs jobs it can lock, so several processes sharing state_dir never run the same job twice.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, state_dir=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._claims = {} # job ID -> open lock file, while the job is queued or running here
+        self._lock = threading.Lock()
+        self._loaded = threading.Event() # Cleared while resume_jobs_in_background() is loading saved jobs
+        self._loaded.set()
+        self.state_dir = state_dir
+        if state_dir:
+            try:
+                os.makedirs(state_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not create job state directory {state_dir}; jobs won't survive restarts: {e}")
+                self.state_dir = None
+
+    def submit(self, kind, func, **params):
+        """
+        Queues func(job, **params) and returns the Job immediately.
+        Whatever func returns is merged into job.result; an exception marks the job failed.
+        """
+        job = Job(kind, params)
+        self._enqueue(job, func)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def resume_jobs(self, handlers):
+        """
+        Loads jobs saved by a previous process. Jobs that were queued or running are run again with
+        job.resumed set, using handlers[kind] as their function; finished ones are kept for /jobs/<id>.
+        Returns the list of resumed jobs.
+        """
+        if not self.state_dir:
+            return []
+        saved = []
+        for path in glob.glob(os.path.join(self.state_dir, "*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved.append(Job.from_dict(json.load(f)))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable job state file {path}: {e}")
+        resumed = []
+        for job in sorted(saved, key=lambda job: job.created_at):
+            if job.status in ("queued", "running"):
+                if job.kind not in handlers:
+                    continue
+                if not self._claim(job.id):
+                    logger.info(f"{job.kind} job {job.id} is running in another process; not resuming it.")
+                    continue
+                job.status = "queued"
+                job.resumed = True
+                self._enqueue(job, handlers[job.kind])
+                resumed.append(job)
+                logger.info(f"Resuming interrupted {job.kind} job {job.id}")
+            else:
+                job.events.close()
+                job.done.set()
+                job.state_path = self._state_path(job.id)
+                with self._lock:
+                    self._jobs[job.id] = job
+        with self._lock:
+            self._prune()
+        return resumed
+
+    def resume_jobs_in_background(self, handlers):
+        """
+        resume_jobs(handlers) on a background thread, so a cold start doesn't wait for every saved job to be read.
+        get() and list_jobs() wait until the saved jobs are loaded.
+        """
+        if not self.state_dir:
+            return
+        self._loaded.clear()
+
+        def load():
+            try:
+                self.resume_jobs(handlers)
+            except Exception as e:
+                logger.error(f"Could not resume saved jobs: {e}", exc_info=True)
+            finally:
+                self._loaded.set()
+
+        threading.Thread(target=load, name="job-resume", daemon=True).start()
+
+    def get(self, job_id):
+        self._loaded.wait()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        self._loaded.wait()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _claim(self, job_id):
+        """Takes job_id's lock file. Returns False if another process holds it."""
+        if not self.state_dir or fcntl is None:
+            return True
+        with self._lock:
+            if job_id in self._claims:
+                return True
+        try:
+            lock_file = open(self._lock_path(job_id), "a")
+        except OSError as e:
+            logger.warning(f"Could not create lock file for job {job_id}: {e}")
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        with self._lock:
+            self._claims[job_id] = lock_file
+        return True
+
+    def _release(self, job_id):
+        with self._lock:
+            lock_file = self._claims.pop(job_id, None)
+        if lock_file is not None:
+            lock_file.close() # Closing drops the lock
+
+    def _enqueue(self, job, func):
+        self._claim(job.id)
+        job.state_path = self._state_path(job.id)
+        job.save()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, job.params)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json") if self.state_dir else None
+
+    def _lock_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.lock")
+
+    def _run(self, job, func, params):
+        # Route log records from this job (and threads it submits with submit_with_context) to its channel.
+        token = current_channel.set(job.events)
+        with job.lock:
+            job.status = "running"
+            job.started_at = time.time()
+        job.events.publish("status", "running")
+        job.save()
+        try:
+            result = func(job, **params)
+            with job.lock:
+                if result:
+                    job.result.update(result)
+                job.status = "finished"
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {e}", exc_info=True)
+            with job.lock:
+                job.status = "failed"
+                job.error = str(e)
+        finally:
+            with job.lock:
+                job.finished_at = time.time()
+            job.save()
+            self._release(job.id)
+            job.events.publish("status", job.status)
+            job.events.close()
+            current_channel.reset(token)
+            job.done.set()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            job = self._jobs.pop(job_id)
+            if job.state_path:
+                for path in (job.state_path, self._lock_path(job_id)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from .utils import logger
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def content_hash(text):
+    """Returns the SHA-256 hex digest used to detect changed page text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(session_dir):
+    """
+    Loads the page manifest of a session directory.
+    Returns a dict {url: {"file": ..., "sha256": ..., "scraped_at": ...}}, empty if there is none.
+    """
+    path = os.path.join(session_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("pages", {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read manifest {path}, treating every page as new: {e}")
+        return {}
+
+
+def save_manifest(session_dir, pages):
+    """Atomically writes the page manifest of a session directory."""
+    path = os.path.join(session_dir, MANIFEST_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "updated_at": datetime.now().isoformat(), "pages": pages}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write_change_report(session_dir, added, changed, removed, unchanged_count):
+    """
+    Writes changes_<timestamp>.json listing the URLs added, changed and removed by a scrape run,
+    so downstream indexers can process only the delta. Returns the report path.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    path = os.path.join(session_dir, f"changes_{timestamp}.json")
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "added": sorted(added),
+        "changed": sorted(changed),
+        "removed": sorted(removed),
+        "unchanged_count": unchanged_count,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    return path
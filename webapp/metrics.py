@@ -0,0 +1,290 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- Metrics Configuration ---
+METRICS_ENABLED = os.getenv("SCRAPER_METRICS", "1") != "0"
+PROFILE_ENABLED = os.getenv("SCRAPER_PROFILE", "0") == "1" # Write profile.json into every scrape session directory
+PROFILE_FILENAME = "profile.json"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # seconds
+METRICS_MAX_HOSTS = 500 # Distinct host label values kept; later hosts are reported as host="other"
+
+# Per-crawl profile that observations in the current context (a scrape and its worker threads) also go to.
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+_METRIC_HELP = {
+    'scraper_stage_duration_seconds': ('histogram', "Time spent per crawl stage (ratelimit, connect, ttfb, download, parse, extract, fingerprint, write)."),
+    'scraper_fetches_total': ('counter', "HTTP fetches by host and final status (a status code, 'error' or 'rejected')."),
+    'scraper_fetch_bytes_total': ('counter', "Response body bytes downloaded, by host."),
+    'scraper_pages_total': ('counter', "Pages handled by discovery and scraping, by outcome."),
+    'scraper_jobs': ('gauge', "Background jobs currently known to the job manager, by kind and status."),
+}
+
+
+def _bucket_quantile(counts, buckets, fraction, maximum):
+    """Approximates a quantile from histogram bucket counts: the upper bound of the bucket it falls in."""
+    total = sum(counts)
+    if not total:
+        return None
+    target = fraction * total
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= target:
+            return min(bound, maximum)
+    return maximum
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and histograms keyed by metric name and labels,
+    rendered in the Prometheus text exposition format by render().
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, max_hosts=METRICS_MAX_HOSTS):
+        self.buckets = tuple(buckets)
+        self.max_hosts = max_hosts
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {} # key -> [per-bucket counts (the last one is +Inf), sum]
+        self._hosts = set()
+        self._lock = threading.Lock()
+
+    def _key(self, name, labels):
+        host = labels.get('host')
+        if host is not None and host not in self._hosts:
+            if len(self._hosts) < self.max_hosts:
+                self._hosts.add(host)
+            else:
+                labels = dict(labels, host='other')
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            key = self._key(name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def clear_gauge(self, name):
+        """Drops every label set of a gauge, e.g. before setting the current values again."""
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name]:
+                del self._gauges[key]
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = self._key(name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge (0 if it was never set)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def render(self):
+        """Returns every metric in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, (list(counts), total)) for key, (counts, total) in self._histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {_METRIC_HELP.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            describe(name, 'gauge')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (counts, total) in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+class CrawlProfile:
+    """
+    Where one crawl spent its time: per-stage latency (count, total, approximate p50/p99, max),
+    per-host fetch statuses, bytes and stage totals, and page outcomes. Saved as profile.json.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started_at = datetime.now().isoformat()
+        self._started = time.monotonic()
+        self._stages = {} # stage -> [per-bucket counts, total seconds, max seconds]
+        self._hosts = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = {'fetches': {}, 'bytes': 0, 'stage_seconds': {}}
+        return entry
+
+    def observe(self, stage, seconds, host=None):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0.0]
+            stats[0][bisect_left(self.buckets, seconds)] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if host is not None:
+                stage_seconds = self._host(host)['stage_seconds']
+                stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+
+    def count_fetch(self, host, status, nbytes=0):
+        with self._lock:
+            entry = self._host(host)
+            entry['fetches'][str(status)] = entry['fetches'].get(str(status), 0) + 1
+            entry['bytes'] += nbytes
+
+    def count_page(self, status):
+        with self._lock:
+            self._pages[status] = self._pages.get(status, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            wall = time.monotonic() - self._started
+            busy = sum(total for _, total, _ in self._stages.values()) or 1e-9
+            stages = {}
+            for stage, (counts, total, maximum) in sorted(self._stages.items(), key=lambda item: -item[1][1]):
+                count = sum(counts)
+                p50 = _bucket_quantile(counts, self.buckets, 0.5, maximum)
+                p99 = _bucket_quantile(counts, self.buckets, 0.99, maximum)
+                stages[stage] = {'count': count, 'total_seconds': round(total, 4), 'share': round(total / busy, 4),
+                                 'mean_ms': round(total / count * 1000, 3),
+                                 'p50_ms': round(p50 * 1000, 3), 'p99_ms': round(p99 * 1000, 3),
+                                 'max_ms': round(maximum * 1000, 3)}
+            hosts = {host: {'fetches': dict(entry['fetches']), 'bytes': entry['bytes'],
+                            'stage_seconds': {stage: round(seconds, 4) for stage, seconds in entry['stage_seconds'].items()}}
+                     for host, entry in self._hosts.items()}
+            pages = dict(self._pages)
+        handled = sum(pages.values())
+        return {'started_at': self.started_at, 'wall_seconds': round(wall, 3), 'pages': pages,
+                'pages_per_sec': round(handled / max(wall, 1e-6), 2),
+                'stages': stages, 'hosts': hosts}
+
+    def save(self, session_dir):
+        """Writes the profile to profile.json in session_dir and returns its path."""
+        path = os.path.join(session_dir, PROFILE_FILENAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        return path
+
+
+@contextmanager
+def profiling(profile):
+    """Routes stage timings and counts recorded in this context (and the workers it submits to) to profile."""
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_metrics():
+    """Returns the process-wide MetricsRegistry exposed on /metrics."""
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = MetricsRegistry()
+        return _default_metrics
+
+
+# --- Recording helpers used on the crawl hot paths ---
+
+def observe_stage(stage, seconds, host=None):
+    """Records seconds spent in a crawl stage for host."""
+    if METRICS_ENABLED:
+        get_default_metrics().observe('scraper_stage_duration_seconds', seconds, stage=stage, host=host or '')
+    profile = current_profile.get()
+    if profile is not None:
+        profile.observe(stage, seconds, host)
+
+
+@contextmanager
+def timed_stage(stage, host=None):
+    """Times the enclosed block as one observation of stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, host)
+
+
+def count_fetch(host, status, nbytes=0):
+    """Counts one fetch of host ending in status (HTTP status code, 'error' or 'rejected') and its body bytes."""
+    if METRICS_ENABLED:
+        registry = get_default_metrics()
+        registry.inc('scraper_fetches_total', host=host, status=str(status))
+        if nbytes:
+            registry.inc('scraper_fetch_bytes_total', nbytes, host=host)
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count_fetch(host, status, nbytes)
+
+
+def count_page(phase, status):
+    """Counts one page handled by phase ('discover' or 'scrape') with the given outcome."""
+    if METRICS_ENABLED:
+        get_default_metrics().inc('scraper_pages_total', phase=phase, status=status)
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count_page(status)
+
+
+_connect_time = threading.local()
+
+
+def record_connect(host, seconds):
+    """Records a new connection's setup time (DNS, TCP and TLS handshake); called by the pooled connections."""
+    _connect_time.total = getattr(_connect_time, 'total', 0.0) + seconds
+    observe_stage('connect', seconds, host)
+
+
+def connect_seconds():
+    """Total connection setup time on the current thread so far, to separate it from time to first byte."""
+    return getattr(_connect_time, 'total', 0.0)
@@ -0,0 +1,183 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import count
+from urllib.parse import urlparse
+
+from .utils import logger, create_session_output_directory
+from .ratelimit import create_rate_limiter
+from .events import submit_with_context
+from .checkpoint import CHECKPOINT_ENABLED, discovery_checkpoint_path
+from .scraper import start_link_discovery, scrape_selected_pages, MAX_WORKERS, POLITENESS_DELAY
+
+# --- Multi-Site Crawl Configuration ---
+MAX_IN_FLIGHT = int(os.getenv("SCRAPER_MAX_IN_FLIGHT", "16")) # HTTP page requests in flight across all sites and jobs
+MAX_CONCURRENT_SITES = int(os.getenv("SCRAPER_MAX_SITES", "16")) # Sites crawled at once; the rest wait for a free slot
+
+
+class FairRequestBudget:
+    """
+    Global cap on in-flight requests, shared fairly between hosts.
+    When a slot frees up it goes to the waiting host with the fewest requests already in flight
+    (the longest-waiting request breaks ties), so a large site with many busy workers can't crowd out
+    small sites: every waiting host gets an equal share of the budget.
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self._in_flight = {} # host -> requests in flight
+        self._total = 0
+        self._waiting = OrderedDict() # ticket -> host, oldest first
+        self._tickets = count()
+        self._cond = threading.Condition()
+
+    def _next_ticket(self):
+        """Ticket of the waiter that gets the next free slot."""
+        return min(self._waiting, key=lambda ticket: (self._in_flight.get(self._waiting[ticket], 0), ticket))
+
+    def acquire(self, host):
+        """Blocks until host may start a request."""
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting[ticket] = host
+            try:
+                while self._total >= self.max_in_flight or self._next_ticket() != ticket:
+                    self._cond.wait()
+            finally:
+                del self._waiting[ticket]
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._total += 1
+            self._cond.notify_all() # The next waiter may fit too
+
+    def release(self, host):
+        with self._cond:
+            remaining = self._in_flight[host] - 1
+            if remaining:
+                self._in_flight[host] = remaining
+            else:
+                del self._in_flight[host]
+            self._total -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url_or_host):
+        """Holds one slot for url_or_host's host for the duration of the with block."""
+        host = urlparse(url_or_host).netloc or url_or_host
+        self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def in_flight(self, host=None):
+        """Requests currently in flight, for one host or in total."""
+        with self._cond:
+            return self._total if host is None else self._in_flight.get(host, 0)
+
+
+def group_links_by_site(urls):
+    """Groups URLs by host (netloc), keeping first-seen order of hosts and of the URLs within each."""
+    groups = OrderedDict()
+    for url in urls:
+        groups.setdefault(urlparse(url).netloc or "general_scrape", []).append(url)
+    return groups
+
+
+class CrawlOrchestrator:
+    """
+    Runs discovery or scraping for many sites concurrently.
+    Up to max_sites sites run at the same time, each with its own worker pool, and every fetch
+    holds a slot of one shared FairRequestBudget, so never more than max_in_flight requests
+    are open and hosts share them evenly. Politeness limits are per host and
+    shared between sites too, so two base URLs on the same host don't double its request rate,
+    and what one crawl learns about a host's limits (see AdaptiveRateLimiter) carries over to the next.
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_sites=MAX_CONCURRENT_SITES, workers=MAX_WORKERS):
+        self.budget = FairRequestBudget(max_in_flight)
+        self.max_sites = max_sites
+        self.workers = max(1, min(workers, max_in_flight)) # More workers per site than slots would just wait
+        self.discovery_rate_limiter = create_rate_limiter(rate=2 / POLITENESS_DELAY)
+        self.scrape_rate_limiter = create_rate_limiter(rate=1 / POLITENESS_DELAY)
+
+    def _run_sites(self, sites, run_site):
+        """Runs run_site(site) for every site, max_sites at a time. Yields (site, result, error) as sites finish."""
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_sites, len(sites)))) as pool:
+            futures = {submit_with_context(pool, run_site, site): site for site in sites}
+            for future in as_completed(futures):
+                site = futures[future]
+                try:
+                    yield site, future.result(), None
+                except Exception as e:
+                    logger.error(f"Crawl of {site} failed: {e}", exc_info=True)
+                    yield site, None, e
+
+    def discover(self, base_urls, progress_callback=None, run_id=None, **discovery_options):
+        """
+        Discovers links on every base URL concurrently. Yields (base_url, links, error) as each site finishes;
+        links is None if the site's discovery raised error. A base URL given more than once is discovered once.
+        progress_callback(base_url, stats) receives start_link_discovery's progress for each site.
+        run_id (e.g. a job ID) keys the sites' checkpoints, so overlapping runs for the same base URL don't share one;
+        pass the same run_id with resume=True to continue the run.
+        discovery_options (max_depth, resume, discovery_mode...) are passed to start_link_discovery.
+        """
+        def run_site(base_url):
+            on_progress = (lambda stats: progress_callback(base_url, stats)) if progress_callback else None
+            if run_id is not None and CHECKPOINT_ENABLED:
+                options = dict(discovery_options, checkpoint_path=discovery_checkpoint_path(base_url, run_id=run_id))
+            else:
+                options = discovery_options
+            return start_link_discovery(base_url, workers=self.workers, rate_limiter=self.discovery_rate_limiter,
+                                        budget=self.budget, progress_callback=on_progress, **options)
+
+        base_urls = list(dict.fromkeys(base_urls)) # Concurrent runs of one URL would share its results and checkpoint
+        logger.info(f"Discovering {len(base_urls)} site(s), {self.max_sites} at a time, with at most {self.budget.max_in_flight} requests in flight.")
+        yield from self._run_sites(base_urls, run_site)
+
+    def scrape(self, site_links, session_dirs=None, progress_callback=None, page_callback=None, **scrape_options):
+        """
+        Scrapes each site's links into its own session directory, concurrently.
+        site_links maps a site name to its URLs (see group_links_by_site). session_dirs maps site names to
+        existing session directories to write into; the others get a new directory named after the site.
+        Yields (site, (session_dir, scraped, total, errors), error) as each site finishes.
+        progress_callback(site, stats) receives scrape_selected_pages' progress for each site, and
+        page_callback(site, url, status, text) each page's extracted text (see scrape_selected_pages' on_page).
+        scrape_options (incremental, resume, output_format...) are passed to scrape_selected_pages.
+        """
+        session_dirs = session_dirs or {}
+
+        def run_site(site):
+            on_progress = (lambda stats: progress_callback(site, stats)) if progress_callback else None
+            on_page = (lambda url, status, text: page_callback(site, url, status, text)) if page_callback else None
+            return scrape_selected_pages(site, site_links[site], existing_session_dir=session_dirs.get(site),
+                                         workers=self.workers, rate_limiter=self.scrape_rate_limiter, budget=self.budget,
+                                         progress_callback=on_progress, on_page=on_page, **scrape_options)
+
+        logger.info(f"Scraping {sum(len(links) for links in site_links.values())} page(s) from {len(site_links)} site(s), "
+                    f"with at most {self.budget.max_in_flight} requests in flight.")
+        yield from self._run_sites(list(site_links), run_site)
+
+
+_default_orchestrator = None
+_default_orchestrator_lock = threading.Lock()
+
+
+def get_default_orchestrator():
+    """
+    Returns the process-wide CrawlOrchestrator. Jobs share it, so its request budget caps
+    the requests in flight across every job running in this process.
+    """
+    global _default_orchestrator
+    with _default_orchestrator_lock:
+        if _default_orchestrator is None:
+            _default_orchestrator = CrawlOrchestrator()
+        return _default_orchestrator
+
+
+def create_site_session_dirs(sites):
+    """Creates a new session directory named after each site's domain. Returns {site: directory}."""
+    return {site: create_session_output_directory(f"http://{site}") for site in sites}
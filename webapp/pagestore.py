@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .fetcher import FetchedPage
+from .utils import logger
+
+# --- Page Store Configuration ---
+PAGE_STORE_TTL = 15 * 60 # seconds a discovered body stays fresh enough to scrape without refetching
+PAGE_STORE_MEMORY_BYTES = 64 * 1024 * 1024 # bodies kept in memory before spilling to disk
+PAGE_STORE_DISK_BYTES = 512 * 1024 * 1024 # spilled bodies kept on disk before the oldest are dropped
+PAGE_STORE_DIR = os.getenv("SCRAPER_PAGE_STORE_DIR", os.path.join(tempfile.gettempdir(), "scraper_page_store"))
+
+
+class PageStore:
+    """
+    Bounded, disk-spillable store of fetched pages keyed by URL.
+    Discovery puts every body it downloads here so the scrape phase can reuse
+    fresh ones instead of fetching them again. The least recently used bodies
+    are spilled to disk once the memory budget is exceeded, and the oldest
+    spilled bodies are deleted once the disk budget is exceeded.
+    """
+
+    def __init__(self, max_memory_bytes=PAGE_STORE_MEMORY_BYTES, max_disk_bytes=PAGE_STORE_DISK_BYTES, ttl=PAGE_STORE_TTL, spill_dir=PAGE_STORE_DIR):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.spill_root = spill_dir
+        self._spill_dir = None
+        self._memory = OrderedDict() # url -> FetchedPage
+        self._disk = OrderedDict() # url -> (FetchedPage without content, path, size)
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, url, page):
+        """Stores a FetchedPage under url, replacing any previous entry."""
+        with self._lock:
+            self._discard(url)
+            self._memory[url] = page
+            self._memory_bytes += len(page.content)
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                old_url, old_page = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old_page.content)
+                self._spill(old_url, old_page)
+
+    def get(self, url, max_age=None):
+        """
+        Returns the stored FetchedPage for url if it is younger than max_age
+        seconds (defaults to the store's ttl), otherwise None.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            page = self._memory.get(url)
+            path = None
+            if page is not None:
+                self._memory.move_to_end(url)
+            elif url in self._disk:
+                page, path, _ = self._disk[url]
+            if page is None:
+                return None
+            if time.time() - page.fetched_at > max_age:
+                self._discard(url)
+                return None
+            if path is None:
+                return page
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        return FetchedPage(page.url, page.final_url, page.status_code, page.content_type, content, page.fetched_at)
+
+    def __contains__(self, url):
+        """True if a fresh entry for url is stored (without reading a spilled body back)."""
+        with self._lock:
+            page = self._memory.get(url)
+            if page is None and url in self._disk:
+                page = self._disk[url][0]
+            return page is not None and time.time() - page.fetched_at <= self.ttl
+
+    def __len__(self):
+        return len(self._memory) + len(self._disk)
+
+    def clear(self):
+        """Drops every entry and removes the spill directory."""
+        with self._lock:
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_bytes = self._disk_bytes = 0
+            if self._spill_dir:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    def _spill(self, url, page):
+        if self.max_disk_bytes <= 0:
+            return
+        try:
+            if self._spill_dir is None:
+                os.makedirs(self.spill_root, exist_ok=True)
+                self._spill_dir = tempfile.mkdtemp(prefix="pages_", dir=self.spill_root)
+            path = os.path.join(self._spill_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+            with open(path, "wb") as f:
+                f.write(page.content)
+        except OSError as e:
+            logger.warning(f"Page store: could not spill {url} to disk: {e}")
+            return
+        size = len(page.content)
+        meta = FetchedPage(page.url, page.final_url, page.status_code, page.content_type, None, page.fetched_at)
+        self._disk[url] = (meta, path, size)
+        self._disk_bytes += size
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            self._discard(next(iter(self._disk)))
+
+    def _discard(self, url):
+        page = self._memory.pop(url, None)
+        if page is not None:
+            self._memory_bytes -= len(page.content)
+        entry = self._disk.pop(url, None)
+        if entry is not None:
+            _, path, size = entry
+            self._disk_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_default_page_store = None
+_default_page_store_lock = threading.Lock()
+
+
+def get_default_page_store():
+    """Returns the process-wide PageStore shared by discovery and scraping."""
+    global _default_page_store
+    with _default_page_store_lock:
+        if _default_page_store is None:
+            _default_page_store = PageStore()
+        return _default_page_store
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .utils import logger
+from .parsing import extract_hrefs, make_soup
+from .extraction import ExtractionRules
+
+# --- Parse Pool Configuration ---
+# Serverless runtimes (AWS Lambda, which Netlify functions run on) have no POSIX semaphores, so no process pools
+SERVERLESS = any(os.getenv(name) for name in ("AWS_LAMBDA_FUNCTION_NAME", "LAMBDA_TASK_ROOT", "NETLIFY"))
+PARSE_PROCESSES = int(os.getenv("SCRAPER_PARSE_PROCESSES", "1" if SERVERLESS else str(os.cpu_count() or 1))) # Parser processes; 0 or 1 parses on the fetching threads
+PARSE_POOL_MIN_BYTES = int(os.getenv("SCRAPER_PARSE_POOL_MIN_BYTES", "16384")) # Smaller bodies are parsed in-thread: shipping them costs more than parsing
+
+
+# --- Work done in the parser processes ---
+# Arguments and results are plain bytes, strings and lists: no soup or rules object crosses the process boundary.
+
+_rules_cache = {}
+
+
+def _rules(content_selectors, noise_selectors):
+    key = (tuple(content_selectors), tuple(noise_selectors))
+    rules = _rules_cache.get(key)
+    if rules is None:
+        rules = _rules_cache[key] = ExtractionRules(content_selectors, noise_selectors)
+    return rules
+
+
+def parse_links(content, content_type=""):
+    """Returns (hrefs, parse_seconds): the raw <a href> values of an HTML body, as extract_hrefs()."""
+    started = time.perf_counter()
+    hrefs = extract_hrefs(content, content_type)
+    return hrefs, time.perf_counter() - started
+
+
+def parse_text(content, content_selectors, noise_selectors):
+    """
+    Parses an HTML body and extracts its main text with the ExtractionRules built from the given selectors.
+    Returns (text, selector, parse_seconds, extract_seconds); text and selector are None if no selector matched.
+    """
+    started = time.perf_counter()
+    soup = make_soup(content)
+    parsed = time.perf_counter()
+    text, selector = _rules(content_selectors, noise_selectors).extract(soup)
+    return text, selector, parsed - started, time.perf_counter() - parsed
+
+
+def _in_web_request():
+    """True on a thread serving a Flask request, which shouldn't wait on (or start) parser processes."""
+    flask = sys.modules.get("flask") # Only loaded in the web app; never import it here
+    return flask is not None and flask.has_request_context()
+
+
+class ParsePool:
+    """
+    Runs HTML parsing and extraction in `processes` worker processes, so a parse-bound crawl uses every core
+    instead of the one the GIL leaves to its fetching threads. Fetching threads hand over the raw body and
+    block until the hrefs or extracted text come back.
+    Bodies under min_bytes, all bodies when processes is 0 or 1, and bodies parsed while serving a web request
+    are parsed on the calling thread.
+    The processes are spawned on first use. If one dies, the pool is replaced and the page parsed in-thread;
+    if the platform can't start them at all, the pool turns itself off and parses everything in-thread.
+    """
+
+    def __init__(self, processes=PARSE_PROCESSES, min_bytes=PARSE_POOL_MIN_BYTES):
+        self.processes = processes
+        self.min_bytes = min_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _disable(self, error):
+        with self._lock:
+            if self.processes <= 1:
+                return
+            self.processes = 1
+            executor, self._executor = self._executor, None
+        logger.warning(f"Parser processes are unavailable here ({error}); parsing pages on the fetching threads.")
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, size, function, *args):
+        if self.processes <= 1 or size < self.min_bytes or _in_web_request():
+            return function(*args)
+        try:
+            with self._lock:
+                if self._executor is None:
+                    # Forking a threaded web server process isn't safe
+                    self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+                executor = self._executor
+            future = executor.submit(function, *args)
+        except (OSError, NotImplementedError) as e: # No semaphores or process spawning on this platform
+            self._disable(e)
+            return function(*args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            logger.warning("A parser process died; restarting the parse pool and parsing this page in-thread.")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            return function(*args)
+
+    def links(self, content, content_type=""):
+        """Returns (hrefs, parse_seconds) for an HTML body; see parse_links."""
+        return self._run(len(content), parse_links, content, content_type)
+
+    def text(self, content, rules):
+        """Returns (text, selector, parse_seconds, extract_seconds) for an HTML body under rules (ExtractionRules)."""
+        return self._run(len(content), parse_text, content, rules.content_selectors, rules.noise_selectors)
+
+    def close(self):
+        """Stops the worker processes; the pool starts new ones if it's used again."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+_default_parse_pool = None
+_default_parse_pool_lock = threading.Lock()
+
+
+def get_default_parse_pool():
+    """Returns the process-wide ParsePool shared by every crawl."""
+    global _default_parse_pool
+    with _default_parse_pool_lock:
+        if _default_parse_pool is None:
+            _default_parse_pool = ParsePool()
+        return _default_parse_pool
@@ -0,0 +1,97 @@
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError: # lxml is optional; fall back to the stdlib parser
+    lxml_etree = None
+
+# Fastest BeautifulSoup tree builder available: lxml when installed, else the stdlib html.parser.
+HTML_PARSER = "lxml" if lxml_etree is not None else "html.parser"
+
+
+def make_soup(content, parser=None):
+    """Parses an HTML body (bytes or str) into a BeautifulSoup tree using the fastest available backend."""
+    return BeautifulSoup(content, parser or HTML_PARSER)
+
+
+def header_charset(content_type):
+    """Returns the charset parameter of a Content-Type header value, or None."""
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"' ")
+    return None
+
+
+def decode_html(content, content_type=""):
+    """
+    Decodes an HTML body for the stdlib tokenizer.
+    Uses the charset from the Content-Type header when present, else UTF-8 with a cp1252 fallback.
+    """
+    if isinstance(content, str):
+        return content
+    charset = header_charset(content_type)
+    if charset:
+        try:
+            return content.decode(charset, errors="replace")
+        except LookupError:
+            pass
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content.decode("cp1252", errors="replace")
+
+
+class _HrefCollector(HTMLParser):
+    """Stdlib tokenizer that records <a href> values without building a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value is not None:
+                    self.hrefs.append(value)
+                    break
+
+
+class _LxmlHrefTarget:
+    """lxml parser target: receives start-tag events from the C parser, no tree is built."""
+
+    def __init__(self):
+        self.hrefs = []
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                self.hrefs.append(href)
+
+    def close(self):
+        return self.hrefs
+
+
+def extract_hrefs(content, content_type="", backend=None):
+    """
+    Link-only fast path for discovery: returns the raw href values of every <a> tag in document order.
+    Streams the document through a tokenizer (lxml's target parser when installed, else the stdlib
+    HTMLParser) instead of building a parse tree.
+    """
+    backend = backend or HTML_PARSER
+    if backend == "lxml" and lxml_etree is not None and isinstance(content, bytes) and content:
+        target = _LxmlHrefTarget()
+        try:
+            parser = lxml_etree.HTMLParser(target=target, encoding=header_charset(content_type))
+            parser.feed(content)
+            return parser.close()
+        except (lxml_etree.Error, LookupError):
+            pass # Fall back to the stdlib tokenizer below
+
+    collector = _HrefCollector()
+    collector.feed(decode_html(content, content_type))
+    collector.close()
+    return collector.hrefs
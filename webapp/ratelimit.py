@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# --- Adaptive Rate Control Configuration ---
+ADAPTIVE_RATE_LIMIT = os.getenv("SCRAPER_ADAPTIVE_RATE", "1") != "0" # Tune each host's rate and concurrency from its responses
+ADAPTIVE_MAX_RATE = float(os.getenv("SCRAPER_MAX_HOST_RATE", "20")) # requests/second a host is never pushed beyond
+ADAPTIVE_MIN_RATE = 0.1 # requests/second a struggling host is never slowed below
+ADAPTIVE_RATE_STEP = 0.5 # Additive increase (requests/second) after each window of healthy responses
+ADAPTIVE_INITIAL_CONCURRENCY = 2 # Requests in flight per host before the controller has learned anything
+ADAPTIVE_MAX_CONCURRENCY = 8
+THROTTLE_STATUS_CODES = (429, 503)
+THROTTLE_BACKOFF = 0.5 # Multiplicative decrease on 429 / 503 (including ones retried away by the session)
+ERROR_BACKOFF = 0.75 # ...on timeouts, connection errors and other 5xx
+LATENCY_BACKOFF = 0.85 # ...when time to first byte climbs well above the host's baseline
+LATENCY_RISE_FACTOR = 2.0 # "Well above": this many times the baseline TTFB...
+LATENCY_MIN_SIGNAL = 0.05 # ...and at least this many seconds, so jitter on very fast hosts is ignored
+TTFB_SMOOTHING = 0.2 # Weight of the newest sample in the rolling (exponentially weighted) TTFB
+DECREASE_INTERVAL = 1.0 # seconds; a burst of failures from requests already in flight only backs off once
+INCREASE_COOLDOWN = 5.0 # seconds after a decrease before the rate may grow again
+ADAPTIVE_MIN_TIMEOUT = 5.0 # seconds; lower bound of the per-host request timeout
+TIMEOUT_TTFB_MULTIPLE = 20 # Per-host timeout = this many rolling TTFBs (capped by the caller's timeout)
+TIMEOUT_MIN_SAMPLES = 10 # Responses needed before a host's timeout is tightened
+
+
+class HostRateLimiter:
+    """
+    Per-host token buckets used to keep concurrent fetches polite.
+    Each host refills at `rate` requests per second up to `burst` tokens, so
+    requests to different hosts never wait on each other.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._host_rates = {}
+        self._buckets = {}  # host -> [tokens, last_refill_time]
+        self._lock = threading.Lock()
+
+    @property
+    def max_rate(self) -> float:
+        """Highest rate any host may reach; a Crawl-delay only matters if it asks for less."""
+        return self.rate
+
+    def set_rate(self, host: str, rate: float) -> None:
+        """Overrides the refill rate for a single host (e.g. from a Crawl-delay)."""
+        with self._lock:
+            self._host_rates[host] = rate
+
+    def acquire(self, url_or_host: str) -> float:
+        """
+        Blocks until a request to the given URL's host is allowed.
+        A token is reserved under the lock and the caller sleeps outside it, so
+        waiting on one host never blocks callers for another host.
+        Returns the number of seconds waited.
+        """
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            rate = self._host_rates.get(host, self.rate)
+            now = time.monotonic()
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = [float(self.burst), now]
+            tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * rate)
+            tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+            wait = -tokens / rate if tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(self, url_or_host: str, status, ttfb: float = None, throttled: bool = False) -> None:
+        """
+        Reports how a request allowed by acquire() ended: status is the HTTP status code or 'error',
+        ttfb the time to the response headers in seconds, throttled whether a 429/503 was retried away.
+        The fixed-rate limiter ignores it.
+        """
+
+    def timeout_for(self, url_or_host: str, default: float) -> float:
+        """Request timeout to use for the host (the fixed-rate limiter always uses default)."""
+        return default
+
+    def limits(self) -> dict:
+        """Current per-host limits, for progress reports: {host: {'rate': requests/second, ...}}."""
+        with self._lock:
+            return {host: {'rate': round(self._host_rates.get(host, self.rate), 3)} for host in self._buckets}
+
+
+class _HostControl:
+    __slots__ = ("rate", "max_rate", "concurrency", "in_flight", "tokens", "refilled_at", "ttfb", "baseline",
+                 "samples", "successes", "last_decrease", "throttled", "errors")
+
+    def __init__(self, rate, max_rate, concurrency, burst, now):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.refilled_at = now
+        self.ttfb = None # Rolling TTFB in seconds
+        self.baseline = None # Lowest rolling TTFB seen, drifting slowly upwards
+        self.samples = 0
+        self.successes = 0 # Healthy responses since the last increase
+        self.last_decrease = float("-inf")
+        self.throttled = 0
+        self.errors = 0
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    HostRateLimiter that tunes each host's request rate and concurrency from how it responds (AIMD).
+    - Every window of healthy responses (one per allowed concurrent request) adds ADAPTIVE_RATE_STEP requests/second
+      and one concurrent request, up to max_rate and max_concurrency.
+    - 429/503 responses halve the rate and concurrency; timeouts, connection errors and other 5xx cut them by a
+      quarter; a rolling TTFB that climbs to LATENCY_RISE_FACTOR times the host's baseline trims them gently.
+      Decreases happen at most once per DECREASE_INTERVAL, and increases pause for INCREASE_COOLDOWN after one.
+    - Hosts that answer quickly get a tighter request timeout (see timeout_for).
+    Every acquire() must be paired with a record() once the request finishes, which frees its concurrency slot.
+    rate is the starting rate for hosts seen for the first time; set_rate() caps a host (e.g. for a Crawl-delay).
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_rate: float = ADAPTIVE_MAX_RATE, min_rate: float = ADAPTIVE_MIN_RATE,
+                 initial_concurrency: int = ADAPTIVE_INITIAL_CONCURRENCY, max_concurrency: int = ADAPTIVE_MAX_CONCURRENCY):
+        super().__init__(rate, burst)
+        self._max_rate = max(max_rate, rate)
+        self.min_rate = min(min_rate, rate)
+        self.initial_concurrency = min(initial_concurrency, max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._controls = {}
+        self._cond = threading.Condition(self._lock)
+
+    @property
+    def max_rate(self) -> float:
+        return self._max_rate
+
+    def _control(self, host):
+        control = self._controls.get(host)
+        if control is None:
+            ceiling = self._host_rates.get(host, self._max_rate)
+            control = self._controls[host] = _HostControl(min(self.rate, ceiling), ceiling, self.initial_concurrency,
+                                                          self.burst, time.monotonic())
+        return control
+
+    def set_rate(self, host: str, rate: float) -> None:
+        """Caps host at rate requests/second; the controller never goes above it."""
+        with self._cond:
+            self._host_rates[host] = rate
+            control = self._control(host)
+            control.max_rate = rate
+            control.rate = min(control.rate, rate)
+
+    def acquire(self, url_or_host: str) -> float:
+        """Blocks until the host has a free concurrency slot and a token. Returns the seconds waited."""
+        host = urlparse(url_or_host).netloc or url_or_host
+        started = time.monotonic()
+        with self._cond:
+            control = self._control(host)
+            while control.in_flight >= control.concurrency:
+                self._cond.wait()
+            control.in_flight += 1
+            now = time.monotonic()
+            tokens = min(float(self.burst), control.tokens + (now - control.refilled_at) * control.rate) - 1
+            control.tokens, control.refilled_at = tokens, now
+            wait = -tokens / control.rate if tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return time.monotonic() - started
+
+    def record(self, url_or_host: str, status, ttfb: float = None, throttled: bool = False) -> None:
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._cond:
+            control = self._control(host)
+            control.in_flight = max(0, control.in_flight - 1)
+            now = time.monotonic()
+            if throttled or status in THROTTLE_STATUS_CODES:
+                control.throttled += 1
+                self._decrease(control, THROTTLE_BACKOFF, now)
+            elif status == 'error' or (isinstance(status, int) and status >= 500):
+                control.errors += 1
+                self._decrease(control, ERROR_BACKOFF, now)
+            else:
+                if ttfb is not None:
+                    control.samples += 1
+                    control.ttfb = ttfb if control.ttfb is None else control.ttfb + TTFB_SMOOTHING * (ttfb - control.ttfb)
+                    control.baseline = control.ttfb if control.baseline is None else \
+                        min(control.ttfb, control.baseline + 0.01 * (control.ttfb - control.baseline))
+                if (control.ttfb is not None and control.ttfb > LATENCY_MIN_SIGNAL
+                        and control.ttfb > LATENCY_RISE_FACTOR * control.baseline):
+                    self._decrease(control, LATENCY_BACKOFF, now)
+                elif now - control.last_decrease >= INCREASE_COOLDOWN:
+                    control.successes += 1
+                    if control.successes >= control.concurrency:
+                        control.successes = 0
+                        control.rate = min(control.max_rate, control.rate + ADAPTIVE_RATE_STEP)
+                        control.concurrency = min(self.max_concurrency, control.concurrency + 1)
+            self._cond.notify_all()
+
+    def _decrease(self, control, factor, now):
+        control.successes = 0
+        if now - control.last_decrease < DECREASE_INTERVAL:
+            return
+        control.last_decrease = now
+        control.rate = max(self.min_rate, control.rate * factor)
+        control.concurrency = max(1, int(control.concurrency * factor))
+
+    def timeout_for(self, url_or_host: str, default: float) -> float:
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._cond:
+            control = self._controls.get(host)
+            if control is None or control.ttfb is None or control.samples < TIMEOUT_MIN_SAMPLES:
+                return default
+            return min(default, max(ADAPTIVE_MIN_TIMEOUT, control.ttfb * TIMEOUT_TTFB_MULTIPLE))
+
+    def limits(self) -> dict:
+        with self._cond:
+            return {host: {'rate': round(control.rate, 3), 'concurrency': control.concurrency,
+                           'in_flight': control.in_flight,
+                           'ttfb_ms': round(control.ttfb * 1000, 1) if control.ttfb is not None else None,
+                           'throttled': control.throttled, 'errors': control.errors}
+                    for host, control in self._controls.items()}
+
+
+def create_rate_limiter(rate: float) -> HostRateLimiter:
+    """The crawler's default limiter: adaptive (starting at rate) unless SCRAPER_ADAPTIVE_RATE=0, else fixed at rate."""
+    return AdaptiveRateLimiter(rate) if ADAPTIVE_RATE_LIMIT else HostRateLimiter(rate)
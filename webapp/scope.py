@@ -0,0 +1,104 @@
+import fnmatch
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+from .utils import logger
+
+# File types discovery never fetches or lists: the crawler only parses HTML, so these would be wasted requests.
+DEFAULT_BLOCKED_EXTENSIONS = [
+    '7z', 'avi', 'bin', 'bmp', 'css', 'csv', 'dmg', 'doc', 'docx', 'eot', 'exe', 'flac', 'gif', 'gz', 'ico', 'iso',
+    'jar', 'jpeg', 'jpg', 'js', 'json', 'm4a', 'mkv', 'mov', 'mp3', 'mp4', 'mpeg', 'msi', 'ogg', 'otf', 'pdf', 'png',
+    'ppt', 'pptx', 'rar', 'rss', 'svg', 'tar', 'tgz', 'tif', 'tiff', 'ttf', 'wav', 'webm', 'webp', 'woff', 'woff2',
+    'xls', 'xlsx', 'xml', 'zip',
+]
+
+# Optional JSON file with default CrawlScope options, e.g. {"exclude": ["*/tag/*", "re:[?&]page=\\d+"], "allow_subdomains": true}
+SCOPE_RULES_FILE = os.getenv("SCRAPER_SCOPE_RULES")
+DEFAULT_SCOPE_RULES = {}
+
+
+def compile_patterns(patterns):
+    """
+    Compiles URL patterns into one regex that matches a URL if any pattern does.
+    Patterns starting with "re:" are regular expressions searched anywhere in the URL;
+    the others are shell globs matched against the whole URL ("*" also matches "/").
+    Returns None for no patterns.
+    """
+    parts = []
+    for pattern in patterns or []:
+        if pattern.startswith('re:'):
+            parts.append(f"(?:{pattern[3:]})")
+        else:
+            parts.append(f"(?:^{fnmatch.translate(pattern)})")
+    return re.compile('|'.join(parts)) if parts else None
+
+
+class CrawlScope:
+    """
+    Decides which canonical URLs discovery follows, with every rule compiled up front.
+    A URL is in scope when all of these hold:
+    - It lies under base_url: same scheme and host (or a subdomain of it, if allow_subdomains), and its path
+      starts with base_url's path (any path on the host if path_prefix is False).
+    - Its path doesn't end in a blocked_extensions file extension.
+    - It matches no exclude pattern and, if include patterns are given, at least one of them.
+    Patterns are shell globs over the whole URL or "re:"-prefixed regexes (see compile_patterns).
+    """
+
+    def __init__(self, base_url, include=None, exclude=None, allow_subdomains=False, path_prefix=True, blocked_extensions=None):
+        parts = urlsplit(base_url)
+        host = (parts.hostname or '').lower()
+        host_pattern = re.escape(host)
+        if allow_subdomains:
+            # www.example.com admits docs.example.com too: subdomains of the site, not just of "www"
+            domain = host[4:] if host.startswith('www.') else host
+            host_pattern = r'(?:[^/?#@:]+\.)?' + re.escape(domain)
+        port = f":{parts.port}" if parts.port else ''
+        path = (parts.path or '/') if path_prefix else '/'
+        self.base_url = base_url
+        self._prefix = re.compile(f"{re.escape(parts.scheme.lower())}://{host_pattern}{re.escape(port)}{re.escape(path)}")
+        extensions = DEFAULT_BLOCKED_EXTENSIONS if blocked_extensions is None else blocked_extensions
+        self._blocked = re.compile(r'\.(?:' + '|'.join(re.escape(ext.lower().lstrip('.')) for ext in extensions) + r')$',
+                                   re.IGNORECASE) if extensions else None
+        self._include = compile_patterns(include)
+        self._exclude = compile_patterns(exclude)
+
+    def allows(self, url):
+        """True if url (canonical, without a fragment) is in scope."""
+        if not self._prefix.match(url):
+            return False
+        if self._blocked is not None and self._blocked.search(url.split('?', 1)[0]):
+            return False
+        if self._exclude is not None and self._exclude.search(url):
+            return False
+        return self._include is None or self._include.search(url) is not None
+
+    __contains__ = allows
+
+    def filter(self, urls):
+        """Returns the in-scope URLs of urls, in order. Meant for a whole page's links at once."""
+        prefix, blocked, include, exclude = self._prefix.match, self._blocked, self._include, self._exclude
+        kept = [url for url in urls if prefix(url)]
+        if blocked is not None:
+            kept = [url for url in kept if not blocked.search(url.split('?', 1)[0])]
+        if exclude is not None:
+            kept = [url for url in kept if not exclude.search(url)]
+        if include is not None:
+            kept = [url for url in kept if include.search(url)]
+        return kept
+
+
+def scope_for(base_url, rules=None):
+    """CrawlScope for base_url from DEFAULT_SCOPE_RULES, overridden by rules (a dict of CrawlScope options)."""
+    return CrawlScope(base_url, **dict(DEFAULT_SCOPE_RULES, **(rules or {})))
+
+
+if SCOPE_RULES_FILE:
+    try:
+        with open(SCOPE_RULES_FILE, 'r', encoding='utf-8') as f:
+            DEFAULT_SCOPE_RULES = json.load(f)
+        CrawlScope('http://localhost/', **DEFAULT_SCOPE_RULES) # Fail here, not on the first crawl
+    except (OSError, ValueError, TypeError, re.error) as e:
+        logger.error(f"Could not load crawl scope rules from {SCOPE_RULES_FILE}: {e}")
+        DEFAULT_SCOPE_RULES = {}
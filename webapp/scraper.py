@@ -1,196 +1,467 @@
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
 # Import logger and utility functions from utils.py
-from .utils import logger, sanitize_filename, create_session_output_directory, ROOT_OUTPUT_DIR
+from .utils import logger, create_session_output_directory
+from .frontier import CrawlFrontier, UrlHashSet
+from .ratelimit import create_rate_limiter
+from .fetcher import fetch_page, ResponseRejected
+from .pagestore import get_default_page_store
+from .httpcache import get_default_http_cache
+from .parsepool import get_default_parse_pool
+from .extraction import rules_for_url
+from .events import submit_with_context
+from .manifest import content_hash, load_manifest, save_manifest, write_change_report
+from .canonical import canonicalize_url
+from .scope import scope_for
+from .fingerprint import simhash, NearDuplicateIndex, NEAR_DUPLICATE_DISTANCE
+from .sitemap import RobotsCache, iter_sitemap, sitemap_urls_for, get_default_lastmods, RESPECT_ROBOTS
+from .sinks import create_sink, TextFileSink, SinkUnavailable, OUTPUT_FORMAT, OUTPUT_FORMATS
+from .checkpoint import CrawlCheckpoint, CHECKPOINT_ENABLED, CHECKPOINT_FILENAME, discovery_checkpoint_path
+from .metrics import CrawlProfile, profiling, timed_stage, observe_stage, count_page, PROFILE_ENABLED
 
 # --- Configuration Constants (moved from main.py) ---
-REQUEST_TIMEOUT = 15  # seconds
-POLITENESS_DELAY = 0.5 # seconds (discovery uses POLITENESS_DELAY / 2)
+REQUEST_TIMEOUT = 15  # seconds; the adaptive rate limiter tightens it for hosts that answer quickly
+POLITENESS_DELAY = 0.5 # Starting seconds between requests to the same host (discovery uses POLITENESS_DELAY / 2), adapted per host unless SCRAPER_ADAPTIVE_RATE=0
 MAX_DISCOVERY_DEPTH = 5 # Max depth for link discovery
-# ROOT_OUTPUT_DIR is now imported from utils
+MAX_DISCOVERY_PAGES = None # Max pages fetched during discovery (None = unlimited)
+MAX_WORKERS = 4 # Concurrent fetches during discovery and scraping
+# "crawl" follows links; "sitemap" lists URLs from the site's sitemaps (crawling only if there are none);
+# "seed" queues the sitemap URLs and then follows links from them as well.
+DISCOVERY_MODE = os.getenv("SCRAPER_DISCOVERY_MODE", "crawl")
+DISCOVERY_MODES = ("crawl", "sitemap", "seed")
 
 # --- Core Scraping Logic (adapted from main.py) ---
 
-def discover_links_recursive(current_url, base_url_to_match, discovered_links_set, visited_discovery_urls, current_depth, discovery_stats):
+def discover_links_from_page(current_url, base_url_to_match, session=None, page_store=None, http_cache=None, canonicalizer=None, robots=None, scope=None, rate_limiter=None,
+                             parse_pool=None):
     """
-    Recursively discovers links starting from current_url, staying within base_url_to_match.
-    Modifies discovered_links_set and visited_discovery_urls in place.
-    discovery_stats is a dict {'checked_count': 0, 'found_count': 0} to track progress.
+    Fetches a single page and returns the in-scope links found on it.
+    Links are made absolute, canonicalized (see canonical.py; canonicalizer defaults to the shared rules)
+    and de-duplicated in page order. scope (a CrawlScope, see scope.py) decides which links are in scope;
+    it defaults to everything under base_url_to_match. If robots (a RobotsCache) is given, links it disallows are dropped.
+    session is the pooled requests.Session to fetch with (defaults to the shared one).
+    If page_store is given, the fetched body is kept there for the scrape phase to reuse.
+    If http_cache is given, the fetch is revalidated against it (ETag / Last-Modified).
+    If rate_limiter (a HostRateLimiter) is given, the fetch waits for it and reports back how the host responded.
+    The body is parsed by parse_pool (a ParsePool, defaulting to the shared one; see parsepool.py).
+    Returns None if the page could not be fetched or parsed.
     """
-    if current_url in visited_discovery_urls or current_depth > MAX_DISCOVERY_DEPTH:
-        if current_depth > MAX_DISCOVERY_DEPTH:
-            logger.debug(f"Max discovery depth ({MAX_DISCOVERY_DEPTH}) reached for path from {current_url}")
-        return
+    return _discover_page(current_url, base_url_to_match, session, page_store, http_cache, canonicalizer, robots, scope=scope,
+                          rate_limiter=rate_limiter, parse_pool=parse_pool)[0]
 
-    discovery_stats['checked_count'] += 1
-    logger.info(f"Discovery L{current_depth} (Checked: {discovery_stats['checked_count']}): Visiting {current_url}")
-    visited_discovery_urls.add(current_url)
 
+def _discover_page(current_url, base_url_to_match, session=None, page_store=None, http_cache=None, canonicalizer=None, robots=None, budget=None, scope=None,
+                   rate_limiter=None, parse_pool=None, rescope=None):
+    """
+    discover_links_from_page, also returning the body size and where the page ended up after redirects:
+    (links or None, bytes_downloaded, canonical final URL or None). budget and rate_limiter are passed on to fetch_page.
+    If the page was redirected and rescope is given, rescope(canonical final URL) may return the CrawlScope
+    to filter its links with instead of scope (e.g. for a start page that moved from http to https).
+    """
+    canonicalize = canonicalizer.canonicalize if canonicalizer is not None else canonicalize_url
+    if parse_pool is None:
+        parse_pool = get_default_parse_pool()
+    if scope is None:
+        scope = scope_for(base_url_to_match)
     try:
-        response = requests.get(current_url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-        response.raise_for_status()
-
-        # Add to discovered_links_set if it's within the base URL scope, even if it's the starting page
-        if current_url.startswith(base_url_to_match):
-             if current_url not in discovered_links_set:
-                discovered_links_set.add(current_url)
-                discovery_stats['found_count'] += 1
-                if discovery_stats['found_count'] > 0 and discovery_stats['found_count'] % 20 == 0:
-                    logger.info(f"  Discovery: Found {discovery_stats['found_count']} unique internal links so far...")
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            next_url_absolute = urljoin(current_url, href)
-
-            parsed_next_url = urlparse(next_url_absolute)
-            normalized_next_url = parsed_next_url._replace(fragment="").geturl() # Remove fragments
-
-            if normalized_next_url.startswith(base_url_to_match) and \
-               normalized_next_url not in visited_discovery_urls:
-                # Check discovered_links_set again; it might have been added by a parallel path
-                if normalized_next_url not in discovered_links_set:
-                    discovered_links_set.add(normalized_next_url)
-                    discovery_stats['found_count'] += 1
-                    logger.debug(f"  Discovery L{current_depth}: Added new link to explore: {normalized_next_url}")
-                    if discovery_stats['found_count'] > 0 and discovery_stats['found_count'] % 20 == 0:
-                        logger.info(f"  Discovery: Found {discovery_stats['found_count']} unique internal links so far...")
-
-                # Small delay before recursive call
-                time.sleep(POLITENESS_DELAY / 2)
-                discover_links_recursive(normalized_next_url, base_url_to_match, discovered_links_set, visited_discovery_urls, current_depth + 1, discovery_stats)
-
-            elif normalized_next_url in visited_discovery_urls:
-                 logger.debug(f"  Discovery: Skipping already visited link: {normalized_next_url}")
-            elif not normalized_next_url.startswith(base_url_to_match):
-                 logger.debug(f"  Discovery: Skipping external link: {normalized_next_url}")
-
+        page = fetch_page(current_url, session=session, timeout=REQUEST_TIMEOUT, cache=http_cache, budget=budget,
+                          rate_limiter=rate_limiter)
+        if page_store is not None:
+            page_store.put(current_url, page)
+
+        # Discovery only needs <a href> values, so skip building a parse tree.
+        # Relative links resolve against the final URL, e.g. /docs redirected to /docs/
+        page_url = page.final_url or current_url
+        hrefs, parse_seconds = parse_pool.links(page.content, page.content_type)
+        observe_stage('parse', parse_seconds, urlparse(current_url).netloc)
+        # Canonicalize and de-duplicate the whole page's links, then scope-filter them in one pass.
+        candidates = list(dict.fromkeys(canonicalize(urljoin(page_url, href), page_url) for href in hrefs))
+        if rescope is not None and canonicalize(page_url) != canonicalize(current_url):
+            scope = rescope(canonicalize(page_url)) or scope
+        page_links = scope.filter(candidates)
+        if len(page_links) < len(candidates):
+            logger.debug(f"  Discovery: {len(candidates) - len(page_links)} of {len(candidates)} link(s) on {current_url} are out of scope.")
+        if robots is not None:
+            allowed = [url for url in page_links if robots.can_fetch(url)]
+            if len(allowed) < len(page_links):
+                logger.debug(f"  Discovery: {len(page_links) - len(allowed)} link(s) on {current_url} are disallowed by robots.txt.")
+            page_links = allowed
+        return page_links, (0 if page.from_cache else len(page.content)), canonicalize(page_url)
+
+    except ResponseRejected as e:
+        logger.info(f"Discovery: {e}")
     except requests.exceptions.RequestException as e:
         logger.warning(f"Discovery: Request failed for {current_url}: {e}")
     except Exception as e:
         logger.error(f"Discovery: An unexpected error occurred while processing {current_url}: {e}", exc_info=True)
+    return None, 0, None
 
 
-def crawl_and_extract_single_page(page_url, output_dir):
+def extract_page_text(page_url, session=None, page_store=None, http_cache=None, budget=None, rate_limiter=None, parse_pool=None):
     """
-    Crawls a single page, extracts its text content, and saves it to a file.
-    Returns True if successful, False otherwise.
-    output_dir is the session-specific directory where the file should be saved.
+    Fetches a single page and extracts its main text content.
+    session is the pooled requests.Session to fetch with (defaults to the shared one).
+    If page_store holds a fresh body for page_url (e.g. from discovery), it is reused instead of refetching.
+    Otherwise the page is fetched, revalidating against http_cache (ETag / Last-Modified) when given,
+    within a slot of budget (a FairRequestBudget) if one is given, and after waiting for rate_limiter
+    (a HostRateLimiter, which is told how the host responded) if one is given. Reused bodies wait for neither.
+    The body is parsed and its text extracted by parse_pool (a ParsePool, defaulting to the shared one).
+    Returns the extracted text, or None if the page could not be fetched or parsed.
     """
     try:
-        logger.info(f"Scraping content from: {page_url}")
-
-        response = requests.get(page_url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        logger.debug(f"Successfully retrieved URL: {page_url} (Status: {response.status_code})")
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-        content_element = None
-        # Common selectors for main content areas
-        possible_selectors = [
-            'article.main-content', 'div.markdown-body', 'article', 'main',
-            'div.content', 'div#content', 'section.content',
-            'div[role="main"]', 'div.main', 'div.post-content', 'body'
-        ]
-        for selector in possible_selectors:
-            content_element = soup.select_one(selector)
-            if content_element:
-                logger.debug(f"Content found for {page_url} using selector: '{selector}'")
-                break
-
-        text_content = ""
-        if content_element:
-            # Remove common noisy elements like nav, footer, scripts, styles, etc.
-            for noisy_tag_selector in ['nav', 'footer', 'script', 'style', '.noprint', '.no-export', 'header', 'aside', 'form', '.sidebar', '#sidebar']:
-                for tag in content_element.select(noisy_tag_selector):
-                    tag.decompose()
-            text_content = content_element.get_text(separator='\n', strip=True)
-        else:
-            text_content = "Content not found (no specific selectors matched or body tag missing)."
-            logger.warning(f"No primary content element found for URL: {page_url}. Extracted text might be from the whole body or incomplete.")
-
-        # Determine filename
-        url_path_part = urlparse(page_url).path
-        # If path is empty or just '/', use 'index' or a sanitized version of the domain
-        if not url_path_part or url_path_part == '/':
-            filename_base = sanitize_filename(urlparse(page_url).netloc) + "_index"
+        page = page_store.get(page_url) if page_store is not None else None
+        if page is not None:
+            logger.info(f"Scraping content from: {page_url} (reusing body fetched during discovery)")
         else:
-            filename_base = url_path_part.strip('/')
-
-        sanitized_name = sanitize_filename(filename_base)
-
-        # Ensure filename isn't empty after sanitization
-        if not sanitized_name:
-            sanitized_name = "unnamed_page"
-
-        filename = os.path.join(output_dir, f"{sanitized_name}.txt")
-
-        # Ensure the directory for the file exists (e.g., if sanitized_name created subpaths, though sanitize_filename aims to prevent this)
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-
-        with open(filename, "w", encoding="utf-8") as file:
-            file.write(f"URL: {page_url}\n")
-            file.write(f"Scraped_At: {datetime.now().isoformat()}\n\n")
-            file.write(text_content)
-        logger.info(f"Saved content from {page_url} to {filename}")
-        return True
+            logger.info(f"Scraping content from: {page_url}")
+            page = fetch_page(page_url, session=session, timeout=REQUEST_TIMEOUT, cache=http_cache, budget=budget,
+                              rate_limiter=rate_limiter)
+            logger.debug(f"Successfully retrieved URL: {page_url} (Status: {page.status_code}{', from HTTP cache' if page.from_cache else ''})")
+
+        host = urlparse(page_url).netloc
+        text_content, selector, parse_seconds, extract_seconds = (parse_pool or get_default_parse_pool()).text(
+            page.content, rules_for_url(page_url))
+        observe_stage('parse', parse_seconds, host)
+        observe_stage('extract', extract_seconds, host)
+        if text_content is not None:
+            logger.debug(f"Content found for {page_url} using selector: '{selector}'")
+            return text_content
+
+        logger.warning(f"No primary content element found for URL: {page_url}. Extracted text might be from the whole body or incomplete.")
+        return "Content not found (no specific selectors matched or body tag missing)."
 
     except requests.exceptions.HTTPError as e:
         logger.error(f"HTTP error for {page_url}: {e.response.status_code} {e.response.reason}. Message: {e}")
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed for {page_url}: {e}", exc_info=False) # Set exc_info=False for less verbose request errors
-    except IOError as e:
-        logger.error(f"IOError writing file for {page_url}: {e}", exc_info=True)
     except Exception as e:
         logger.error(f"An unexpected error occurred while processing {page_url}: {e}", exc_info=True)
-    return False
+    return None
 
 
-# --- Functions to be called by the Flask app ---
+def save_page_text(page_url, text_content, output_dir):
+    """
+    Saves extracted text to page_url's file in output_dir, laid out as the "txt" output format (see TextFileSink).
+    Returns the filename. Raises OSError if the file cannot be written.
+    """
+    entry, _ = TextFileSink(output_dir).write(page_url, text_content, content_hash(text_content))
+    return os.path.join(output_dir, entry['file'])
 
-def start_link_discovery(base_url):
+
+def crawl_and_extract_single_page(page_url, output_dir, session=None, page_store=None, http_cache=None, rate_limiter=None, parse_pool=None):
     """
-    Initiates link discovery for a given base_url.
-    Returns a sorted list of unique discovered URLs.
+    Crawls a single page, extracts its text content, and saves it to a file.
+    Returns True if successful, False otherwise.
+    output_dir is the session-specific directory where the file should be saved.
+    session, page_store, http_cache, rate_limiter and parse_pool are passed on to extract_page_text.
     """
-    logger.info(f"Starting link discovery for base URL: {base_url}. Max depth: {MAX_DISCOVERY_DEPTH}.")
+    text_content = extract_page_text(page_url, session=session, page_store=page_store, http_cache=http_cache, rate_limiter=rate_limiter,
+                                     parse_pool=parse_pool)
+    if text_content is None:
+        return False
+    try:
+        save_page_text(page_url, text_content, output_dir)
+        return True
+    except IOError as e:
+        logger.error(f"IOError writing file for {page_url}: {e}", exc_info=True)
+    return False
 
-    discovered_links_set = set()
-    visited_discovery_urls = set() # URLs visited during this discovery session
-    discovery_stats = {'checked_count': 0, 'found_count': 0}
 
-    # Ensure base_url itself is added if it's valid and discoverable
-    # The discover_links_recursive function will handle adding it.
+def _open_checkpoint(path, resume):
+    """
+    Opens the crawl checkpoint at path, keeping its state if resume is set and starting fresh otherwise.
+    Returns None if path is None or the checkpoint can't be opened (the crawl then just isn't resumable).
+    """
+    if path is None:
+        return None
+    try:
+        return CrawlCheckpoint(path) if resume else CrawlCheckpoint.fresh(path)
+    except Exception as e:
+        logger.warning(f"Could not open crawl checkpoint {path}; continuing without one: {e}")
+        return None
 
-    discover_links_recursive(base_url, base_url, discovered_links_set, visited_discovery_urls, 0, discovery_stats)
 
-    logger.info(f"Discovery phase for {base_url} complete. Checked {discovery_stats['checked_count']} URLs, found {len(discovered_links_set)} unique internal links.")
+# --- Functions to be called by the Flask app ---
 
-    if not discovered_links_set:
+def start_link_discovery(base_url, max_depth=MAX_DISCOVERY_DEPTH, max_pages=MAX_DISCOVERY_PAGES, workers=MAX_WORKERS, rate_limiter=None, session=None, page_store=None, http_cache=None, progress_callback=None, resume=False, checkpoint_path=None, canonicalizer=None, discovery_mode=DISCOVERY_MODE, respect_robots=RESPECT_ROBOTS, budget=None, scope_rules=None, parse_pool=None):
+    """
+    Initiates link discovery for a given base_url.
+    Pages are visited breadth-first from an explicit frontier by a pool of `workers` threads.
+    Politeness is enforced per host by rate_limiter (a HostRateLimiter; if not given, an adaptive one that speeds up
+    or backs off per host as it responds, see ratelimit.py).
+    All fetches go through session, a pooled requests.Session (defaults to the shared one).
+    Fetched bodies are kept in page_store (defaults to the shared PageStore) so scraping can reuse them.
+    Fetches are revalidated against http_cache (defaults to the shared on-disk HttpCache, if enabled).
+    Discovery stops when the frontier is exhausted, max_depth is exceeded or max_pages pages have been fetched.
+    If given, progress_callback is called after every visited page with a dict of the running stats
+    (checked_count, found_count, bytes_downloaded, frontier_size, pages_per_sec, and host_limits: rate_limiter's
+    current per-host limits) and the new_links found on that page.
+    The frontier, visited URLs and discovered links are checkpointed to checkpoint_path (a CrawlCheckpoint;
+    defaults to one per base URL under CHECKPOINT_DIR, so pass distinct paths to runs that may overlap). With
+    resume=True an interrupted run continues from its checkpoint instead of starting over. The checkpoint is
+    deleted once discovery completes.
+    URLs are canonicalized with canonicalizer (a UrlCanonicalizer; defaults to the shared rules), so the same page
+    reached via tracking parameters, reordered queries, index.html or a redirect is only fetched once.
+    discovery_mode is "crawl" (follow links), "sitemap" (list the URLs in the site's sitemaps, crawling only if
+    there are none) or "seed" (queue the sitemap URLs, then follow links too). Sitemap lastmod values are kept
+    for incremental scrapes. With respect_robots, robots.txt Disallow rules and Crawl-delay are honored.
+    If budget (a FairRequestBudget, see orchestrator.py) is given, every page fetch holds one of its slots,
+    capping the requests in flight across all crawls sharing it.
+    scope_rules (a dict of CrawlScope options: include / exclude patterns, allow_subdomains, path_prefix,
+    blocked_extensions; defaults to the SCRAPER_SCOPE_RULES file) narrow or widen which links under base_url are followed.
+    Pages are parsed by parse_pool (a ParsePool; defaults to the shared one, which spreads large pages over
+    SCRAPER_PARSE_PROCESSES worker processes).
+    Returns a sorted list of unique discovered URLs; use iter_link_discovery to stream them instead.
+    """
+    links = sorted(iter_link_discovery(base_url, max_depth=max_depth, max_pages=max_pages, workers=workers,
+                                       rate_limiter=rate_limiter, session=session, page_store=page_store,
+                                       http_cache=http_cache, progress_callback=progress_callback,
+                                       resume=resume, checkpoint_path=checkpoint_path, canonicalizer=canonicalizer,
+                                       discovery_mode=discovery_mode, respect_robots=respect_robots, budget=budget,
+                                       scope_rules=scope_rules, parse_pool=parse_pool))
+    if not links:
         logger.warning(f"No links found for {base_url} (or initial page failed to load).")
-        return []
-
-    return sorted(list(discovered_links_set))
+    return links
 
 
-def scrape_selected_pages(base_url_for_naming, urls_to_scrape, existing_session_dir=None):
+def iter_link_discovery(base_url, max_depth=MAX_DISCOVERY_DEPTH, max_pages=MAX_DISCOVERY_PAGES, workers=MAX_WORKERS, rate_limiter=None, session=None, page_store=None, http_cache=None, progress_callback=None, resume=False, checkpoint_path=None, canonicalizer=None, discovery_mode=DISCOVERY_MODE, respect_robots=RESPECT_ROBOTS, budget=None, scope_rules=None, parse_pool=None):
+    """
+    Generator form of start_link_discovery (same arguments): yields each unique discovered URL as soon as it
+    is found, in discovery order. Seen and discovered URLs are kept as 64-bit hashes and the frontier spills
+    to disk, so memory stays small on sites with millions of URLs as long as the caller streams the results.
+    """
+    if discovery_mode not in DISCOVERY_MODES:
+        raise ValueError(f"Unknown discovery mode {discovery_mode!r}; expected one of {', '.join(DISCOVERY_MODES)}")
+    logger.info(f"Starting link discovery for base URL: {base_url}. Mode: {discovery_mode}. Max depth: {max_depth}. Max pages: {max_pages or 'unlimited'}. Workers: {workers}.")
+
+    if rate_limiter is None:
+        rate_limiter = create_rate_limiter(rate=2 / POLITENESS_DELAY)
+    if page_store is None:
+        page_store = get_default_page_store()
+    if http_cache is None:
+        http_cache = get_default_http_cache()
+    if parse_pool is None:
+        parse_pool = get_default_parse_pool()
+
+    canonicalize = canonicalizer.canonicalize if canonicalizer is not None else canonicalize_url
+    scope_url = canonicalize(base_url)
+    scope = scope_for(scope_url, scope_rules) # Compiled once; decides which links are followed
+    frontier = CrawlFrontier(max_depth)
+    discovered_links_set = UrlHashSet()
+    discovery_stats = {'checked_count': 0, 'found_count': 0, 'bytes_downloaded': 0}
+    started_at = time.monotonic()
+
+    checkpoint = _open_checkpoint(checkpoint_path or (discovery_checkpoint_path(base_url) if CHECKPOINT_ENABLED else None), resume)
+    if checkpoint is not None and resume:
+        queued, seen, found, checked_count = checkpoint.load_discovery()
+        if checkpoint.is_complete():
+            checkpoint.close()
+            logger.info(f"Discovery for {base_url} already completed; returning {len(found)} checkpointed link(s).")
+            yield from found
+            return
+        frontier.restore(queued, seen)
+        discovered_links_set.update(found)
+        if checkpoint.get_meta('scope_url'): # The start page redirected (e.g. to https) in the interrupted run
+            scope_url = checkpoint.get_meta('scope_url')
+            scope = scope_for(scope_url, scope_rules)
+        discovery_stats.update(checked_count=checked_count, found_count=len(found))
+        yield from found
+        if seen:
+            logger.info(f"Resuming discovery for {base_url}: {checked_count} URL(s) already checked, {len(queued)} in the frontier.")
+
+    def record_found(url):
+        if url not in discovered_links_set:
+            discovered_links_set.add(url)
+            discovery_stats['found_count'] += 1
+            if discovery_stats['found_count'] % 20 == 0:
+                logger.info(f"  Discovery: Found {discovery_stats['found_count']} unique internal links so far...")
+
+    def report_progress(new_links):
+        if progress_callback:
+            elapsed = max(time.monotonic() - started_at, 1e-6)
+            progress_callback(dict(discovery_stats, frontier_size=len(frontier), new_links=new_links,
+                                   pages_per_sec=round(discovery_stats['checked_count'] / elapsed, 2),
+                                   host_limits=rate_limiter.limits()))
+
+    robots = RobotsCache(session=session) if respect_robots else None
+    if robots is not None:
+        robots.apply_crawl_delay(scope_url, rate_limiter)
+
+    if not frontier and not len(frontier.seen):
+        if checkpoint is not None:
+            checkpoint.set_meta('base_url', base_url)
+        sitemap_links = 0
+        if discovery_mode in ('sitemap', 'seed'):
+            # Sitemap URLs are streamed straight into the frontier / results; nothing is fetched but the sitemaps.
+            lastmods = get_default_lastmods()
+            new_links = []
+            for sitemap_url in sitemap_urls_for(scope_url, robots):
+                for url, lastmod in iter_sitemap(sitemap_url, session=session, rate_limiter=rate_limiter):
+                    url = canonicalize(url)
+                    if not scope.allows(url) or (robots is not None and not robots.can_fetch(url)):
+                        continue
+                    lastmods.record(url, lastmod)
+                    if discovery_mode == 'seed':
+                        is_new = frontier.push(url, 1)
+                    else:
+                        is_new = frontier.seen.add(url) # Listed only; the page itself isn't fetched
+                    if not is_new:
+                        continue
+                    sitemap_links += 1
+                    record_found(url)
+                    new_links.append(url)
+                    if checkpoint is not None:
+                        checkpoint.record_seen(url, 1, found=True, state='queued' if discovery_mode == 'seed' else 'sitemap')
+                    if len(new_links) >= 500:
+                        report_progress(new_links)
+                        yield from new_links
+                        new_links = []
+            report_progress(new_links)
+            yield from new_links
+            logger.info(f"Sitemaps for {base_url} listed {sitemap_links} in-scope URL(s).")
+            if not sitemap_links:
+                logger.info(f"No usable sitemap for {base_url}; falling back to following links.")
+
+        if discovery_mode != 'sitemap' or not sitemap_links:
+            if robots is not None and not robots.can_fetch(scope_url):
+                logger.warning(f"robots.txt disallows {scope_url}; not crawling it.")
+            elif frontier.push(scope_url, 0) and checkpoint is not None:
+                checkpoint.record_seen(scope_url, 0, found=False)
+
+    def redirected_scope(final_url):
+        """
+        Scope for a start page that redirected within its own site (http to https, example.com to www.example.com):
+        base_url's path on the final URL's scheme and host. None if the redirect left the site.
+        """
+        start, final = urlsplit(scope_url), urlsplit(final_url)
+        if (start.hostname or '').removeprefix('www.') != (final.hostname or '').removeprefix('www.'):
+            return None
+        return scope_for(urlunsplit((final.scheme, final.netloc, start.path, start.query, '')), scope_rules)
+
+    def fetch_links(url):
+        return _discover_page(url, scope_url, session=session, page_store=page_store, http_cache=http_cache,
+                              canonicalizer=canonicalizer, robots=robots, budget=budget, scope=scope, rate_limiter=rate_limiter,
+                              parse_pool=parse_pool, rescope=redirected_scope if url == scope_url else None)
+
+    # The frontier and stats are only touched from this thread; workers just fetch and parse.
+    in_flight = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < workers:
+                    if max_pages is not None and discovery_stats['checked_count'] >= max_pages:
+                        break
+                    current_url, current_depth = frontier.pop()
+                    discovery_stats['checked_count'] += 1
+                    logger.info(f"Discovery L{current_depth} (Checked: {discovery_stats['checked_count']}): Visiting {current_url}")
+                    in_flight[submit_with_context(pool, fetch_links, current_url)] = (current_url, current_depth)
+
+                if not in_flight:
+                    logger.info(f"Discovery page limit ({max_pages}) reached with {len(frontier)} URL(s) left in the frontier.")
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    current_url, current_depth = in_flight.pop(future)
+                    page_links, page_bytes, final_url = future.result()
+                    page_url = current_url
+                    if final_url and final_url != current_url:
+                        frontier.seen.add(final_url) # Don't fetch a redirect target again under its own URL
+                        moved_scope = redirected_scope(final_url) if current_url == scope_url else None
+                        if page_links is not None and moved_scope is not None:
+                            # Its links were scoped to where it ended up; follow the rest of the site there too.
+                            logger.info(f"Start page {scope_url} redirected to {final_url}; scoping discovery to {moved_scope.base_url}.")
+                            scope_url, scope, page_url = moved_scope.base_url, moved_scope, final_url
+                            if robots is not None:
+                                robots.apply_crawl_delay(scope_url, rate_limiter)
+                            if checkpoint is not None:
+                                checkpoint.set_meta('scope_url', scope_url)
+                                checkpoint.record_seen(final_url, 0, found=False, state='visited')
+                    discovery_stats['bytes_downloaded'] += page_bytes
+                    new_links = []
+
+                    # Add the page itself if it's within the base URL scope, even if it's the starting page
+                    if page_links is not None and scope.allows(page_url) and page_url not in discovered_links_set:
+                        record_found(page_url)
+                        new_links.append(page_url)
+                        if checkpoint is not None:
+                            checkpoint.record_found(page_url)
+
+                    for next_url in page_links or []:
+                        if frontier.push(next_url, current_depth + 1):
+                            record_found(next_url)
+                            new_links.append(next_url)
+                            logger.debug(f"  Discovery L{current_depth}: Added new link to explore: {next_url}")
+                            if checkpoint is not None:
+                                checkpoint.record_seen(next_url, current_depth + 1, found=True,
+                                                       state='queued' if current_depth + 1 <= max_depth else 'too_deep')
+
+                    count_page('discover', 'visited' if page_links is not None else 'failed')
+                    if checkpoint is not None:
+                        checkpoint.record_visit(current_url, 'visited' if page_links is not None else 'failed')
+
+                    report_progress(new_links)
+                    yield from new_links
+        if checkpoint is not None:
+            checkpoint.discard() # Finished; nothing left to resume
+            checkpoint = None
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    logger.info(f"Discovery phase for {base_url} complete. Checked {discovery_stats['checked_count']} URLs, found {discovery_stats['found_count']} unique internal links.")
+
+
+def scrape_selected_pages(base_url_for_naming, urls_to_scrape, existing_session_dir=None, workers=MAX_WORKERS, rate_limiter=None, session=None, page_store=None, http_cache=None, incremental=False, progress_callback=None, resume=False, near_duplicate_distance=NEAR_DUPLICATE_DISTANCE, lastmods=None, output_format=OUTPUT_FORMAT, profile=PROFILE_ENABLED, budget=None, on_page=None, parse_pool=None, respect_robots=RESPECT_ROBOTS, robots=None):
     """
     Scrapes a list of selected URLs.
     - base_url_for_naming: Used for creating the session directory name.
     - urls_to_scrape: A list of URLs to be scraped.
     - existing_session_dir: If provided, use this directory. Otherwise, create a new one.
+    - incremental: Re-scrape into existing_session_dir, only writing pages whose extracted text is new
+      or changed since the previous run (per the session's manifest.json). URLs from the previous run that
+      are no longer selected are removed, and a changes_<timestamp>.json report lists the delta.
+    - workers: Number of pages fetched concurrently. URLs on different hosts proceed in parallel.
+    - rate_limiter: HostRateLimiter enforcing per-host politeness (if not given, an AdaptiveRateLimiter that tunes
+      each host's rate and concurrency to how it responds).
+    - session: Pooled requests.Session shared by all fetches (defaults to the shared one).
+    - page_store: PageStore holding bodies fetched during discovery (defaults to the shared one).
+      Fresh bodies are scraped from the store without another download.
+    - http_cache: HttpCache used to revalidate the remaining fetches (defaults to the shared one, if enabled).
+    - progress_callback: Called after every page with a dict (scraped_count, failed_count, total, bytes_written,
+      pages_per_sec, host_limits, url, status); host_limits holds rate_limiter's current per-host limits.
+    - resume: Continue an interrupted scrape into existing_session_dir. Each page's outcome is checkpointed
+      to crawl_state.sqlite in the session directory; pages already saved by the interrupted run are skipped.
+    - near_duplicate_distance: Pages whose extracted text is identical to, or within this many SimHash bits of,
+      a page earlier in urls_to_scrape are not written (status 'duplicate'). None disables the check.
+    - lastmods: LastmodRegistry of sitemap lastmod values (defaults to the shared one filled by discovery).
+      In incremental mode, pages not modified since they were last scraped are skipped without a fetch.
+    - output_format: How pages are written (see sinks.py): "txt" (one file per page, the default), "jsonl"
+      (optionally ".gz" / ".zst"), "parquet" or "tar" (optionally ".gz" / ".zst") bundles written in batches.
+    - profile: Write profile.json to the session directory, breaking down where the scrape spent its time
+      (rate limiting, connect, time to first byte, download, parse, extract, fingerprint, write) per stage and host.
+      Stage timings and per-host fetch counts also go to the process-wide metrics served on /metrics.
+    - budget: FairRequestBudget shared with other crawls (see orchestrator.py); each fetch holds one of its slots.
+    - parse_pool: ParsePool that parses and extracts the fetched pages (defaults to the shared one, which spreads
+      large pages over SCRAPER_PARSE_PROCESSES worker processes).
+    - on_page: Called with (url, status, text) as each page is handled, in input order; text is the extracted text,
+      or None if the page wasn't fetched or failed. If it raises, pages not yet fetched are abandoned.
+    - respect_robots: Honor robots.txt: pages it disallows are not fetched (status 'disallowed'), and each host's
+      Crawl-delay caps rate_limiter. robots is the RobotsCache to use (e.g. the one discovery read; a new one if not given).
     Returns a tuple: (session_output_dir, pages_scraped_count, total_pages_selected, errors_occurred_list)
     """
     if not urls_to_scrape:
         logger.info("No URLs provided to scrape.")
         return None, 0, 0, []
 
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+
     try:
         if existing_session_dir:
             session_output_dir = existing_session_dir
@@ -214,19 +485,220 @@ def scrape_selected_pages(base_url_for_naming, urls_to_scrape, existing_session_
         return None, 0, len(urls_to_scrape), [f"Unexpected error during session setup: {str(e)}"]
 
 
+    if incremental and not existing_session_dir:
+        logger.warning("Incremental scrape requested without an existing session directory; scraping everything into a new session.")
+
+    # The manifest records each page's file and content hash so later runs can be incremental.
+    previous_pages = load_manifest(session_output_dir) if existing_session_dir else {}
+    manifest_pages = dict(previous_pages)
+    added, changed, unchanged = [], [], []
+
     pages_scraped_count = 0
     errors_occurred = [] # To collect URLs that failed
 
+    checkpoint = None
+    if CHECKPOINT_ENABLED:
+        checkpoint = _open_checkpoint(os.path.join(session_output_dir, CHECKPOINT_FILENAME), bool(resume and existing_session_dir))
+    remaining_urls = urls_to_scrape
+    completed = {}
+    if checkpoint is not None and resume and existing_session_dir:
+        completed = checkpoint.completed_pages()
+        remaining_urls = [url for url in urls_to_scrape if url not in completed]
+        for page_url in urls_to_scrape:
+            if page_url in completed:
+                status, manifest_pages[page_url] = completed[page_url]
+                {'added': added, 'changed': changed, 'unchanged': unchanged}[status].append(page_url)
+                pages_scraped_count += 1
+        logger.info(f"Resuming scrape: {pages_scraped_count} page(s) already saved, {len(remaining_urls)} left.")
+    resumed_count = pages_scraped_count
+
     logger.info(f"Starting scraping for {len(urls_to_scrape)} selected page(s) related to {base_url_for_naming}.")
     logger.info(f"Output will be saved to: {session_output_dir}")
 
-    for page_url in urls_to_scrape:
-        time.sleep(POLITENESS_DELAY) # Politeness delay between each scrape
-        if not crawl_and_extract_single_page(page_url, session_output_dir):
-            errors_occurred.append(page_url)
-            logger.warning(f"Failed to scrape or save: {page_url}")
-        else:
-            pages_scraped_count += 1
+    if rate_limiter is None:
+        rate_limiter = create_rate_limiter(rate=1 / POLITENESS_DELAY)
+    if page_store is None:
+        page_store = get_default_page_store()
+    if http_cache is None:
+        http_cache = get_default_http_cache()
+    if lastmods is None:
+        lastmods = get_default_lastmods()
+    if parse_pool is None:
+        parse_pool = get_default_parse_pool()
+    if robots is None and respect_robots:
+        robots = RobotsCache(session=session)
+
+    disallowed = set()
+    if respect_robots:
+        for page_url in {urlparse(url).netloc: url for url in remaining_urls}.values(): # One URL per host
+            robots.apply_crawl_delay(page_url, rate_limiter)
+        disallowed = {url for url in remaining_urls if not robots.can_fetch(url)}
+        if disallowed:
+            logger.info(f"Skipping {len(disallowed)} page(s) disallowed by robots.txt.")
+
+    def unchanged_since_lastmod(page_url):
+        previous = previous_pages.get(page_url)
+        lastmod = lastmods.get(page_url)
+        if not (incremental and previous and lastmod):
+            return False
+        try:
+            return lastmod <= datetime.fromisoformat(previous['scraped_at']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def fetch_one(page_url):
+        host = urlparse(page_url).netloc
+        text_content = extract_page_text(page_url, session=session, page_store=page_store, http_cache=http_cache, budget=budget,
+                                         rate_limiter=rate_limiter, parse_pool=parse_pool)
+        if text_content is None:
+            return None
+        with timed_stage('fingerprint', host):
+            fingerprint = simhash(text_content) if near_duplicate_distance is not None else None
+            text_hash = content_hash(text_content)
+        return text_content, text_hash, fingerprint
+
+    # Fetching and extraction run on the pool. Duplicate checks and writes happen here, in input order,
+    # so which of several duplicate URLs gets written doesn't depend on fetch timing.
+    duplicates = NearDuplicateIndex(near_duplicate_distance) if near_duplicate_distance is not None else None
+    if duplicates is not None:
+        for page_url, (_, entry) in completed.items():
+            duplicates.check_and_add(page_url, entry['sha256'], 0, 0) # Pages saved before a resume, exact matches only
+
+    # Saved pages are checkpointed once the sink reports them durable (bundled formats write in batches).
+    saved_status = {}
+
+    def on_flush(pages):
+        for page_url, entry in pages:
+            if checkpoint is not None:
+                checkpoint.record_page(page_url, saved_status.pop(page_url, 'added'), entry)
+
+    try:
+        sink = create_sink(output_format, session_output_dir, on_flush=on_flush)
+    except (SinkUnavailable, OSError) as e:
+        logger.error(f"Could not open {output_format} output in {session_output_dir}: {e}")
+        if checkpoint is not None:
+            checkpoint.close()
+        return session_output_dir, 0, len(urls_to_scrape), [str(e)]
+
+    def save_one(page_url, fetched):
+        text_content, text_hash, fingerprint = fetched
+        if duplicates is not None:
+            duplicate_of = duplicates.check_and_add(page_url, text_hash, *fingerprint)
+            if duplicate_of is not None:
+                logger.info(f"Skipping {page_url}: duplicate of {duplicate_of}")
+                return 'duplicate', None, 0
+        previous = previous_pages.get(page_url)
+        if incremental and previous and previous.get('sha256') == text_hash:
+            logger.info(f"Unchanged since last scrape, not rewriting: {page_url}")
+            return 'unchanged', previous, 0
+        status = 'changed' if previous else 'added'
+        saved_status[page_url] = status
+        try:
+            with timed_stage('write', urlparse(page_url).netloc):
+                entry, size = sink.write(page_url, text_content, text_hash)
+        except OSError as e:
+            saved_status.pop(page_url, None)
+            logger.error(f"IOError writing output for {page_url}: {e}", exc_info=True)
+            return None
+        return status, entry, size
+
+    bytes_written = 0
+    duplicate_urls = []
+    disallowed_urls = []
+    started_at = time.monotonic()
+    crawl_profile = CrawlProfile() if profile else None
+    # Stage timings from this thread and the pool workers (which copy this context) also go to crawl_profile.
+    with profiling(crawl_profile):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [None if page_url in disallowed or unchanged_since_lastmod(page_url) else submit_with_context(pool, fetch_one, page_url)
+                       for page_url in remaining_urls]
+            try:
+                for page_url, future in zip(remaining_urls, futures):
+                    if page_url in disallowed:
+                        outcome, fetched = ('disallowed',), None
+                    elif future is None:
+                        logger.info(f"Not modified since last scrape (sitemap lastmod), skipping: {page_url}")
+                        outcome = 'unchanged', previous_pages[page_url], 0
+                        fetched = None
+                        if duplicates is not None:
+                            duplicates.check_and_add(page_url, outcome[1]['sha256'], 0, 0)
+                    else:
+                        fetched = future.result()
+                        outcome = save_one(page_url, fetched) if fetched is not None else None
+                    if outcome is None:
+                        status = 'failed'
+                        errors_occurred.append(page_url)
+                        logger.warning(f"Failed to scrape or save: {page_url}")
+                    elif outcome[0] == 'duplicate':
+                        status = 'duplicate'
+                        duplicate_urls.append(page_url)
+                    elif outcome[0] == 'disallowed':
+                        status = 'disallowed'
+                        disallowed_urls.append(page_url)
+                    else:
+                        pages_scraped_count += 1
+                        status, manifest_pages[page_url], page_bytes = outcome
+                        bytes_written += page_bytes
+                        {'added': added, 'changed': changed, 'unchanged': unchanged}[status].append(page_url)
+                    count_page('scrape', status)
+                    if checkpoint is not None and status not in ('added', 'changed'):
+                        checkpoint.record_page(page_url, status, manifest_pages[page_url] if status == 'unchanged' else None)
+                    if progress_callback:
+                        handled = pages_scraped_count - resumed_count + len(errors_occurred) + len(duplicate_urls) + len(disallowed_urls)
+                        elapsed = max(time.monotonic() - started_at, 1e-6)
+                        progress_callback({'scraped_count': pages_scraped_count, 'failed_count': len(errors_occurred),
+                                           'total': len(urls_to_scrape), 'bytes_written': bytes_written,
+                                           'pages_per_sec': round(handled / elapsed, 2),
+                                           'host_limits': rate_limiter.limits(),
+                                           'url': page_url, 'status': status})
+                    if on_page:
+                        on_page(page_url, status, fetched[0] if fetched is not None else None)
+            except BaseException:
+                for future in futures:
+                    if future is not None:
+                        future.cancel() # Don't fetch the rest on the way out
+                raise
+
+        if duplicate_urls:
+            logger.info(f"Collapsed {len(duplicate_urls)} duplicate or near-duplicate page(s); they were not written.")
+
+        try:
+            sink.close()
+        except OSError as e:
+            logger.error(f"Could not finish writing {output_format} output in {session_output_dir}: {e}", exc_info=True)
+
+    removed = []
+    if incremental and existing_session_dir:
+        selected = set(urls_to_scrape).difference(duplicate_urls, disallowed) # Collapsed duplicates and disallowed pages lose their old files too
+        for page_url in [url for url in previous_pages if url not in selected]:
+            removed.append(page_url)
+            manifest_pages.pop(page_url)
+        # Delete files (or bundles) that no page in the new manifest uses any more. Two URLs can
+        # sanitize to the same filename and bundles hold many pages, so files still referenced stay.
+        in_use = {entry['file'] for entry in manifest_pages.values()}
+        for stale_file in {entry['file'] for entry in previous_pages.values()} - in_use:
+            try:
+                os.remove(os.path.join(session_output_dir, stale_file))
+            except OSError:
+                pass
+
+    try:
+        save_manifest(session_output_dir, manifest_pages)
+        if incremental:
+            report_path = write_change_report(session_output_dir, added, changed, removed, len(unchanged))
+            logger.info(f"Incremental scrape: {len(added)} added, {len(changed)} changed, {len(removed)} removed, {len(unchanged)} unchanged. Report: {report_path}")
+    except OSError as e:
+        logger.error(f"Could not write manifest for {session_output_dir}: {e}", exc_info=True)
+
+    if crawl_profile is not None:
+        try:
+            logger.info(f"Wrote scrape profile to {crawl_profile.save(session_output_dir)}")
+        except OSError as e:
+            logger.warning(f"Could not write scrape profile for {session_output_dir}: {e}")
+
+    if checkpoint is not None:
+        checkpoint.mark_complete()
+        checkpoint.close()
 
     logger.info(f"Scraping for {base_url_for_naming} completed. {pages_scraped_count}/{len(urls_to_scrape)} page(s) saved in '{session_output_dir}'.")
     if errors_occurred:
@@ -0,0 +1,263 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import uuid
+from datetime import datetime
+from urllib.parse import urlparse
+
+from .utils import logger, sanitize_filename
+
+# --- Output Sink Configuration ---
+OUTPUT_FORMAT = os.getenv("SCRAPER_OUTPUT_FORMAT", "txt") # Default format for scrape_selected_pages
+OUTPUT_FORMATS = ("txt", "jsonl", "jsonl.gz", "jsonl.zst", "parquet", "tar", "tar.gz", "tar.zst")
+SINK_BATCH_RECORDS = 500 # Bundled sinks write once this many pages are buffered...
+SINK_BATCH_BYTES = 8 * 1024 * 1024 # ...or once the buffered text reaches this size
+ZSTD_LEVEL = 3
+
+
+def page_output_filename(page_url, output_dir):
+    """Returns the .txt path inside output_dir that page_url's text is saved to."""
+    url_path_part = urlparse(page_url).path
+    # If path is empty or just '/', use 'index' or a sanitized version of the domain
+    if not url_path_part or url_path_part == '/':
+        filename_base = sanitize_filename(urlparse(page_url).netloc) + "_index"
+    else:
+        filename_base = url_path_part.strip('/')
+
+    sanitized_name = sanitize_filename(filename_base)
+
+    # Ensure filename isn't empty after sanitization
+    if not sanitized_name:
+        sanitized_name = "unnamed_page"
+
+    return os.path.join(output_dir, f"{sanitized_name}.txt")
+
+
+def format_page_text(page_url, text, scraped_at):
+    """A page's text as saved in .txt files: a URL / Scraped_At header, a blank line, then the text."""
+    return f"URL: {page_url}\nScraped_At: {scraped_at}\n\n{text}"
+
+
+class SinkUnavailable(RuntimeError):
+    """The requested output format needs a package that isn't installed."""
+
+
+def _zstd_writer(raw):
+    try:
+        import zstandard
+    except ImportError:
+        raise SinkUnavailable("zstd output needs the 'zstandard' package (pip install zstandard)")
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+
+
+def _bundle_name(output_dir, extension):
+    # Each run (and each resumed run) gets its own bundle, so earlier bundles are never rewritten.
+    stamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    return os.path.join(output_dir, f"pages_{stamp}_{uuid.uuid4().hex[:6]}.{extension}")
+
+
+class OutputSink:
+    """
+    Destination for scraped pages. write() buffers a page and returns its manifest entry
+    ({'file': path relative to the output directory, ...}) and the bytes it adds.
+    on_flush(list of (url, entry)) is called once pages are durably on disk, so callers can checkpoint
+    exactly those pages: after every batch for formats that stay readable when cut off (durable_batches),
+    and only on close() for compressed or footer-based formats.
+    """
+    durable_batches = True
+
+    def __init__(self, output_dir, on_flush=None):
+        self.output_dir = output_dir
+        self.on_flush = on_flush
+        self._pending = []
+        self._pending_bytes = 0
+        self._unconfirmed = [] # Flushed, but not readable until close()
+
+    def write(self, page_url, text, text_hash):
+        scraped_at = datetime.now().isoformat()
+        entry, size = self._add(page_url, text, text_hash, scraped_at)
+        entry.update(sha256=text_hash, scraped_at=scraped_at)
+        self._pending.append((page_url, entry))
+        self._pending_bytes += size
+        if len(self._pending) >= SINK_BATCH_RECORDS or self._pending_bytes >= SINK_BATCH_BYTES:
+            self.flush()
+        return entry, size
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._flush()
+        flushed, self._pending, self._pending_bytes = self._pending, [], 0
+        if not self.durable_batches:
+            self._unconfirmed.extend(flushed)
+        elif self.on_flush:
+            self.on_flush(flushed)
+
+    def close(self):
+        self.flush()
+        self._close()
+        if self._unconfirmed and self.on_flush:
+            self.on_flush(self._unconfirmed)
+        self._unconfirmed = []
+
+    def _add(self, page_url, text, text_hash, scraped_at):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class TextFileSink(OutputSink):
+    """One .txt file per page with a URL / Scraped_At header (the original layout). Every write is flushed."""
+
+    def __init__(self, output_dir, on_flush=None):
+        super().__init__(output_dir, on_flush)
+        self._known_dirs = {output_dir}
+
+    def _add(self, page_url, text, text_hash, scraped_at):
+        filename = page_output_filename(page_url, self.output_dir)
+        directory = os.path.dirname(filename)
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(format_page_text(page_url, text, scraped_at))
+        logger.info(f"Saved content from {page_url} to {filename}")
+        return {'file': os.path.relpath(filename, self.output_dir)}, os.path.getsize(filename)
+
+    def write(self, page_url, text, text_hash):
+        result = super().write(page_url, text, text_hash)
+        self.flush()
+        return result
+
+
+class JsonlSink(OutputSink):
+    """Appends {url, scraped_at, sha256, text} lines to one JSONL bundle per run, optionally gzip or zstd compressed."""
+
+    def __init__(self, output_dir, compression=None, on_flush=None):
+        super().__init__(output_dir, on_flush)
+        self.durable_batches = compression is None # A cut-off compressed stream can't be decoded to the end
+        extension = "jsonl" + (f".{compression}" if compression else "")
+        self.path = _bundle_name(output_dir, extension)
+        self._raw = open(self.path, "wb")
+        try:
+            if compression == "zst":
+                self._out = _zstd_writer(self._raw)
+            elif compression == "gz":
+                self._out = gzip.GzipFile(fileobj=self._raw, mode="wb")
+            else:
+                self._out = self._raw
+        except SinkUnavailable:
+            self._raw.close()
+            os.remove(self.path)
+            raise
+        self._lines = []
+
+    def _add(self, page_url, text, text_hash, scraped_at):
+        line = json.dumps({'url': page_url, 'scraped_at': scraped_at, 'sha256': text_hash, 'text': text}, ensure_ascii=False)
+        data = (line + "\n").encode("utf-8")
+        self._lines.append(data)
+        return {'file': os.path.basename(self.path)}, len(data)
+
+    def _flush(self):
+        self._out.write(b"".join(self._lines))
+        self._lines = []
+        self._out.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _close(self):
+        if self._out is not self._raw:
+            self._out.close() # Writes the compression trailer (and closes the raw file)
+        if not self._raw.closed:
+            self._raw.close()
+        logger.info(f"Wrote JSONL bundle {self.path}")
+
+
+class ParquetSink(OutputSink):
+    """Writes pages to a Parquet file (url, scraped_at, sha256, text), one row group per batch. Needs pyarrow."""
+    durable_batches = False # The file is unreadable until its footer is written on close
+
+    def __init__(self, output_dir, on_flush=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SinkUnavailable("Parquet output needs the 'pyarrow' package (pip install pyarrow)")
+        super().__init__(output_dir, on_flush)
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([('url', pyarrow.string()), ('scraped_at', pyarrow.string()),
+                                       ('sha256', pyarrow.string()), ('text', pyarrow.string())])
+        self.path = _bundle_name(output_dir, "parquet")
+        self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema, compression="zstd")
+        self._rows = []
+
+    def _add(self, page_url, text, text_hash, scraped_at):
+        self._rows.append({'url': page_url, 'scraped_at': scraped_at, 'sha256': text_hash, 'text': text})
+        return {'file': os.path.basename(self.path)}, len(text.encode("utf-8"))
+
+    def _flush(self):
+        self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+        self._rows = []
+
+    def _close(self):
+        self._writer.close()
+        logger.info(f"Wrote Parquet file {self.path}")
+
+
+class TarSink(OutputSink):
+    """Packs the per-page .txt files into a single tar archive (optionally gzip or zstd compressed)."""
+    durable_batches = False
+
+    def __init__(self, output_dir, compression=None, on_flush=None):
+        super().__init__(output_dir, on_flush)
+        self.path = _bundle_name(output_dir, "tar" + (f".{compression}" if compression else ""))
+        self._raw = open(self.path, "wb")
+        try:
+            self._compressor = _zstd_writer(self._raw) if compression == "zst" else None
+        except SinkUnavailable:
+            self._raw.close()
+            os.remove(self.path)
+            raise
+        mode = "w|gz" if compression == "gz" else "w|"
+        self._tar = tarfile.open(fileobj=self._compressor or self._raw, mode=mode)
+        self._names = set()
+
+    def _add(self, page_url, text, text_hash, scraped_at):
+        name = os.path.basename(page_output_filename(page_url, self.output_dir))
+        if name in self._names:
+            name = f"{name[:-4]}_{text_hash[:8]}.txt" # Keep both pages when two URLs sanitize to the same name
+        self._names.add(name)
+        data = format_page_text(page_url, text, scraped_at).encode("utf-8")
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(datetime.now().timestamp())
+        self._tar.addfile(info, io.BytesIO(data)) # Streamed straight into the archive
+        return {'file': os.path.basename(self.path), 'member': name}, len(data)
+
+    def _close(self):
+        self._tar.close()
+        if self._compressor is not None:
+            self._compressor.close()
+        if not self._raw.closed:
+            self._raw.close()
+        logger.info(f"Wrote tar archive {self.path}")
+
+
+def create_sink(output_format, output_dir, on_flush=None):
+    """Returns the OutputSink for output_format (see OUTPUT_FORMATS). Raises ValueError or SinkUnavailable."""
+    kind, _, compression = output_format.partition(".")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+    if kind == "txt":
+        return TextFileSink(output_dir, on_flush=on_flush)
+    if kind == "jsonl":
+        return JsonlSink(output_dir, compression=compression or None, on_flush=on_flush)
+    if kind == "parquet":
+        return ParquetSink(output_dir, on_flush=on_flush)
+    return TarSink(output_dir, compression=compression or None, on_flush=on_flush)
@@ -0,0 +1,217 @@
+import gzip
+import io
+import os
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from .fetcher import get_default_session
+from .utils import logger
+
+# --- robots.txt / Sitemap Configuration ---
+RESPECT_ROBOTS = os.getenv("SCRAPER_RESPECT_ROBOTS", "1") != "0"
+ROBOTS_USER_AGENT = "*" # robots.txt group to obey
+SITEMAP_TIMEOUT = 30 # seconds; sitemaps can be large
+MAX_SITEMAP_FILES = 1000 # Sitemap files read per discovery (a sitemap index may list many)
+MAX_LASTMODS = 1_000_000 # lastmod values remembered for incremental scrapes before the oldest are dropped
+
+
+class RobotsCache:
+    """
+    Fetches and caches robots.txt per host (scheme + netloc).
+    A missing robots.txt allows everything; one that can't be read (5xx, network error) is treated
+    the same, so an outage of robots.txt alone never stops a crawl.
+    """
+
+    def __init__(self, session=None, user_agent=ROBOTS_USER_AGENT, timeout=15):
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Returns the RobotFileParser for url's host, fetching robots.txt on first use."""
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            parser = self._parsers.get(origin)
+        if parser is not None:
+            return parser
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = (self.session or get_default_session()).get(parser.url, timeout=self.timeout)
+            if response.status_code == 200:
+                parser.parse(response.text.splitlines())
+            else:
+                parser.parse([])
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not read {parser.url}; assuming everything is allowed: {e}")
+            parser.parse([])
+        with self._lock:
+            return self._parsers.setdefault(origin, parser)
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        """Crawl-delay for url's host in seconds, or None."""
+        delay = self.get(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def sitemaps(self, url):
+        """Sitemap URLs listed in url's robots.txt."""
+        return list(self.get(url).site_maps() or [])
+
+    def apply_crawl_delay(self, url, rate_limiter):
+        """Caps rate_limiter for url's host if robots.txt asks for a longer Crawl-delay than its fastest rate allows."""
+        delay = self.crawl_delay(url)
+        if delay and delay > 0 and 1 / delay < rate_limiter.max_rate:
+            host = urlparse(url).netloc
+            rate_limiter.set_rate(host, 1 / delay)
+            logger.info(f"Honoring Crawl-delay of {delay}s for {host}")
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class _ResponseStream(io.RawIOBase):
+    """Minimal file object over a streamed requests.Response (Content-Encoding already decoded)."""
+
+    def __init__(self, response, chunk_size=64 * 1024):
+        self._chunks = response.iter_content(chunk_size)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _open_stream(response):
+    """Readable stream over a sitemap body, transparently un-gzipping .xml.gz files."""
+    stream = io.BufferedReader(_ResponseStream(response))
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def iter_sitemap(sitemap_url, session=None, rate_limiter=None, max_files=MAX_SITEMAP_FILES):
+    """
+    Streams (url, lastmod) pairs from a sitemap, following sitemap index files.
+    Files are parsed incrementally, so memory stays flat even for 50k-URL sitemaps.
+    lastmod is the raw W3C datetime string or None. Unreadable sitemaps are logged and skipped.
+    """
+    session = session or get_default_session()
+    pending = [sitemap_url]
+    visited = set()
+    while pending and len(visited) < max_files:
+        current = pending.pop(0)
+        if current in visited:
+            continue
+        visited.add(current)
+        if rate_limiter is not None:
+            rate_limiter.acquire(current)
+        status = 'error'
+        try:
+            with session.get(current, timeout=SITEMAP_TIMEOUT, stream=True) as response:
+                status = response.status_code
+                response.raise_for_status()
+                for _, elem in ET.iterparse(_open_stream(response), events=('end',)):
+                    kind = _local_name(elem.tag)
+                    if kind not in ('url', 'sitemap'):
+                        continue
+                    loc = lastmod = None
+                    for child in elem:
+                        name = _local_name(child.tag)
+                        if name == 'loc' and child.text:
+                            loc = urljoin(current, child.text.strip())
+                        elif name == 'lastmod' and child.text:
+                            lastmod = child.text.strip()
+                    elem.clear()
+                    if loc is None:
+                        continue
+                    if kind == 'sitemap':
+                        pending.append(loc)
+                    else:
+                        yield loc, lastmod
+        except (requests.exceptions.RequestException, ET.ParseError, OSError, EOFError) as e:
+            logger.warning(f"Could not read sitemap {current}: {e}")
+        finally:
+            if rate_limiter is not None:
+                rate_limiter.record(current, status)
+    if pending:
+        logger.warning(f"Stopped after {max_files} sitemap files; {len(pending)} more were not read.")
+
+
+def sitemap_urls_for(base_url, robots=None):
+    """Sitemaps for base_url's site: those listed in robots.txt, or /sitemap.xml if none are."""
+    listed = robots.sitemaps(base_url) if robots is not None else []
+    if listed:
+        return listed
+    parts = urlparse(base_url)
+    return [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+
+
+def parse_lastmod(value):
+    """Parses a sitemap lastmod (W3C datetime: a date, or a date and time) into a UNIX timestamp, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class LastmodRegistry:
+    """Remembers sitemap lastmod values seen during discovery, so incremental scrapes can skip unchanged pages."""
+
+    def __init__(self, max_entries=MAX_LASTMODS):
+        self.max_entries = max_entries
+        self._lastmods = {}
+        self._lock = threading.Lock()
+
+    def record(self, url, lastmod):
+        timestamp = parse_lastmod(lastmod)
+        if timestamp is None:
+            return
+        with self._lock:
+            self._lastmods.pop(url, None)
+            self._lastmods[url] = timestamp
+            if len(self._lastmods) > self.max_entries:
+                del self._lastmods[next(iter(self._lastmods))]
+
+    def get(self, url):
+        """lastmod of url as a UNIX timestamp, or None if unknown."""
+        with self._lock:
+            return self._lastmods.get(url)
+
+
+_default_lastmods = None
+_default_lastmods_lock = threading.Lock()
+
+
+def get_default_lastmods():
+    """Returns the process-wide LastmodRegistry shared by discovery and scraping."""
+    global _default_lastmods
+    with _default_lastmods_lock:
+        if _default_lastmods is None:
+            _default_lastmods = LastmodRegistry()
+        return _default_lastmods
@@ -36,18 +36,34 @@ function setupLogStream() {
     const statusEl = document.getElementById('spinner-status');
     if (!pre) return;
 
-    const source = new EventSource('/logs_stream');
-    source.onmessage = (e) => {
-        logLines.push(e.data);
-        if (logLines.length > 10) logLines.shift();
+    // Logs are only streamed per job; pages that don't belong to one have none to show.
+    const dropdown = document.querySelector('.log-dropdown');
+    const jobId = dropdown && dropdown.dataset.jobId;
+    if (!jobId) return;
+    const source = new EventSource(`/logs_stream?job=${encodeURIComponent(jobId)}`);
+
+    const addLine = (line) => {
+        logLines.push(line);
+        if (logLines.length > 200) logLines.shift();
         pre.textContent = logLines.join('\n');
         if (latest) {
-            latest.textContent = logLines[logLines.length - 1];
+            latest.textContent = line;
         }
+    };
+
+    source.onmessage = (e) => {
+        addLine(e.data);
         if (statusEl) {
-            statusEl.textContent = parseStatus(logLines[logLines.length - 1]);
+            statusEl.textContent = parseStatus(e.data);
         }
     };
+    source.addEventListener('progress', (e) => {
+        if (statusEl) statusEl.textContent = describeProgress(JSON.parse(e.data));
+    });
+    source.addEventListener('gap', (e) => {
+        addLine(`[${JSON.parse(e.data).lost} log line(s) skipped]`);
+    });
+    source.addEventListener('end', () => source.close());
 }
 
 function parseStatus(logLine) {
@@ -61,9 +77,56 @@ function parseStatus(logLine) {
     return msg;
 }
 
+function describeProgress(progress) {
+    let text = 'Waiting for progress...';
+    if (progress.total !== undefined) {
+        text = `Scraped ${progress.scraped_count} of ${progress.total} page(s), ${progress.failed_count} failed.`;
+    } else if (progress.checked_count !== undefined) {
+        text = `Checked ${progress.checked_count} page(s), found ${progress.found_count} link(s), ${progress.frontier_size} queued.`;
+    }
+    return text + describeHostLimits(progress.host_limits);
+}
+
+function describeHostLimits(hostLimits) {
+    // One host: its current limit. Several: the range, so a host that is being throttled stands out.
+    const hosts = Object.keys(hostLimits || {});
+    if (!hosts.length) return '';
+    const rates = hosts.map((host) => hostLimits[host].rate);
+    if (hosts.length === 1) {
+        const limit = hostLimits[hosts[0]];
+        const concurrency = limit.concurrency !== undefined ? `, ${limit.concurrency} at a time` : '';
+        return ` Rate limit for ${hosts[0]}: ${limit.rate} req/s${concurrency}.`;
+    }
+    return ` Rate limits: ${Math.min(...rates)}-${Math.max(...rates)} req/s across ${hosts.length} hosts.`;
+}
+
+function setupJobPolling() {
+    const box = document.getElementById('job-status');
+    if (!box) return;
+    const stateEl = document.getElementById('job-state');
+    const progressEl = document.getElementById('job-progress');
+
+    const poll = () => {
+        fetch(box.dataset.statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then((resp) => resp.json())
+            .then((job) => {
+                if (stateEl) stateEl.textContent = job.status;
+                if (progressEl) progressEl.textContent = describeProgress(job.progress || {});
+                if (job.status === 'finished' || job.status === 'failed') {
+                    window.location = box.dataset.viewUrl;
+                } else {
+                    setTimeout(poll, 2000);
+                }
+            })
+            .catch(() => setTimeout(poll, 5000));
+    };
+    poll();
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     setupSpinner();
     setupLogToggle();
     setupLogStream();
+    setupJobPolling();
 });
 